@@ -0,0 +1,371 @@
+import urlparse       # For operations with URL stings
+import logging        # For logging
+
+from multiprocessing.pool import ThreadPool  # For downloading pages
+                                             # concurrently
+
+from site_spider import SiteSpider, SiteSpiderError, ConnectionError
+from download_throttle import HostTokenBuckets
+
+
+__doc__ = """
+Contains asynchronous site spider which downloads several website pages
+at once. Uses site_spider module for the rest of crawling process.
+"""
+
+__all__ = ["AsyncSiteSpider"]
+
+class AsyncSiteSpider(SiteSpider):
+    """Asynchronous site spider class. Unlike SiteSpider it doesn't wait for
+    a page to be downloaded before sending the next request - it keeps up to
+    a given number of requests in flight. The number of requests sent to
+    every website host per second is restricted by a token bucket instead of
+    a fixed delay after every download.
+
+    Python 2 has no asyncio library, so requests are performed by a pool
+    of worker threads. Worker threads only download pages - parsing pages,
+    scheduling references and building sitemap tree are done by the
+    calling thread. Scheduled references are taken in windows of
+    max_concurrent_requests pages to download, and downloaded pages of
+    a window are processed in the order they were taken out of schedule,
+    so sitemap tree doesn't depend on the order responses arrive in.
+    With breadth-first scheduling strategy (which is used by default)
+    sitemap tree is the same as the one built by SiteSpider.
+
+    """
+
+    def __init__(self, site_homepage_address, depth_limit = 0,
+                 download_delay = 0, connection_attempts_number = 1,
+                 connection_attempt_timeout = 0, robotstxt_obey = True,
+                 scheduling_strategy =
+                        SiteSpider.SCHEDULING_STRATEGY_BREADTH_FIRST,
+                 reference_priority = None, max_concurrent_requests = 4,
+                 host_request_rate = None, host_request_burst = 1,
+                 **spider_preferences):
+        """Initializes asynchronous site spider preferences.
+
+        site_homepage_address, depth_limit, connection_attempts_number,
+        connection_attempt_timeout, robotstxt_obey, reference_priority --
+                                      the same as for SiteSpider
+        download_delay --             average interval between site resourse
+                                      downloads. It is used to set requests
+                                      rate if host_request_rate parametr is
+                                      not stated and adaptive download delay
+                                      is not used (by default is 0)
+        scheduling_strategy --        the same as for SiteSpider
+                                      (by default is breadth-first)
+        max_concurrent_requests --    maximum number of requests which are
+                                      performed at once (by default is 4)
+        host_request_rate --          maximum average number of requests sent
+                                      to a website host per second. None means
+                                      1 / download_delay or no restriction if
+                                      download delay is 0 (by default is None)
+        host_request_burst --         maximum number of requests which may be
+                                      sent to a website host at once without
+                                      respect to requests rate (by default
+                                      is 1)
+        **spider_preferences --       other SiteSpider preferences given by
+                                      keyword. Connection pool size is equal
+                                      to max_concurrent_requests by default.
+
+        """
+
+        spider_preferences.setdefault('connection_pool_size',
+                                      max_concurrent_requests)
+        SiteSpider.__init__(self, site_homepage_address, depth_limit,
+                            download_delay, connection_attempts_number,
+                            connection_attempt_timeout, robotstxt_obey,
+                            scheduling_strategy, reference_priority,
+                            **spider_preferences)
+
+        # Check a type of 'max_concurrent_requests' parametr
+        if not isinstance(max_concurrent_requests, (int, long)):
+            raise TypeError('int or long type expected')
+        if max_concurrent_requests < 1:
+            raise ValueError('max_concurrent_requests has to be positive')
+        self._max_concurrent_requests = max_concurrent_requests
+
+        # Check a type of 'host_request_rate' parametr
+        if host_request_rate is not None and \
+                not isinstance(host_request_rate, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        # Adaptive download throttle delays requests by itself
+        if host_request_rate is None and download_delay and \
+                not self._download_throttle:
+            host_request_rate = 1.0 / download_delay
+
+        # Set token buckets which restrict requests rate to website hosts
+        if host_request_rate:
+            self._host_token_buckets = HostTokenBuckets(host_request_rate,
+                                                        host_request_burst)
+        else:
+            self._host_token_buckets = None
+
+        # self._crawling_window_references maps references which were taken
+        # out of schedule, but were not processed yet, to the number of their
+        # occurrences in the current crawling window. They are still
+        # considered as scheduled while filtering references.
+        # Initialize it with an empty dictionary
+        self._crawling_window_references = {}
+
+    def _download_site_resourse(self, reference):
+        """Dawnloads site resourse by given reference. Waits until requests
+        rate to the resourse host allows to send a request.
+
+        reference -- corresponding URL
+
+        Returns file-like object, containing requsted resourse.
+        Raises the same exceptions as SiteSpider._download_site_resourse.
+
+        """
+
+        if self._host_token_buckets:
+            host = urlparse.urlsplit(reference).netloc
+            self._host_token_buckets.consume(host)
+        return SiteSpider._download_site_resourse(self, reference)
+
+    def _apply_crawl_delay(self, crawl_delay):
+        """Makes site spider wait at least given number of seconds between
+        requests to a website host. Restricts requests rate of token buckets
+        if they are used.
+
+        crawl_delay -- minimum interval between requests
+
+        """
+
+        SiteSpider._apply_crawl_delay(self, crawl_delay)
+        if self._download_throttle:
+            return
+        crawl_rate = 1.0 / crawl_delay
+        if self._host_token_buckets is None:
+            self._host_token_buckets = HostTokenBuckets(crawl_rate, 1)
+        elif self._host_token_buckets.rate > crawl_rate:
+            self._host_token_buckets.rate = crawl_rate
+
+    def _delay(self):
+        """Does nothing. Asynchronous site spider is delayed by token buckets
+        before every request instead.
+
+        """
+
+        pass
+
+    def _is_reference_scheduled(self, reference):
+        """Checks whether given reference is put in schedule in order to 
+        process later. References from the current crawling window which
+        were not processed yet are considered as scheduled.
+
+        reference -- corresponding URL
+
+        """
+
+        if reference in self._crawling_window_references:
+            return True
+        return SiteSpider._is_reference_scheduled(self, reference)
+
+    def _fetch_site_page(self, reference, title_only = False):
+        """Downloads and reads site page and starts its parsing. Page is taken
+        from responses downloaded while starting crawling if possible. It is 
+        called by worker threads, so if worker processes parsing pages are used, 
+        pages are parsed while other pages are being downloaded.
+
+        reference --  corresponding URL
+        title_only -- boolean parametr which states whether only page title
+                      is needed (by default is False)
+
+        Returns a tuple of URL of the page after redirects and 
+        PendingPageParsingInfo class instance or None if the page was
+        redirected to already processed page, so it was not read.
+        Raises the same exceptions as _download_site_resourse and 
+        _read_site_page methods.
+
+        """
+
+        page = self._take_startup_response(reference)
+        if page is None:
+            page = self._download_site_resourse(reference)
+        final_reference = self._get_final_reference(reference, page)
+        # Processed references are only added by the calling thread, so
+        # the page may be processed only after this check. It is checked
+        # again by the calling thread.
+        if final_reference != reference and \
+                final_reference in self._viewed_references:
+            page.close()
+            return final_reference, None
+        return final_reference, self._read_site_page(reference, page,
+                                                     title_only)
+
+    def _take_crawling_window(self, download_pool):
+        """Takes the next window of references out of schedule and starts
+        downloading of the pages they lead to.
+
+        download_pool -- pool of worker threads which download pages
+
+        Returns a tuple of a list of (reference crawling info, boolean 
+        value which states whether reference may be processed, download
+        result or None) tuples in the order references were taken out
+        of schedule and a boolean value which states whether depth limit
+        frontier was exhausted. References which may not be processed 
+        (e.g. forbidden by robots.txt file) are put in the window too, so
+        they are considered as scheduled until their turn comes, just like
+        SiteSpider does.
+
+        """
+
+        crawling_window = []
+        # Maps references to results of their downloads
+        page_downloads = {}
+        # References which pages are read only until their titles
+        title_only_references = set()
+        while self._references_crawling_info_schedule and \
+                len(page_downloads) < self._max_concurrent_requests:
+            reference_crawling_info = self._take_scheduled_reference()
+            reference = reference_crawling_info.reference
+
+            # Check depth of reference
+            try:
+                reference_is_allowed = self._check_reference_depth(
+                                               reference_crawling_info)
+            except StopIteration:
+                return crawling_window, True
+
+            # Check whether reference was already processed
+            if reference in self._viewed_references:
+                continue
+
+            page_download = None
+            if reference_is_allowed and \
+                    self._reference_requires_download(reference_crawling_info):
+                # Before downloading we have to check if it is allowed by
+                # robots.txt file
+                reference_is_allowed = self._check_robotstxt_permission(
+                                               reference)
+                if reference_is_allowed:
+                    # The same reference may be scheduled several times,
+                    # download it only once (unless only title of the page
+                    # was read, but the whole page is needed)
+                    title_only = self._reference_requires_title_only(
+                                         reference_crawling_info)
+                    page_download = page_downloads.get(reference)
+                    if page_download is None or \
+                            (reference in title_only_references and 
+                             not title_only):
+                        page_download = download_pool.apply_async(
+                                self._fetch_site_page, 
+                                (reference, title_only))
+                        page_downloads[reference] = page_download
+                        if title_only:
+                            title_only_references.add(reference)
+                        else:
+                            title_only_references.discard(reference)
+            crawling_window.append((reference_crawling_info, 
+                                    reference_is_allowed, page_download))
+            self._crawling_window_references[reference] = \
+                    self._crawling_window_references.get(reference, 0) + 1
+
+        return crawling_window, False
+
+    def _release_crawling_window_reference(self, reference):
+        """Removes one occurrence of given reference from the current
+        crawling window. It is done when processing of the reference starts.
+
+        reference -- corresponding URL
+
+        """
+
+        occurrences_number = self._crawling_window_references[reference] - 1
+        if occurrences_number:
+            self._crawling_window_references[reference] = occurrences_number
+        else:
+            del self._crawling_window_references[reference]
+
+    def crawl(self):
+        """Main site spider method. Manages the process of crawling and
+        building sitemap tree.
+
+        """
+
+        if not self._start_crawling():
+            return
+
+        download_pool = ThreadPool(self._max_concurrent_requests)
+        try:
+            # Main crawling loop
+            depth_limit_frontier_exhausted = False
+            while self._references_crawling_info_schedule and \
+                    not depth_limit_frontier_exhausted and \
+                    self._check_crawling_time_limit():
+                # Crawling state is consistent between windows processing
+                self._checkpoint_crawling_state()
+
+                crawling_window, depth_limit_frontier_exhausted = \
+                        self._take_crawling_window(download_pool)
+
+                # Process references in the order they were taken out of
+                # schedule
+                for reference_crawling_info, reference_is_allowed, \
+                        page_download in crawling_window:
+                    reference = reference_crawling_info.reference
+                    self._release_crawling_window_reference(reference)
+
+                    # Reference may be processed while processing the window
+                    if reference in self._viewed_references or \
+                            not reference_is_allowed:
+                        continue
+
+                    page_parsing_info = None
+                    final_reference = None
+                    if page_download is not None:
+                        # Wait for the page to be downloaded
+                        try:
+                            final_reference, pending_page_parsing_info = \
+                                    page_download.get()
+                        except ConnectionError, error:
+                            # Problems with connection, spider unable to
+                            # continue crawling. Downloads in progress use
+                            # connections and parser pool, so they have to
+                            # be finished before crawling is dumped.
+                            download_pool.close()
+                            download_pool.join()
+                            self._dump_crawling(error)
+                            return
+                        except SiteSpiderError, error:
+                            # Other problems with downloading. It may be
+                            # a single error cased by current reference.
+                            # So spider have to continue crawling.
+                            logging.error(str(error))
+                            continue
+                        except Exception:
+                            # Unexpected error of download thread (e.g. 
+                            # failure of page decoding or parsing). It is
+                            # caused by current reference too, so spider
+                            # have to continue crawling.
+                            logging.exception('Unable to process reference: '
+                                              '%s' % reference)
+                            continue
+
+                        # Page may be redirected to already processed page
+                        if self._check_redirect_alias(reference,
+                                                      final_reference):
+                            continue
+
+                        # Page downloaded successfully
+                        logging.info('Crawled: %s' % reference)
+
+                        # Wait for downloaded page to be parsed
+                        page_parsing_info = self._finish_page_parsing(
+                                             reference,
+                                             pending_page_parsing_info)
+                        if page_parsing_info is None:
+                            continue
+
+                    self._process_reference(reference_crawling_info,
+                                            page_parsing_info,
+                                            final_reference)
+        finally:
+            # Wait for the rest downloads to be finished
+            download_pool.close()
+            download_pool.join()
+
+        # Finish crawing process
+        self._finish_crawling()
@@ -0,0 +1,212 @@
+import os             # For using os.fsync() function
+import json           # For serializing checkpoint records
+import time           # For using time.time() function
+
+__doc__ = """
+Contains crawling checkpoint journal which allows to resume interrupted
+crawling process.
+"""
+
+__all__ = ["CrawlCheckpointJournal", "CrawlCheckpointError"]
+
+class CrawlCheckpointError(Exception):
+    """Class for errors of crawling checkpoint journal. Contains name of
+    journal file and error description.
+
+    """
+
+    def __init__(self, file_name, description):
+        self._file_name = file_name
+        self._description = description
+
+    def __str__(self):
+        return 'Crawling checkpoint %s: %s' % (self._file_name,
+                                                self._description)
+
+
+class CrawlCheckpointJournal(object):
+    """Crawling checkpoint journal class. Journal is an append-only file of
+    records describing changes of crawling state (references put in and
+    taken out of crawling frontier, processed references, sitemap tree
+    elements, references checked by spider trap detector). Replaying all
+    the records restores crawling state.
+
+    Records are collected in memory and are appended to the file
+    periodically. Every checkpoint contains records up to the last point,
+    where crawling state was consistent, and ends with a commit record.
+    The file is flushed to disk after every checkpoint, and records that
+    follow the last commit record (e.g. written partially when the process
+    died) are ignored while loading, so the journal is crash-safe.
+
+    Every record is a list which first item is a record type. It is written
+    to the file as a single line in JSON format.
+
+    """
+
+    # Types of journal records
+    RECORD_TYPE_CRAWLING = 'crawling'
+    RECORD_TYPE_PUSH = 'push'
+    RECORD_TYPE_POP = 'pop'
+    RECORD_TYPE_ELEMENT = 'element'
+    RECORD_TYPE_VIEWED = 'viewed'
+    RECORD_TYPE_CHECKED = 'checked'
+    RECORD_TYPE_COMMIT = 'commit'
+
+    def __init__(self, file_name, checkpoint_interval = 60):
+        """Initializes crawling checkpoint journal.
+
+        file_name --           name of journal file
+        checkpoint_interval -- minimum number of seconds between checkpoints
+                               (by default is 60)
+
+        """
+
+        # Check a type of 'file_name' parametr
+        if not isinstance(file_name, basestring):
+            raise TypeError('string type expected')
+        self._file_name = file_name
+
+        # Check a type of 'checkpoint_interval' parametr
+        if not isinstance(checkpoint_interval, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        self._checkpoint_interval = checkpoint_interval
+
+        # self._records contains records which were not written yet,
+        # self._consistent_records_number is a number of the first of them
+        # which describe consistent crawling state
+        self._records = []
+        self._consistent_records_number = 0
+
+        self._journal_file = None
+        self._last_checkpoint_time = time.time()
+        self._checkpoints_number = 0
+
+    @property
+    def file_name(self):
+        """Returns name of journal file."""
+
+        return self._file_name
+
+    @property
+    def checkpoints_number(self):
+        """Returns number of checkpoints written since journal was opened."""
+
+        return self._checkpoints_number
+
+    def load(self):
+        """Loads committed records of journal file and opens it in order
+        to append new records. Records following the last commit record
+        are removed from the file.
+
+        Returns a list of committed records (without commit records).
+        Raises CrawlCheckpointError if journal file can't be read.
+
+        """
+
+        records = []
+        committed_records_number = 0
+        committed_size = 0
+        try:
+            journal_file = open(self._file_name, 'rb')
+        except IOError, error:
+            raise CrawlCheckpointError(self._file_name, str(error))
+        try:
+            # File iterator reads ahead, so tell method can't be used with it
+            while True:
+                line = journal_file.readline()
+                if not line:
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Partially written record
+                    break
+                if not isinstance(record, list) or not record:
+                    break
+                if record[0] == self.RECORD_TYPE_COMMIT:
+                    committed_records_number = len(records)
+                    committed_size = journal_file.tell()
+                else:
+                    records.append(record)
+        finally:
+            journal_file.close()
+        del records[committed_records_number : ]
+
+        # Remove uncommitted records and open the file to append new ones
+        self._journal_file = open(self._file_name, 'r+b')
+        self._journal_file.truncate(committed_size)
+        self._journal_file.seek(committed_size)
+        self._last_checkpoint_time = time.time()
+        return records
+
+    def start(self, crawling_record):
+        """Creates a new journal file (an old one is removed) and writes
+        a record describing crawling preferences to it.
+
+        crawling_record -- list of crawling preferences. It is the first
+                           record returned by load method.
+
+        """
+
+        self._journal_file = open(self._file_name, 'wb')
+        self._records = [[self.RECORD_TYPE_CRAWLING] + list(crawling_record)]
+        self._consistent_records_number = 1
+        self.write_checkpoint()
+
+    def record(self, *record):
+        """Adds a record to journal. It will be written at the next
+        checkpoint, if crawling state is consistent by that moment.
+
+        *record -- record type and its values
+
+        """
+
+        self._records.append(record)
+
+    def mark_consistent(self):
+        """Informs journal that crawling state is consistent, so all the
+        records added so far may be written at the next checkpoint.
+
+        """
+
+        self._consistent_records_number = len(self._records)
+
+    def checkpoint_if_needed(self):
+        """Marks crawling state as consistent and writes checkpoint, if
+        checkpoint interval is over.
+
+        """
+
+        self.mark_consistent()
+        if time.time() - self._last_checkpoint_time >= \
+                self._checkpoint_interval:
+            self.write_checkpoint()
+
+    def write_checkpoint(self):
+        """Appends records describing consistent crawling state to journal
+        file and flushes it to disk.
+
+        """
+
+        if self._journal_file is None:
+            return
+        consistent_records = self._records[ : self._consistent_records_number]
+        del self._records[ : self._consistent_records_number]
+        self._consistent_records_number = 0
+
+        lines = [json.dumps(record) for record in consistent_records]
+        lines.append(json.dumps([self.RECORD_TYPE_COMMIT]))
+        self._journal_file.write('\n'.join(lines) + '\n')
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+        self._last_checkpoint_time = time.time()
+        self._checkpoints_number += 1
+
+    def close(self):
+        """Writes the last checkpoint and closes journal file."""
+
+        if self._journal_file is None:
+            return
+        self.write_checkpoint()
+        self._journal_file.close()
+        self._journal_file = None
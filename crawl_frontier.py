@@ -0,0 +1,473 @@
+import collections     # For using collections.deque
+import heapq           # For using heap queue as a priority queue
+import itertools       # For using itertools.count() function
+import os              # For operations with segment files
+import json            # For serializing spilled crawling information
+import shutil          # For removing segments directory
+import tempfile        # For creating segments directory
+import hashlib         # For computing fingerprints of references
+import struct          # For unpacking fingerprints of references
+import sqlite3         # For keeping index of scheduled references on disk
+
+__doc__ = """
+Contains crawling frontier - a schedule of references that site spider
+has to process.
+"""
+
+__all__ = ["ReferencesCrawlingFrontier"]
+
+class ReferencesCrawlingFrontier(object):
+    """Crawling frontier class. Frontier contains crawling information about
+    references that site spider has to process. Besides the schedule itself
+    it keeps a hashed index of scheduled references, so checking whether a
+    reference is already scheduled doesn't require to look through the whole
+    schedule.
+
+    The order in which references are taken out of the frontier depends on
+    the scheduling strategy:
+    depth-first --   references are taken out in the reverse order to the one
+                     they were put in (just like a stack)
+    breadth-first -- references are taken out in the order they were put in
+                     (just like a queue), so references with less crawling 
+                     depth are always processed first
+    priority --      references are taken out in order of their crawling depth
+                     and then in order of priorities given by a priority 
+                     function (the less value means the higher priority)
+    Breadth-first and priority strategies guarantee that every reference is 
+    processed with the least crawling depth it was found with.
+
+    Depth-first and breadth-first frontiers may keep only a bounded number
+    of crawling information instances in memory. The rest are spilled to
+    segment files on disk and are loaded back when their turn comes: the
+    oldest part of a stack and the middle part of a queue (between its head
+    and its tail) are spilled. Crawling information is written to segment
+    files by encoder function and is restored by decoder function, so it
+    may refer to objects by their identifiers. Index of scheduled references
+    of such a frontier is kept on disk too: it is a SQLite database which
+    maps 64-bit fingerprints of references to their crawling depths, so 
+    memory taken by the frontier doesn't depend on the number of scheduled
+    references.
+
+    """
+
+    # Name of index database file in segments directory
+    INDEX_FILE_NAME = 'index.sqlite'
+
+    # Maximum size of index database pages cached in memory (in kilobytes)
+    INDEX_CACHE_SIZE = 8 * 1024
+
+    # Number of index changes made in a single transaction
+    INDEX_TRANSACTION_SIZE = 10000
+
+    # Scheduling strategies of crawling frontier
+    SCHEDULING_STRATEGY_DEPTH_FIRST = 'depth-first'
+    SCHEDULING_STRATEGY_BREADTH_FIRST = 'breadth-first'
+    SCHEDULING_STRATEGY_PRIORITY = 'priority'
+
+    def __init__(self, scheduling_strategy = SCHEDULING_STRATEGY_DEPTH_FIRST,
+                 reference_priority = None, memory_entries_limit = 0,
+                 segments_directory = None, entry_encoder = None,
+                 entry_decoder = None):
+        """Initializes an empty crawling frontier.
+
+        scheduling_strategy --  strategy which states the order in which 
+                                references are taken out of the frontier
+                                (by default is depth-first)
+        reference_priority --   function which takes ReferenceCrawlingInfo 
+                                class or its subclass instance and returns
+                                its priority. It is used with priority 
+                                scheduling strategy only (by default is None)
+        memory_entries_limit -- maximum number of crawling information 
+                                instances kept in memory, the rest are 
+                                spilled to disk. Index of scheduled 
+                                references is kept on disk if it is stated.
+                                '0' means no limitation.
+                                Priority frontier can't be limited
+                                (by default is 0)
+        segments_directory --   directory where a temporary directory for
+                                segment files and index database is 
+                                created. None means the default temporary
+                                directory (by default is None)
+        entry_encoder --        function which takes crawling information
+                                and returns a list of its values which may
+                                be serialized to JSON. It is required if
+                                memory_entries_limit is stated (by default
+                                is None)
+        entry_decoder --        function which takes a list returned by
+                                entry_encoder and returns crawling 
+                                information (by default is None)
+
+        """
+
+        # Check a value of 'scheduling_strategy' parametr
+        if scheduling_strategy not in (self.SCHEDULING_STRATEGY_DEPTH_FIRST,
+                                       self.SCHEDULING_STRATEGY_BREADTH_FIRST,
+                                       self.SCHEDULING_STRATEGY_PRIORITY):
+            raise ValueError('unknown scheduling strategy: %s' % 
+                             scheduling_strategy)
+        self._scheduling_strategy = scheduling_strategy
+
+        # Check a type of 'reference_priority' parametr
+        if scheduling_strategy == self.SCHEDULING_STRATEGY_PRIORITY and \
+                not callable(reference_priority):
+            raise TypeError('callable type expected')
+        self._reference_priority = reference_priority
+
+        # Check a type of 'memory_entries_limit' parametr
+        if not isinstance(memory_entries_limit, (int, long)):
+            raise TypeError('int or long type expected')
+        if memory_entries_limit:
+            if scheduling_strategy == self.SCHEDULING_STRATEGY_PRIORITY:
+                raise ValueError('priority frontier can`t be spilled to disk')
+            if not callable(entry_encoder) or not callable(entry_decoder):
+                raise TypeError('callable type expected')
+        self._memory_entries_limit = memory_entries_limit
+        # Segments are a half of memory limit, so stack or queue tail may
+        # be spilled while another segment is loaded
+        self._segment_size = max(1, memory_entries_limit // 2)
+        self._segments_directory = segments_directory
+        self._entry_encoder = entry_encoder
+        self._entry_decoder = entry_decoder
+
+        # self._schedule contains ReferenceCrawlingInfo class (or its subclass)
+        # instances. It is a list for depth-first strategy (the top of 
+        # stack), a deque for breadth-first strategy (the head of queue) and
+        # a heap of (depth, priority, sequence number, crawling info) tuples
+        # for priority strategy.
+        # Initialize it with an empty container
+        if scheduling_strategy == self.SCHEDULING_STRATEGY_BREADTH_FIRST:
+            self._schedule = collections.deque()
+        else:
+            self._schedule = []
+        # self._schedule_tail contains crawling information put in the queue
+        # after spilled segments. It is used by breadth-first strategy only.
+        # Initialize it with an empty list
+        self._schedule_tail = []
+        # self._segment_files contains names of segment files in order they
+        # were written. Every segment is a file of crawling information 
+        # encoded to JSON, one per line.
+        # Initialize it with an empty list
+        self._segment_files = []
+        self._segment_files_directory = None
+        self._segment_numbers = itertools.count()
+        self._spilled_entries_number = 0
+        # Number of all the crawling information instances in the schedule,
+        # including spilled and outdated ones
+        self._entries_number = 0
+        # Sequence numbers keep the order of crawling information with equal
+        # depth and priority in the heap
+        self._sequence_numbers = itertools.count()
+        # Index of scheduled references maps every scheduled reference to 
+        # a pair of its least known crawling depth and the number of actual
+        # crawling information instances with this depth. Crawling 
+        # information with other depth is outdated: it was superseded by 
+        # crawling information with lower depth, so it is skipped when taken
+        # out of the frontier. Depths are compared instead of instances,
+        # because spilled instances are recreated when they are loaded.
+        # self._scheduled_references is a dictionary index of a frontier 
+        # without memory limit. Otherwise, index is kept in database 
+        # connected by self._index_connection when the first reference is
+        # scheduled.
+        # Initialize it with an empty dictionary
+        self._scheduled_references = {}
+        self._index_connection = None
+        self._actual_entries_number = 0
+
+    @property
+    def scheduling_strategy(self):
+        """Returns scheduling strategy of the frontier."""
+
+        return self._scheduling_strategy
+
+    @property
+    def spilled_entries_number(self):
+        """Returns number of crawling information instances which were 
+        spilled to disk.
+
+        """
+
+        return self._spilled_entries_number
+
+    @property
+    def is_depth_ordered(self):
+        """Returns True if references are taken out of the frontier in order
+        of their crawling depth and False otherwise.
+
+        """
+
+        return self._scheduling_strategy != \
+                self.SCHEDULING_STRATEGY_DEPTH_FIRST
+
+    def __len__(self):
+        """Returns number of actual crawling information instances
+        in the frontier.
+
+        """
+
+        return self._actual_entries_number
+
+    def __contains__(self, reference):
+        """Checks whether given reference is scheduled.
+
+        reference -- corresponding URL
+
+        """
+
+        return self._get_scheduled_reference(reference) is not None
+
+    def scheduled_depth(self, reference):
+        """Returns the least crawling depth given reference is scheduled with
+        or None if reference is not scheduled.
+
+        reference -- corresponding URL
+
+        """
+
+        scheduled_reference = self._get_scheduled_reference(reference)
+        if scheduled_reference is None:
+            return None
+        return scheduled_reference[0]
+
+    @staticmethod
+    def _get_fingerprint(reference):
+        """Returns 64-bit fingerprint of given reference (the first 8 bytes
+        of its MD5 digest) as a signed integer, which is a SQLite key.
+
+        """
+
+        if isinstance(reference, unicode):
+            reference = reference.encode('utf-8')
+        return struct.unpack('<q', hashlib.md5(reference).digest()[ : 8])[0]
+
+    def _create_segment_files_directory(self):
+        """Creates a temporary directory for segment files and index 
+        database if it is not created yet.
+
+        """
+
+        if self._segment_files_directory is None:
+            self._segment_files_directory = tempfile.mkdtemp(
+                    prefix = 'frontier', dir = self._segments_directory)
+
+    def _get_index_connection(self):
+        """Returns connection to index database. Creates the database if it
+        is not connected yet.
+
+        """
+
+        if self._index_connection is None:
+            self._create_segment_files_directory()
+            # Index is temporary, so it is neither journaled nor synchronized
+            # with disk. Changes are committed by batches, because writing
+            # every change to the file takes most of the time.
+            self._index_connection = sqlite3.connect(
+                    os.path.join(self._segment_files_directory,
+                                 self.INDEX_FILE_NAME))
+            self._index_connection.execute('PRAGMA journal_mode = OFF')
+            self._index_connection.execute('PRAGMA synchronous = OFF')
+            self._index_connection.execute('PRAGMA cache_size = -%d' % 
+                                           self.INDEX_CACHE_SIZE)
+            self._index_connection.execute(
+                    'CREATE TABLE IF NOT EXISTS scheduled_references '
+                    '(fingerprint INTEGER PRIMARY KEY, depth INTEGER, '
+                    'entries_number INTEGER)')
+            self._index_changes_number = 0
+        return self._index_connection
+
+    def _change_index(self, statement, parameters):
+        """Executes statement changing index database. Commits changes
+        when their number reaches the size of a transaction.
+
+        """
+
+        index_connection = self._get_index_connection()
+        index_connection.execute(statement, parameters)
+        self._index_changes_number += 1
+        if self._index_changes_number >= self.INDEX_TRANSACTION_SIZE:
+            index_connection.commit()
+            self._index_changes_number = 0
+
+    def _get_scheduled_reference(self, reference):
+        """Looks for given reference in the index of scheduled references.
+
+        Returns a (depth, number of actual crawling information instances)
+        pair or None if reference is not scheduled.
+
+        """
+
+        if not self._memory_entries_limit:
+            return self._scheduled_references.get(reference)
+        return self._get_index_connection().execute(
+                'SELECT depth, entries_number FROM scheduled_references '
+                'WHERE fingerprint = ?',
+                (self._get_fingerprint(reference), )).fetchone()
+
+    def _set_scheduled_reference(self, reference, depth, entries_number):
+        """Puts given reference in the index of scheduled references with
+        given depth and number of actual crawling information instances.
+        Reference is removed from the index if there are no actual 
+        instances.
+
+        """
+
+        if not self._memory_entries_limit:
+            if entries_number:
+                self._scheduled_references[reference] = (depth, 
+                                                         entries_number)
+            else:
+                del self._scheduled_references[reference]
+        elif entries_number:
+            self._change_index('INSERT OR REPLACE INTO scheduled_references '
+                               'VALUES (?, ?, ?)',
+                               (self._get_fingerprint(reference), depth, 
+                                entries_number))
+        else:
+            self._change_index('DELETE FROM scheduled_references '
+                               'WHERE fingerprint = ?',
+                               (self._get_fingerprint(reference), ))
+
+    def push(self, reference_crawling_info):
+        """Puts reference crawling information in the frontier.
+        If the reference is already scheduled with greater depth, previously
+        scheduled crawling information becomes outdated and won't be taken out
+        of the frontier. If the reference is already scheduled with less depth,
+        given crawling information is outdated at once.
+
+        reference_crawling_info -- ReferenceCrawlingInfo class or its subclass
+                                   instance
+
+        """
+
+        reference = reference_crawling_info.reference
+        depth = reference_crawling_info.depth
+        scheduled_reference = self._get_scheduled_reference(reference)
+        if scheduled_reference is None:
+            self._set_scheduled_reference(reference, depth, 1)
+            self._actual_entries_number += 1
+        elif depth < scheduled_reference[0]:
+            # Reference is queued again with better depth
+            self._actual_entries_number -= scheduled_reference[1] - 1
+            self._set_scheduled_reference(reference, depth, 1)
+        elif depth == scheduled_reference[0]:
+            self._set_scheduled_reference(reference, depth, 
+                                          scheduled_reference[1] + 1)
+            self._actual_entries_number += 1
+        # Otherwise, there is no point to process reference with greater 
+        # depth, so crawling information is outdated at once
+
+        self._entries_number += 1
+        if self._scheduling_strategy == self.SCHEDULING_STRATEGY_PRIORITY:
+            priority = self._reference_priority(reference_crawling_info)
+            heapq.heappush(self._schedule, 
+                           (depth, priority, next(self._sequence_numbers),
+                            reference_crawling_info))
+        elif self._scheduling_strategy == \
+                self.SCHEDULING_STRATEGY_BREADTH_FIRST and \
+                (self._segment_files or self._schedule_tail or
+                 (self._memory_entries_limit and
+                  len(self._schedule) >= self._memory_entries_limit)):
+            # Queue head is full, so crawling information is put in the tail
+            self._schedule_tail.append(reference_crawling_info)
+            if len(self._schedule_tail) >= self._segment_size:
+                self._write_segment(self._schedule_tail)
+                self._schedule_tail = []
+        else:
+            self._schedule.append(reference_crawling_info)
+            if self._memory_entries_limit and \
+                    len(self._schedule) > self._memory_entries_limit:
+                # Spill the bottom of the stack
+                self._write_segment(self._schedule[ : self._segment_size])
+                del self._schedule[ : self._segment_size]
+
+    def _write_segment(self, reference_crawling_infos):
+        """Writes crawling information to a new segment file."""
+
+        self._create_segment_files_directory()
+        segment_file_name = os.path.join(self._segment_files_directory,
+                '%d.segment' % next(self._segment_numbers))
+        segment_file = open(segment_file_name, 'wb')
+        try:
+            for reference_crawling_info in reference_crawling_infos:
+                segment_file.write(json.dumps(
+                        self._entry_encoder(reference_crawling_info)))
+                segment_file.write('\n')
+        finally:
+            segment_file.close()
+        self._segment_files.append(segment_file_name)
+        self._spilled_entries_number += len(reference_crawling_infos)
+
+    def _read_segment(self, segment_file_name):
+        """Reads crawling information of a segment file and removes it."""
+
+        segment_file = open(segment_file_name, 'rb')
+        try:
+            reference_crawling_infos = [
+                    self._entry_decoder(json.loads(line))
+                    for line in segment_file]
+        finally:
+            segment_file.close()
+        os.remove(segment_file_name)
+        return reference_crawling_infos
+
+    def _pop_schedule_entry(self):
+        """Takes the next crawling information out of the schedule according 
+        to the scheduling strategy. Spilled crawling information is loaded
+        when memory part of the schedule is exhausted.
+        
+        """
+
+        self._entries_number -= 1
+        if self._scheduling_strategy == self.SCHEDULING_STRATEGY_DEPTH_FIRST:
+            if not self._schedule:
+                # Load the newest spilled part of the stack
+                self._schedule = self._read_segment(self._segment_files.pop())
+            return self._schedule.pop()
+        elif self._scheduling_strategy == self.SCHEDULING_STRATEGY_BREADTH_FIRST:
+            if not self._schedule:
+                if self._segment_files:
+                    # Load the oldest spilled part of the queue
+                    self._schedule.extend(self._read_segment(
+                            self._segment_files.pop(0)))
+                else:
+                    self._schedule.extend(self._schedule_tail)
+                    self._schedule_tail = []
+            return self._schedule.popleft()
+        else:
+            return heapq.heappop(self._schedule)[-1]
+
+    def pop(self):
+        """Takes the next actual crawling information out of the frontier
+        according to the scheduling strategy.
+
+        Returns ReferenceCrawlingInfo class or its subclass instance.
+        Raises IndexError exception if the frontier is empty.
+
+        """
+
+        while self._entries_number:
+            reference_crawling_info = self._pop_schedule_entry()
+            reference = reference_crawling_info.reference
+            # Skip outdated crawling information
+            scheduled_reference = self._get_scheduled_reference(reference)
+            if scheduled_reference is None or \
+                    scheduled_reference[0] != reference_crawling_info.depth:
+                continue
+
+            # Remove crawling information from the index
+            self._set_scheduled_reference(reference, scheduled_reference[0],
+                                          scheduled_reference[1] - 1)
+            self._actual_entries_number -= 1
+            return reference_crawling_info
+
+        raise IndexError('pop from empty frontier')
+
+    def close(self):
+        """Removes segment files and index database of the frontier."""
+
+        if self._index_connection is not None:
+            self._index_connection.close()
+            self._index_connection = None
+        if self._segment_files_directory is not None:
+            shutil.rmtree(self._segment_files_directory, ignore_errors = True)
+            self._segment_files_directory = None
+        self._segment_files = []
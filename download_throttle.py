@@ -0,0 +1,375 @@
+import threading      # For using threading.Lock
+import time           # For using time.time() and time.sleep() functions
+import email.utils    # For parsing HTTP dates
+
+__doc__ = """
+Contains classes which restrict the rate of requests site spider sends to
+website servers.
+"""
+
+__all__ = ["TokenBucket", "HostTokenBuckets", "AdaptiveDownloadThrottle",
+           "parse_retry_after"]
+
+class TokenBucket(object):
+    """Token bucket class. Bucket is filled with tokens at a constant rate
+    up to its capacity, every request consumes one token. So bucket allows
+    short bursts of requests, but restricts average requests rate.
+    Bucket may be shared between several threads.
+
+    """
+
+    def __init__(self, rate, capacity = 1):
+        """Initializes token bucket. Bucket is full at the beginning.
+
+        rate --     number of tokens added to the bucket per second
+        capacity -- maximum number of tokens in the bucket (by default is 1)
+
+        """
+
+        # Check a type of 'rate' parametr
+        if not isinstance(rate, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        if rate <= 0:
+            raise ValueError('rate has to be positive')
+        self._rate = float(rate)
+
+        # Check a type of 'capacity' parametr
+        if not isinstance(capacity, (int, long)):
+            raise TypeError('int or long type expected')
+        if capacity < 1:
+            raise ValueError('capacity has to be positive')
+        self._capacity = capacity
+
+        self._tokens = float(capacity)
+        self._last_update_time = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """Returns number of tokens added to the bucket per second."""
+
+        return self._rate
+
+    @rate.setter
+    def rate(self, new_rate):
+        """Sets number of tokens added to the bucket per second."""
+
+        # Check a type of 'new_rate' parametr
+        if not isinstance(new_rate, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        if new_rate <= 0:
+            raise ValueError('rate has to be positive')
+        with self._lock:
+            self._refill()
+            self._rate = float(new_rate)
+
+    def _refill(self):
+        """Adds tokens which were accumulated since the last update."""
+
+        current_time = time.time()
+        elapsed_time = max(0.0, current_time - self._last_update_time)
+        self._tokens = min(self._capacity,
+                           self._tokens + elapsed_time * self._rate)
+        self._last_update_time = current_time
+
+    def consume(self):
+        """Consumes one token. Blocks until a token is available."""
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                waiting_time = (1 - self._tokens) / self._rate
+            time.sleep(waiting_time)
+
+
+class HostTokenBuckets(object):
+    """Collection of token buckets, one bucket per website host. It is used
+    to restrict requests rate to every host separately.
+    Collection may be shared between several threads.
+
+    """
+
+    def __init__(self, rate, capacity = 1):
+        """Initializes an empty collection of token buckets.
+
+        rate --     number of requests per second allowed for every host
+        capacity -- maximum number of requests which may be sent to a host
+                    at once (by default is 1)
+
+        """
+
+        self._rate = rate
+        self._capacity = capacity
+        # self._buckets maps host names to their token buckets.
+        # Initialize it with an empty dictionary
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """Returns number of requests per second allowed for every host."""
+
+        return self._rate
+
+    @rate.setter
+    def rate(self, new_rate):
+        """Sets number of requests per second allowed for every host."""
+
+        with self._lock:
+            self._rate = new_rate
+            for bucket in self._buckets.itervalues():
+                bucket.rate = new_rate
+
+    def get_bucket(self, host):
+        """Returns token bucket of given host. Creates it if needed.
+
+        host -- host name
+
+        """
+
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self._rate, self._capacity)
+                self._buckets[host] = bucket
+            return bucket
+
+    def consume(self, host):
+        """Consumes one token of given host. Blocks until a token is
+        available.
+
+        host -- host name
+
+        """
+
+        self.get_bucket(host).consume()
+
+
+def parse_retry_after(retry_after):
+    """Parses value of Retry-After HTTP header.
+
+    retry_after -- header value: number of seconds or HTTP date
+
+    Returns number of seconds to wait before the next request or None if
+    header value is invalid or missing.
+
+    """
+
+    if not retry_after:
+        return None
+    retry_after = retry_after.strip()
+    if retry_after.isdigit():
+        return int(retry_after)
+    retry_date = email.utils.parsedate_tz(retry_after)
+    if retry_date is None:
+        return None
+    return max(0, email.utils.mktime_tz(retry_date) - time.time())
+
+
+class AdaptiveDownloadThrottle(object):
+    """Download throttle which adapts interval between requests to server
+    state with additive-increase/multiplicative-decrease (AIMD) algorithm.
+    While server answers quickly, requests rate is increased by a constant
+    step after every response. When server becomes slow (response time is
+    much greater than its average) or asks to slow down with 429 or 503
+    status code, requests rate is decreased by a constant factor. Retry-After
+    header of such responses pauses requests for a given time.
+    Interval between requests is always kept between given floor and
+    ceiling. Throttle may be shared between several threads.
+
+    """
+
+    # Weight of the last response time in average response time
+    RESPONSE_TIME_WEIGHT = 0.2
+    # Responses which take less seconds are never considered as slow,
+    # because small response times are mostly noise
+    MIN_SLOW_RESPONSE_TIME = 0.5
+
+    def __init__(self, min_delay = 0, max_delay = 60, start_delay = None,
+                 rate_increase = 0.1, rate_decrease_factor = 0.5,
+                 slow_response_factor = 2.0):
+        """Initializes download throttle.
+
+        min_delay --            floor of interval between requests in 
+                                seconds (by default is 0)
+        max_delay --            ceiling of interval between requests in
+                                seconds (by default is 60)
+        start_delay --          interval between requests at the beginning.
+                                None means max_delay (by default is None)
+        rate_increase --        number of requests per second added to
+                                requests rate after every quick response
+                                (by default is 0.1)
+        rate_decrease_factor -- factor requests rate is multiplied by when
+                                server is slow or overloaded 
+                                (by default is 0.5)
+        slow_response_factor -- response is considered as slow if its
+                                response time is that many times greater 
+                                than average response time (by default is 2)
+
+        """
+
+        # Check types of parametrs
+        for parametr in (min_delay, max_delay, rate_increase,
+                         rate_decrease_factor, slow_response_factor):
+            if not isinstance(parametr, (int, long, float)):
+                raise TypeError('int, long or float type expected')
+        if start_delay is None:
+            start_delay = max_delay
+        if not isinstance(start_delay, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        if min_delay < 0 or max_delay < min_delay:
+            raise ValueError('0 <= min_delay <= max_delay expected')
+        if not 0 < rate_decrease_factor < 1:
+            raise ValueError('rate_decrease_factor has to be in (0, 1)')
+
+        self._min_delay = float(min_delay)
+        self._max_delay = float(max_delay)
+        self._rate_increase = rate_increase
+        self._rate_decrease_factor = rate_decrease_factor
+        self._slow_response_factor = slow_response_factor
+        self._delay = self._bound_delay(float(start_delay))
+
+        # Exponentially weighted moving average of response time
+        self._average_response_time = None
+        # Time the next request may be sent at
+        self._next_request_time = 0.0
+        self._lock = threading.Lock()
+
+        # Throttle statistics
+        self._requests_number = 0
+        self._overload_responses_number = 0
+        self._first_request_time = None
+        self._last_request_time = None
+
+    @property
+    def delay(self):
+        """Returns current interval between requests in seconds."""
+
+        return self._delay
+
+    @property
+    def min_delay(self):
+        """Returns floor of interval between requests in seconds."""
+
+        return self._min_delay
+
+    @min_delay.setter
+    def min_delay(self, new_min_delay):
+        """Sets floor of interval between requests in seconds. Ceiling is
+        raised if it is less than the new floor.
+
+        """
+
+        # Check a type of 'new_min_delay' parametr
+        if not isinstance(new_min_delay, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        if new_min_delay < 0:
+            raise ValueError('min_delay has to be non-negative')
+        with self._lock:
+            self._min_delay = float(new_min_delay)
+            self._max_delay = max(self._max_delay, self._min_delay)
+            self._delay = self._bound_delay(self._delay)
+
+    @property
+    def max_delay(self):
+        """Returns ceiling of interval between requests in seconds."""
+
+        return self._max_delay
+
+    @property
+    def requests_number(self):
+        """Returns number of requests sent so far."""
+
+        return self._requests_number
+
+    @property
+    def overload_responses_number(self):
+        """Returns number of responses with 429 or 503 status code."""
+
+        return self._overload_responses_number
+
+    @property
+    def effective_request_rate(self):
+        """Returns average number of requests sent per second so far."""
+
+        if self._requests_number < 2 or \
+                self._last_request_time == self._first_request_time:
+            return 0.0
+        return (self._requests_number - 1) / \
+               (self._last_request_time - self._first_request_time)
+
+    def _bound_delay(self, delay):
+        """Returns given delay bounded by floor and ceiling."""
+
+        return min(self._max_delay, max(self._min_delay, delay))
+
+    def _decrease_rate(self):
+        """Decreases requests rate multiplicatively."""
+
+        if self._delay:
+            self._delay = self._bound_delay(self._delay / 
+                                            self._rate_decrease_factor)
+        else:
+            # Requests are not restricted, so start with one request at
+            # a time
+            self._delay = self._bound_delay(self._average_response_time or 1)
+
+    def wait(self):
+        """Blocks until the next request may be sent."""
+
+        with self._lock:
+            current_time = time.time()
+            request_time = max(current_time, self._next_request_time)
+            self._next_request_time = request_time + self._delay
+            self._requests_number += 1
+            if self._first_request_time is None:
+                self._first_request_time = request_time
+            self._last_request_time = request_time
+        if request_time > current_time:
+            time.sleep(request_time - current_time)
+
+    def response_received(self, response_time):
+        """Informs throttle about received response.
+
+        response_time -- number of seconds from sending request to receiving
+                         response headers
+
+        """
+
+        with self._lock:
+            if self._average_response_time is not None and \
+                    response_time >= self.MIN_SLOW_RESPONSE_TIME and \
+                    response_time > self._slow_response_factor * \
+                                    self._average_response_time:
+                # Server becomes slow
+                self._decrease_rate()
+            elif self._delay:
+                # Increase requests rate additively
+                self._delay = self._bound_delay(1.0 / 
+                        (1.0 / self._delay + self._rate_increase))
+            if self._average_response_time is None:
+                self._average_response_time = response_time
+            else:
+                self._average_response_time += self.RESPONSE_TIME_WEIGHT * \
+                        (response_time - self._average_response_time)
+
+    def server_overloaded(self, retry_after = None):
+        """Informs throttle that server asked to slow down (responded with
+        429 or 503 status code).
+
+        retry_after -- number of seconds server asked to wait before the
+                       next request or None
+
+        """
+
+        with self._lock:
+            self._overload_responses_number += 1
+            self._decrease_rate()
+            pause_time = self._delay
+            if retry_after is not None:
+                pause_time = max(pause_time, retry_after)
+            self._next_request_time = max(self._next_request_time,
+                                          time.time() + pause_time)
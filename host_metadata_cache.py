@@ -0,0 +1,214 @@
+import os             # For operations with cache file
+import json           # For serializing cache contents
+import socket         # For resolving host names
+import threading      # For using threading.Lock
+import time           # For using time.time() function
+
+__doc__ = """
+Contains on-disk cache of website host metadata (robots.txt files, resolved
+host addresses and homepage redirections), which allows site spider to skip
+these requests while crawling the same website again.
+"""
+
+__all__ = ["HostMetadataCache"]
+
+class HostMetadataCache(object):
+    """On-disk cache of website host metadata. Every cached value has an
+    expiry time, expired values are considered as missing. Cache is loaded
+    from its file on creation and is written back by save method.
+    Cache may be shared between several threads.
+
+    """
+
+    # Sections of cache
+    SECTION_ROBOTSTXT = 'robotstxt'
+    SECTION_ADDRESSES = 'addresses'
+    SECTION_REDIRECTS = 'redirects'
+
+    def __init__(self, file_name, time_to_live = 24 * 60 * 60):
+        """Initializes cache and loads it from its file if the file exists.
+
+        file_name --    name of cache file
+        time_to_live -- number of seconds cached values are valid for
+                        (by default is 1 day)
+
+        """
+
+        # Check a type of 'file_name' parametr
+        if not isinstance(file_name, basestring):
+            raise TypeError('string type expected')
+        self._file_name = file_name
+
+        # Check a type of 'time_to_live' parametr
+        if not isinstance(time_to_live, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        self._time_to_live = time_to_live
+
+        # self._sections maps section names to dictionaries, which map keys
+        # to (storing time, value) pairs
+        self._sections = {self.SECTION_ROBOTSTXT: {},
+                          self.SECTION_ADDRESSES: {},
+                          self.SECTION_REDIRECTS: {}}
+        self._lock = threading.Lock()
+        self._is_modified = False
+
+        # Cache statistics
+        self._hits_number = 0
+        self._misses_number = 0
+
+        self._load()
+
+    @property
+    def hits_number(self):
+        """Returns number of values found in cache."""
+
+        return self._hits_number
+
+    @property
+    def misses_number(self):
+        """Returns number of values missing in cache."""
+
+        return self._misses_number
+
+    def _load(self):
+        """Loads cache file. Damaged or missing file means empty cache."""
+
+        try:
+            cache_file = open(self._file_name, 'rb')
+        except IOError:
+            return
+        try:
+            sections = json.load(cache_file)
+        except ValueError:
+            return
+        finally:
+            cache_file.close()
+        if not isinstance(sections, dict):
+            return
+        for section_name, section in self._sections.iteritems():
+            loaded_section = sections.get(section_name)
+            if isinstance(loaded_section, dict):
+                section.update(loaded_section)
+
+    def save(self):
+        """Writes unexpired cache values to cache file, if cache was
+        modified. The file is written to a temporary file first and then
+        renamed, so it is never written partially.
+
+        """
+
+        with self._lock:
+            if not self._is_modified:
+                return
+            current_time = time.time()
+            sections = {}
+            for section_name, section in self._sections.iteritems():
+                sections[section_name] = dict(
+                        (key, stored_value)
+                        for key, stored_value in section.iteritems()
+                        if current_time - stored_value[0] <
+                           self._time_to_live)
+            self._is_modified = False
+
+        cache_directory = os.path.dirname(self._file_name)
+        if cache_directory and not os.path.isdir(cache_directory):
+            os.makedirs(cache_directory)
+        temporary_file_name = self._file_name + '.tmp'
+        temporary_file = open(temporary_file_name, 'wb')
+        try:
+            json.dump(sections, temporary_file)
+        finally:
+            temporary_file.close()
+        os.rename(temporary_file_name, self._file_name)
+
+    def _get(self, section_name, key):
+        """Returns cached unexpired value or None if there is no such
+        value.
+
+        """
+
+        with self._lock:
+            stored_value = self._sections[section_name].get(key)
+            if stored_value is None or \
+                    time.time() - stored_value[0] >= self._time_to_live:
+                self._misses_number += 1
+                return None
+            self._hits_number += 1
+            return stored_value[1]
+
+    def _set(self, section_name, key, value):
+        """Stores value in cache."""
+
+        with self._lock:
+            self._sections[section_name][key] = (time.time(), value)
+            self._is_modified = True
+
+    def get_robotstxt(self, host_address):
+        """Returns cached robots.txt file contents of given host or None.
+
+        host_address -- URL of host root (scheme and host name)
+
+        """
+
+        robotstxt_text = self._get(self.SECTION_ROBOTSTXT, host_address)
+        if robotstxt_text is None:
+            return None
+        # File contents are stored as latin-1 text, which keeps any bytes
+        return robotstxt_text.encode('latin-1')
+
+    def set_robotstxt(self, host_address, robotstxt_text):
+        """Stores robots.txt file contents of given host.
+
+        host_address --   URL of host root (scheme and host name)
+        robotstxt_text -- robots.txt file contents
+
+        """
+
+        # JSON requires text, but file contents may have any encoding
+        self._set(self.SECTION_ROBOTSTXT, host_address,
+                  robotstxt_text.decode('latin-1'))
+
+    def get_homepage_redirect(self, homepage_address):
+        """Returns cached URL the homepage is redirected to or None.
+
+        homepage_address -- URL of website homepage
+
+        """
+
+        return self._get(self.SECTION_REDIRECTS, homepage_address)
+
+    def set_homepage_redirect(self, homepage_address, redirect_address):
+        """Stores URL the homepage is redirected to.
+
+        homepage_address -- URL of website homepage
+        redirect_address -- URL the homepage is redirected to
+
+        """
+
+        self._set(self.SECTION_REDIRECTS, homepage_address, redirect_address)
+
+    def resolve_host(self, host, port):
+        """Resolves host name. Takes addresses from cache if they are cached
+        or resolves host name and caches them otherwise.
+
+        host -- host name
+        port -- port number
+
+        Returns a list of (family, socket type, protocol, socket address)
+        tuples just like socket.getaddrinfo function.
+        Raises socket.error in case of resolving errors.
+
+        """
+
+        key = '%s:%s' % (host, port)
+        addresses = self._get(self.SECTION_ADDRESSES, key)
+        if addresses:
+            return [(family, socket_type, protocol, tuple(socket_address))
+                    for family, socket_type, protocol, socket_address
+                    in addresses]
+        addresses = [(family, socket_type, protocol, socket_address)
+                     for family, socket_type, protocol, _, socket_address
+                     in socket.getaddrinfo(host, port, 0,
+                                           socket.SOCK_STREAM)]
+        self._set(self.SECTION_ADDRESSES, key, addresses)
+        return addresses
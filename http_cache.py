@@ -0,0 +1,317 @@
+import os             # For operations with cache files
+import hashlib        # For forming cache file names
+import json           # For serializing cache entries metadata
+import mimetools      # For using mimetools.Message class
+import threading      # For using threading.Lock
+import time           # For using time.time() function
+import urllib         # For using urllib.addinfourl class
+
+from cStringIO import StringIO
+
+__doc__ = """
+Contains on-disk cache of HTTP responses which allows site spider to
+download only changed resourses while crawling the same website again.
+"""
+
+__all__ = ["HTTPResponseCache", "HTTPCacheEntry"]
+
+class HTTPCacheEntry(object):
+    """Class for cache entries. Cache entry contains metadata of a cached
+    response: its validators (ETag and Last-Modified headers), headers and
+    URL of the resourse after redirects. Response body is stored
+    separately.
+
+    """
+
+    def __init__(self, reference, final_reference, headers_text, etag,
+                 last_modified, body_size, stored_time):
+        self.reference = reference
+        self.final_reference = final_reference
+        self.headers_text = headers_text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_size = body_size
+        self.stored_time = stored_time
+
+    def to_dict(self):
+        """Returns dictionary containing cache entry metadata."""
+
+        return {'reference': self.reference,
+                'final_reference': self.final_reference,
+                'headers': self.headers_text,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'body_size': self.body_size,
+                'stored_time': self.stored_time}
+
+    @staticmethod
+    def from_dict(entry_dict):
+        """Creates cache entry by dictionary returned by to_dict method."""
+
+        return HTTPCacheEntry(entry_dict['reference'],
+                              entry_dict['final_reference'],
+                              entry_dict['headers'], entry_dict['etag'],
+                              entry_dict['last_modified'],
+                              entry_dict['body_size'],
+                              entry_dict['stored_time'])
+
+    @property
+    def validation_headers(self):
+        """Returns dictionary of conditional request headers which allow
+        server to answer that resourse was not modified.
+
+        """
+
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HTTPResponseCache(object):
+    """On-disk cache of HTTP responses. Only responses which have
+    validators are cached, so cached responses are always revalidated with
+    conditional requests. Every entry is stored in two files: metadata file
+    and body file. Files are written to temporary files first and then
+    renamed, so cache files are never written partially.
+    Cache may be shared between several threads.
+
+    """
+
+    METADATA_FILE_EXTENSION = '.json'
+    BODY_FILE_EXTENSION = '.body'
+
+    def __init__(self, directory):
+        """Initializes cache. Creates cache directory if needed.
+
+        directory -- name of cache directory
+
+        """
+
+        # Check a type of 'directory' parametr
+        if not isinstance(directory, basestring):
+            raise TypeError('string type expected')
+        self._directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+
+        # Cache statistics
+        self._hits_number = 0
+        self._misses_number = 0
+        self._saved_bytes_number = 0
+
+    @property
+    def hits_number(self):
+        """Returns number of requests answered from cache."""
+
+        return self._hits_number
+
+    @property
+    def misses_number(self):
+        """Returns number of requests answered by server with full
+        response.
+
+        """
+
+        return self._misses_number
+
+    @property
+    def saved_bytes_number(self):
+        """Returns number of response body bytes which were not downloaded
+        because of cache hits.
+
+        """
+
+        return self._saved_bytes_number
+
+    def _get_file_name(self, reference, extension):
+        """Returns name of a cache file corresponding to given reference."""
+
+        if isinstance(reference, unicode):
+            reference = reference.encode('utf-8')
+        reference_hash = hashlib.sha1(reference).hexdigest()
+        return os.path.join(self._directory, reference_hash[ : 2],
+                            reference_hash + extension)
+
+    def _write_file(self, file_name, data):
+        """Writes data to a temporary file and renames it to given file
+        name, so other threads and processes never see the file written
+        partially.
+
+        """
+
+        file_directory = os.path.dirname(file_name)
+        if not os.path.isdir(file_directory):
+            try:
+                os.makedirs(file_directory)
+            except OSError:
+                # Directory was created by another thread
+                pass
+        temporary_file_name = '%s.%d.%d.tmp' % (file_name, os.getpid(),
+                                                threading.current_thread().ident)
+        temporary_file = open(temporary_file_name, 'wb')
+        try:
+            temporary_file.write(data)
+        finally:
+            temporary_file.close()
+        os.rename(temporary_file_name, file_name)
+
+    def get_entry(self, reference):
+        """Looks for cached response corresponding to given reference.
+
+        reference -- corresponding URL
+
+        Returns HTTPCacheEntry class instance or None if there is no
+        cached response.
+
+        """
+
+        metadata_file_name = self._get_file_name(reference,
+                                                 self.METADATA_FILE_EXTENSION)
+        try:
+            metadata_file = open(metadata_file_name, 'rb')
+        except IOError:
+            return None
+        try:
+            entry = HTTPCacheEntry.from_dict(json.load(metadata_file))
+        except (ValueError, KeyError):
+            # Damaged metadata file
+            return None
+        finally:
+            metadata_file.close()
+        if entry.reference != reference:
+            return None
+        return entry
+
+    def open_cached_resourse(self, entry):
+        """Opens cached response and counts cache hit.
+
+        entry -- HTTPCacheEntry class instance
+
+        Returns file-like object just like the one returned by urllib2 or
+        None if response body can't be read.
+
+        """
+
+        body_file_name = self._get_file_name(entry.reference,
+                                             self.BODY_FILE_EXTENSION)
+        try:
+            body_file = open(body_file_name, 'rb')
+        except IOError:
+            return None
+        try:
+            body = body_file.read()
+        finally:
+            body_file.close()
+
+        with self._lock:
+            self._hits_number += 1
+            self._saved_bytes_number += len(body)
+
+        headers = mimetools.Message(StringIO(entry.headers_text))
+        resourse = urllib.addinfourl(StringIO(body), headers,
+                                     entry.final_reference)
+        resourse.code = 200
+        resourse.msg = 'OK'
+        return resourse
+
+    def cache_resourse(self, reference, resourse):
+        """Counts cache miss and wraps downloaded resourse, so its body
+        is stored in cache when it is read completely. Resourses without
+        validators are not stored.
+
+        reference -- requested URL
+        resourse --  file-like object returned by urllib2
+
+        Returns file-like object which has to be used instead of given one.
+
+        """
+
+        with self._lock:
+            self._misses_number += 1
+
+        headers = resourse.info()
+        etag = headers.getheader('ETag')
+        last_modified = headers.getheader('Last-Modified')
+        if not etag and not last_modified:
+            return resourse
+
+        def store_body(body):
+            entry = HTTPCacheEntry(reference, resourse.geturl(),
+                                   ''.join(headers.headers), etag,
+                                   last_modified, len(body), time.time())
+            self._write_file(self._get_file_name(reference,
+                                                 self.BODY_FILE_EXTENSION),
+                             body)
+            self._write_file(self._get_file_name(reference,
+                                                 self.METADATA_FILE_EXTENSION),
+                             json.dumps(entry.to_dict()))
+
+        caching_file = _CachingResponseFile(resourse, store_body)
+        caching_resourse = urllib.addinfourl(caching_file, headers,
+                                             resourse.geturl())
+        caching_resourse.code = resourse.code
+        caching_resourse.msg = resourse.msg
+        return caching_resourse
+
+
+class _CachingResponseFile(object):
+    """File-like wrapper of downloaded resourse which collects everything
+    read from the resourse and passes it to a callback when resourse is
+    read completely.
+
+    """
+
+    def __init__(self, resourse, on_complete):
+        self._resourse = resourse
+        self._on_complete = on_complete
+        self._chunks = []
+
+    def _complete(self):
+        if self._chunks is not None:
+            self._on_complete(''.join(self._chunks))
+            self._chunks = None
+
+    def read(self, size = -1):
+        if size is None or size < 0:
+            data = self._resourse.read()
+        else:
+            data = self._resourse.read(size)
+        if self._chunks is not None and data:
+            self._chunks.append(data)
+        if not data or size is None or size < 0:
+            self._complete()
+        return data
+
+    def readline(self, size = -1):
+        data = self._resourse.readline(size)
+        if self._chunks is not None and data:
+            self._chunks.append(data)
+        if not data:
+            self._complete()
+        return data
+
+    def readlines(self, sizehint = 0):
+        lines = []
+        while True:
+            line = self.readline()
+            if not line:
+                return lines
+            lines.append(line)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def close(self):
+        self._chunks = None
+        self._resourse.close()
@@ -0,0 +1,840 @@
+import urllib         # For using urllib.addinfourl class
+import urllib2        # For using urllib2 handlers
+import httplib        # For using HTTP connections
+import socket         # For using socket._fileobject class and socket.error
+import threading      # For using threading.Lock
+import time           # For using time.time() function
+import zlib           # For decompressing encoded responses
+
+__doc__ = """
+Contains HTTP transport classes used by site spider for downloading
+site resourses: pool of persistent (keep-alive) HTTP connections and
+urllib2 handlers which send requests through this pool and which decode
+compressed responses.
+"""
+
+__all__ = ["HTTPConnectionPool", "KeepAliveHTTPHandler",
+           "KeepAliveHTTPSHandler", "TimeoutHTTPHandler",
+           "TimeoutHTTPSHandler", "ContentDecodingProcessor"]
+
+class _DeadlineSocket(object):
+    """Socket wrapper which restricts time of waiting for data from server.
+    Every receiving waits not longer than read timeout and not longer than
+    until request deadline of the connection socket belongs to. So server
+    which sends response very slowly can't hold the request longer than
+    request timeout.
+
+    """
+
+    def __init__(self, sock, connection):
+        self._sock = sock
+        self._connection = connection
+
+    def recv(self, size):
+        timeout = self._connection.get_receiving_timeout()
+        if timeout is not None and timeout <= 0:
+            raise socket.timeout('request timed out')
+        self._sock.settimeout(timeout)
+        return self._sock.recv(size)
+
+    def makefile(self, mode = 'r', bufsize = -1):
+        # Socket file may outlive socket (e.g. if connection is closed right
+        # after response headers were received), so the file is created by 
+        # socket itself and only its receiving is restricted
+        socket_file = self._sock.makefile(mode, bufsize)
+        socket_file._sock = _DeadlineSocket(socket_file._sock,
+                                            self._connection)
+        return socket_file
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class _TimeoutConnectionMixin:
+    """Mixin of HTTP connection classes which uses different timeouts for
+    establishing connection, for waiting for data from server and for the
+    whole request. Connection timeout is given by timeout parametr just like
+    for httplib.HTTPConnection. Request timeout is counted from sending of
+    request (including establishing of connection) to receiving of the last
+    response byte.
+    It is an old-style class just like httplib connection classes, so
+    their constructors are not hidden by object constructor.
+
+    """
+
+    _read_timeout = None
+    _request_timeout = None
+    _request_deadline = None
+
+    def set_timeouts(self, read_timeout, request_timeout):
+        """Sets read timeout and request timeout. None means no timeout."""
+
+        self._read_timeout = read_timeout
+        self._request_timeout = request_timeout
+
+    def get_receiving_timeout(self):
+        """Returns number of seconds the next receiving may last or None if
+        it is not restricted.
+
+        """
+
+        if self._request_deadline is None:
+            return self._read_timeout
+        remaining_time = self._request_deadline - time.time()
+        if self._read_timeout is None:
+            return remaining_time
+        return min(self._read_timeout, remaining_time)
+
+    def request(self, *request_arguments, **request_preferences):
+        # Request deadline covers establishing of connection, if it is not
+        # established yet
+        if self._request_timeout:
+            self._request_deadline = time.time() + self._request_timeout
+        else:
+            self._request_deadline = None
+        return self._base_connection_class.request(self, *request_arguments,
+                                                   **request_preferences)
+
+    def connect(self):
+        self._base_connection_class.connect(self)
+        self.sock = _DeadlineSocket(self.sock, self)
+
+
+class _TimeoutHTTPConnection(_TimeoutConnectionMixin, httplib.HTTPConnection):
+    """HTTP connection with separate connection, read and request
+    timeouts.
+
+    """
+
+    _base_connection_class = httplib.HTTPConnection
+
+
+class _TimeoutHTTPSConnection(_TimeoutConnectionMixin, 
+                              httplib.HTTPSConnection):
+    """HTTPS connection with separate connection, read and request
+    timeouts.
+
+    """
+
+    _base_connection_class = httplib.HTTPSConnection
+
+
+def _create_resolved_socket(host_resolver, address, 
+                            timeout = socket._GLOBAL_DEFAULT_TIMEOUT,
+                            source_address = None):
+    """Connects to given address just like socket.create_connection
+    function, but resolves host name with given resolver.
+
+    host_resolver -- function which takes host name and port and returns
+                     a list of (family, socket type, protocol, socket
+                     address) tuples
+    address, timeout, source_address --
+                     the same as for socket.create_connection
+
+    Returns connected socket.
+
+    """
+
+    host, port = address
+    error = None
+    for family, socket_type, protocol, socket_address in \
+            host_resolver(host, port):
+        connection_socket = None
+        try:
+            connection_socket = socket.socket(family, socket_type, protocol)
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                connection_socket.settimeout(timeout)
+            if source_address:
+                connection_socket.bind(source_address)
+            connection_socket.connect(socket_address)
+            return connection_socket
+        except socket.error, error:
+            if connection_socket is not None:
+                connection_socket.close()
+    if error is not None:
+        raise error
+    raise socket.error('host resolver returned an empty list')
+
+
+def _create_timeout_connection(connection_class, host, read_timeout,
+                               request_timeout, host_resolver = None,
+                               **connection_preferences):
+    """Creates connection with separate connection, read and request
+    timeouts.
+
+    connection_class --         _TimeoutHTTPConnection or
+                                _TimeoutHTTPSConnection class
+    host --                     host name with port, if it is stated
+    read_timeout --             number of seconds to wait for data from
+                                server or None
+    request_timeout --          maximum number of seconds from sending
+                                request to receiving the whole response
+                                or None
+    host_resolver --            function which resolves host names (see 
+                                _create_resolved_socket function) or None,
+                                if they are resolved by socket module
+                                (by default is None)
+    **connection_preferences -- parametrs of connection class constructor
+
+    """
+
+    connection = connection_class(host, **connection_preferences)
+    connection.set_timeouts(read_timeout, request_timeout)
+    if host_resolver is not None:
+        connection._create_connection = \
+                lambda *arguments: _create_resolved_socket(host_resolver,
+                                                           *arguments)
+    return connection
+
+
+class HTTPConnectionPool(object):
+    """Pool of persistent HTTP/1.1 connections. Pool keeps idle connections
+    to every website host, so the following requests to the same host
+    don't need to establish a new TCP connection. Connections which were
+    idle for too long are closed, because the server has most likely closed
+    them already. Pool may be shared between several threads.
+
+    """
+
+    def __init__(self, max_idle_connections = 2, idle_timeout = 30):
+        """Initializes an empty connection pool.
+
+        max_idle_connections -- maximum number of idle connections kept for
+                                every host (by default is 2)
+        idle_timeout --         number of seconds a connection may stay idle
+                                before it is closed (by default is 30)
+
+        """
+
+        # Check a type of 'max_idle_connections' parametr
+        if not isinstance(max_idle_connections, (int, long)):
+            raise TypeError('int or long type expected')
+        self._max_idle_connections = max_idle_connections
+
+        # Check a type of 'idle_timeout' parametr
+        if not isinstance(idle_timeout, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        self._idle_timeout = idle_timeout
+
+        # self._idle_connections maps (scheme, host) pairs to lists of
+        # (connection, release time) pairs. The most recently released
+        # connections are at the end of the lists.
+        # Initialize it with an empty dictionary
+        self._idle_connections = {}
+        self._lock = threading.Lock()
+
+        # Connection pool statistics
+        self._created_connections_number = 0
+        self._reused_connections_number = 0
+        self._expired_connections_number = 0
+        self._discarded_connections_number = 0
+
+    @property
+    def created_connections_number(self):
+        """Returns number of connections established by pool users."""
+
+        return self._created_connections_number
+
+    @property
+    def reused_connections_number(self):
+        """Returns number of times idle connections were reused."""
+
+        return self._reused_connections_number
+
+    @property
+    def expired_connections_number(self):
+        """Returns number of connections closed because of idle timeout."""
+
+        return self._expired_connections_number
+
+    @property
+    def discarded_connections_number(self):
+        """Returns number of connections which were closed instead of being
+        put back to pool (due to errors, not fully read responses, server
+        requests or pool overflow).
+
+        """
+
+        return self._discarded_connections_number
+
+    def acquire(self, scheme, host):
+        """Takes an idle connection to given host out of pool.
+
+        scheme -- URL scheme ('http' or 'https')
+        host --    host name with port, if it is stated
+
+        Returns httplib.HTTPConnection class or its subclass instance or
+        None if there is no appropriate idle connection. In the last case
+        caller has to create a new connection and to inform pool about it
+        with connection_created method.
+
+        """
+
+        with self._lock:
+            idle_connections = self._idle_connections.get((scheme, host))
+            current_time = time.time()
+            while idle_connections:
+                connection, release_time = idle_connections.pop()
+                if current_time - release_time > self._idle_timeout:
+                    # All the rest connections were released earlier,
+                    # so they are expired too
+                    expired_connections = [connection] + \
+                            [idle_connection for idle_connection, _ in
+                             idle_connections]
+                    del idle_connections[:]
+                    for expired_connection in expired_connections:
+                        expired_connection.close()
+                    self._expired_connections_number += \
+                            len(expired_connections)
+                    break
+                self._reused_connections_number += 1
+                return connection
+            return None
+
+    def connection_created(self):
+        """Informs pool that pool user has established a new connection."""
+
+        with self._lock:
+            self._created_connections_number += 1
+
+    def release(self, scheme, host, connection):
+        """Puts connection back to pool in order to reuse it later.
+
+        scheme --     URL scheme ('http' or 'https')
+        host --       host name with port, if it is stated
+        connection -- httplib.HTTPConnection class or its subclass instance;
+                      response to the last request sent through connection
+                      has to be read completely
+
+        """
+
+        with self._lock:
+            idle_connections = self._idle_connections.setdefault(
+                                (scheme, host), [])
+            if len(idle_connections) < self._max_idle_connections:
+                idle_connections.append((connection, time.time()))
+                return
+            self._discarded_connections_number += 1
+        connection.close()
+
+    def discard(self, connection):
+        """Closes connection which can't be reused.
+
+        connection -- httplib.HTTPConnection class or its subclass instance
+
+        """
+
+        with self._lock:
+            self._discarded_connections_number += 1
+        connection.close()
+
+    def close(self):
+        """Closes all idle connections."""
+
+        with self._lock:
+            idle_connections = self._idle_connections
+            self._idle_connections = {}
+        for host_idle_connections in idle_connections.itervalues():
+            for connection, _ in host_idle_connections:
+                connection.close()
+
+
+class _PooledResponseSocket(object):
+    """Socket-like wrapper of a HTTP response received through pooled
+    connection. It is wrapped in its turn with socket._fileobject in order
+    to provide file-like interface (as urllib2 does). When response is read
+    completely, connection is put back to pool.
+
+    """
+
+    # Maximum number of unread response bytes which are read out when
+    # response is closed in order to reuse connection
+    MAX_DRAINED_BYTES_NUMBER = 64 * 1024
+
+    def __init__(self, connection_pool, scheme, host, connection, response):
+        self._connection_pool = connection_pool
+        self._scheme = scheme
+        self._host = host
+        self._connection = connection
+        self._response = response
+
+    def _release_connection(self):
+        """Puts connection back to pool if it may be reused or closes it
+        otherwise.
+
+        """
+
+        if self._connection is None:
+            return
+        if self._response.will_close:
+            self._connection_pool.discard(self._connection)
+        else:
+            self._connection_pool.release(self._scheme, self._host,
+                                          self._connection)
+        self._connection = None
+
+    def recv(self, size):
+        """Reads up to size bytes of response body."""
+
+        data = self._response.read(size)
+        if self._response.isclosed():
+            self._release_connection()
+        return data
+
+    def close(self):
+        """Closes response. If response was not read completely, reads out
+        the rest of it, if it is small enough, in order to reuse connection.
+
+        """
+
+        if self._connection is None:
+            return
+        response_length = self._response.length
+        if not self._response.will_close and response_length is not None and \
+                response_length <= self.MAX_DRAINED_BYTES_NUMBER:
+            try:
+                self._response.read()
+            except (socket.error, httplib.HTTPException):
+                pass
+        if self._response.isclosed():
+            self._release_connection()
+        else:
+            self._connection_pool.discard(self._connection)
+            self._connection = None
+        self._response.close()
+
+
+def _keep_alive_open(connection_pool, request, scheme, connection_factory):
+    """Sends request through pooled connection. Works just like
+    urllib2.AbstractHTTPHandler.do_open method, but doesn't close
+    connection after response was read.
+
+    connection_pool --    HTTPConnectionPool class instance
+    request --            urllib2.Request class instance
+    scheme --             URL scheme ('http' or 'https')
+    connection_factory -- function which takes host and timeout and creates
+                          a new connection
+
+    Returns urllib.addinfourl class instance containing response.
+
+    """
+
+    host = request.get_host()
+    if not host:
+        raise urllib2.URLError('no host given')
+
+    # Form request headers just like urllib2 does, but ask server to keep
+    # connection alive
+    headers = dict(request.unredirected_hdrs)
+    headers.update(dict((name, value)
+                        for name, value in request.headers.items()
+                        if name not in headers))
+    headers['Connection'] = 'keep-alive'
+    headers = dict((name.title(), value) for name, value in headers.items())
+
+    while True:
+        connection = connection_pool.acquire(scheme, host)
+        connection_is_reused = connection is not None
+        if not connection_is_reused:
+            connection = connection_factory(host, request.timeout)
+            connection_pool.connection_created()
+            try:
+                connection.connect()
+            except socket.error, error:
+                connection_pool.discard(connection)
+                raise urllib2.URLError(error)
+        try:
+            connection.request(request.get_method(), request.get_selector(),
+                               request.data, headers)
+            response = connection.getresponse(buffering = True)
+        except (socket.error, httplib.HTTPException), error:
+            connection_pool.discard(connection)
+            # Connection is established, so timeout means that server
+            # doesn't answer. It is not a connection problem.
+            if isinstance(error, socket.timeout):
+                raise
+            # Server may close idle connection at any moment, so try again
+            # with another connection
+            if connection_is_reused:
+                continue
+            if isinstance(error, socket.error):
+                raise urllib2.URLError(error)
+            raise
+        break
+
+    # Wrap response just like urllib2 does
+    response_socket = _PooledResponseSocket(connection_pool, scheme, host,
+                                            connection, response)
+    response_file = socket._fileobject(response_socket, close = True)
+    resourse = urllib.addinfourl(response_file, response.msg,
+                                 request.get_full_url())
+    resourse.code = response.status
+    resourse.msg = response.reason
+    return resourse
+
+
+class KeepAliveHTTPHandler(urllib2.HTTPHandler):
+    """urllib2 handler of 'http' URLs which sends requests through
+    persistent connections of a connection pool.
+
+    """
+
+    def __init__(self, connection_pool, debuglevel = 0, read_timeout = None,
+                 request_timeout = None, host_resolver = None):
+        """Initializes handler.
+
+        connection_pool -- HTTPConnectionPool class instance
+        debuglevel --      the same as for urllib2.HTTPHandler
+        read_timeout --    number of seconds to wait for data from server.
+                           Timeout of urllib2 request is used to establish
+                           connection only. None means the timeout of 
+                           urllib2 request (by default is None)
+        request_timeout -- maximum number of seconds from sending request to
+                           receiving the whole response. None means no 
+                           limitation (by default is None)
+        host_resolver --   function which takes host name and port and 
+                           returns a list of (family, socket type, protocol,
+                           socket address) tuples. None means that host 
+                           names are resolved by socket module 
+                           (by default is None)
+
+        """
+
+        urllib2.HTTPHandler.__init__(self, debuglevel)
+        self._connection_pool = connection_pool
+        self._read_timeout = read_timeout
+        self._request_timeout = request_timeout
+        self._host_resolver = host_resolver
+
+    def _create_connection(self, host, timeout):
+        """Creates a new HTTP connection to given host."""
+
+        connection = _create_timeout_connection(_TimeoutHTTPConnection, host,
+                                                self._read_timeout,
+                                                self._request_timeout,
+                                                self._host_resolver,
+                                                timeout = timeout)
+        connection.set_debuglevel(self._debuglevel)
+        return connection
+
+    def http_open(self, request):
+        return _keep_alive_open(self._connection_pool, request, 'http',
+                                self._create_connection)
+
+
+class KeepAliveHTTPSHandler(urllib2.HTTPSHandler):
+    """urllib2 handler of 'https' URLs which sends requests through
+    persistent connections of a connection pool.
+
+    """
+
+    def __init__(self, connection_pool, debuglevel = 0, context = None,
+                 read_timeout = None, request_timeout = None,
+                 host_resolver = None):
+        """Initializes handler.
+
+        connection_pool -- HTTPConnectionPool class instance
+        debuglevel, context --
+                           the same as for urllib2.HTTPSHandler
+        read_timeout, request_timeout, host_resolver --
+                           the same as for KeepAliveHTTPHandler
+
+        """
+
+        urllib2.HTTPSHandler.__init__(self, debuglevel, context)
+        self._connection_pool = connection_pool
+        self._read_timeout = read_timeout
+        self._request_timeout = request_timeout
+        self._host_resolver = host_resolver
+
+    def _create_connection(self, host, timeout):
+        """Creates a new HTTPS connection to given host."""
+
+        connection = _create_timeout_connection(_TimeoutHTTPSConnection, host,
+                                                self._read_timeout,
+                                                self._request_timeout,
+                                                self._host_resolver,
+                                                timeout = timeout,
+                                                context = self._context)
+        connection.set_debuglevel(self._debuglevel)
+        return connection
+
+    def https_open(self, request):
+        return _keep_alive_open(self._connection_pool, request, 'https',
+                                self._create_connection)
+
+
+class TimeoutHTTPHandler(urllib2.HTTPHandler):
+    """urllib2 handler of 'http' URLs which uses request timeout to
+    establish connection only and a separate timeout to wait for data
+    from server. Connections are not reused.
+
+    """
+
+    def __init__(self, debuglevel = 0, read_timeout = None,
+                 request_timeout = None, host_resolver = None):
+        """Initializes handler.
+
+        debuglevel --      the same as for urllib2.HTTPHandler
+        read_timeout, request_timeout, host_resolver --
+                           the same as for KeepAliveHTTPHandler
+
+        """
+
+        urllib2.HTTPHandler.__init__(self, debuglevel)
+        self._read_timeout = read_timeout
+        self._request_timeout = request_timeout
+        self._host_resolver = host_resolver
+
+    def _create_connection(self, host, **connection_preferences):
+        """Creates a new HTTP connection to given host."""
+
+        return _create_timeout_connection(_TimeoutHTTPConnection, host,
+                                          self._read_timeout,
+                                          self._request_timeout,
+                                          self._host_resolver,
+                                          **connection_preferences)
+
+    def http_open(self, request):
+        return self.do_open(self._create_connection, request)
+
+
+class TimeoutHTTPSHandler(urllib2.HTTPSHandler):
+    """urllib2 handler of 'https' URLs which uses request timeout to
+    establish connection only and a separate timeout to wait for data
+    from server. Connections are not reused.
+
+    """
+
+    def __init__(self, debuglevel = 0, context = None, read_timeout = None,
+                 request_timeout = None, host_resolver = None):
+        """Initializes handler.
+
+        debuglevel, context -- the same as for urllib2.HTTPSHandler
+        read_timeout, request_timeout, host_resolver --
+                               the same as for KeepAliveHTTPHandler
+
+        """
+
+        urllib2.HTTPSHandler.__init__(self, debuglevel, context)
+        self._read_timeout = read_timeout
+        self._request_timeout = request_timeout
+        self._host_resolver = host_resolver
+
+    def _create_connection(self, host, **connection_preferences):
+        """Creates a new HTTPS connection to given host."""
+
+        return _create_timeout_connection(_TimeoutHTTPSConnection, host,
+                                          self._read_timeout,
+                                          self._request_timeout,
+                                          self._host_resolver,
+                                          **connection_preferences)
+
+    def https_open(self, request):
+        return self.do_open(self._create_connection, request,
+                            context = self._context)
+
+
+class ContentDecodingProcessor(urllib2.BaseHandler):
+    """urllib2 processor which decodes responses compressed with gzip or
+    deflate content encoding. Response body is decompressed while it is
+    being read, so the whole compressed body is never kept in memory.
+    Content-Encoding and Content-Length headers are removed from decoded
+    responses, so they look just like uncompressed ones.
+    Processor may be shared between several threads.
+
+    """
+
+    # Responses have to be decoded before they are processed by the other
+    # handlers (e.g. before redirections and errors are handled)
+    handler_order = 100
+
+    # Content encodings supported by processor
+    SUPPORTED_CONTENT_ENCODINGS = ('gzip', 'x-gzip', 'deflate')
+
+    def __init__(self):
+        """Initializes processor."""
+
+        self._lock = threading.Lock()
+
+        # Content decoding statistics
+        self._decoded_responses_number = 0
+        self._compressed_bytes_number = 0
+        self._decompressed_bytes_number = 0
+
+    @property
+    def decoded_responses_number(self):
+        """Returns number of compressed responses."""
+
+        return self._decoded_responses_number
+
+    @property
+    def compressed_bytes_number(self):
+        """Returns number of compressed response body bytes read so far."""
+
+        return self._compressed_bytes_number
+
+    @property
+    def decompressed_bytes_number(self):
+        """Returns number of bytes compressed response bodies were
+        decompressed to so far.
+
+        """
+
+        return self._decompressed_bytes_number
+
+    def _count_decoded_bytes(self, compressed_bytes_number,
+                             decompressed_bytes_number):
+        """Adds bytes numbers of decoded response part to statistics."""
+
+        with self._lock:
+            self._compressed_bytes_number += compressed_bytes_number
+            self._decompressed_bytes_number += decompressed_bytes_number
+
+    def http_request(self, request):
+        """Asks server to compress response."""
+
+        if not request.has_header('Accept-encoding'):
+            request.add_unredirected_header('Accept-Encoding', 'gzip, deflate')
+        return request
+
+    def http_response(self, request, response):
+        """Wraps compressed response, so it is decompressed while being
+        read.
+
+        """
+
+        headers = response.info()
+        content_encoding = headers.getheader('Content-Encoding', '')
+        content_encoding = content_encoding.strip().lower()
+        if content_encoding not in self.SUPPORTED_CONTENT_ENCODINGS:
+            return response
+
+        with self._lock:
+            self._decoded_responses_number += 1
+
+        # Decoded response has another length and encoding
+        del headers['Content-Encoding']
+        if 'Content-Length' in headers:
+            del headers['Content-Length']
+
+        decoding_file = _DecodingResponseFile(response,
+                                              content_encoding != 'deflate',
+                                              self._count_decoded_bytes)
+        decoded_response = urllib.addinfourl(decoding_file, headers,
+                                             response.geturl())
+        decoded_response.code = response.code
+        decoded_response.msg = response.msg
+        return decoded_response
+
+    https_request = http_request
+    https_response = http_response
+
+
+class _DecodingResponseFile(object):
+    """File-like wrapper of compressed HTTP response which decompresses
+    response body by chunks while it is being read.
+
+    """
+
+    # Number of compressed bytes read from response at once
+    CHUNK_SIZE = 16 * 1024
+
+    def __init__(self, response, is_gzip, on_decoded):
+        """Initializes decoding file.
+
+        response --   file-like object containing compressed response
+        is_gzip --    boolean parametr which states whether response is
+                      compressed with gzip or deflate content encoding
+        on_decoded -- function which takes numbers of compressed and
+                      decompressed bytes of every decoded chunk
+
+        """
+
+        self._response = response
+        self._on_decoded = on_decoded
+        self._is_gzip = is_gzip
+        if is_gzip:
+            # Decompressor expects gzip header and trailer
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            # Deflate content encoding means zlib format, but some servers
+            # send raw deflate data, so the format is detected by the first
+            # chunk
+            self._decompressor = zlib.decompressobj()
+        self._first_chunk_is_decoded = False
+        self._buffer = ''
+        self._is_finished = False
+
+    def _decode_next_chunk(self):
+        """Reads and decompresses the next chunk of response body. Sets
+        _is_finished flag at the end of response.
+
+        """
+
+        compressed_data = self._response.read(self.CHUNK_SIZE)
+        if not compressed_data:
+            data = self._decompressor.flush()
+            self._is_finished = True
+        else:
+            try:
+                data = self._decompressor.decompress(compressed_data)
+            except zlib.error:
+                if self._is_gzip or self._first_chunk_is_decoded:
+                    raise IOError('invalid compressed response')
+                # Try raw deflate data
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                try:
+                    data = self._decompressor.decompress(compressed_data)
+                except zlib.error:
+                    raise IOError('invalid compressed response')
+        self._first_chunk_is_decoded = True
+        self._on_decoded(len(compressed_data), len(data))
+        self._buffer += data
+
+    def read(self, size = -1):
+        if size is None or size < 0:
+            while not self._is_finished:
+                self._decode_next_chunk()
+            data = self._buffer
+            self._buffer = ''
+            return data
+        while len(self._buffer) < size and not self._is_finished:
+            self._decode_next_chunk()
+        data = self._buffer[ : size]
+        self._buffer = self._buffer[size : ]
+        return data
+
+    def readline(self, size = -1):
+        while '\n' not in self._buffer and not self._is_finished and \
+                (size is None or size < 0 or len(self._buffer) < size):
+            self._decode_next_chunk()
+        line_end = self._buffer.find('\n') + 1
+        if not line_end:
+            line_end = len(self._buffer)
+        if size is not None and size >= 0:
+            line_end = min(line_end, size)
+        data = self._buffer[ : line_end]
+        self._buffer = self._buffer[line_end : ]
+        return data
+
+    def readlines(self, sizehint = 0):
+        lines = []
+        while True:
+            line = self.readline()
+            if not line:
+                return lines
+            lines.append(line)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def close(self):
+        self._buffer = ''
+        self._response.close()
@@ -0,0 +1,199 @@
+import os             # For operations with cache files
+import hashlib        # For hashing page contents
+import json           # For serializing parsing results
+import threading      # For using threading.Lock
+
+from collections import OrderedDict
+
+__doc__ = """
+Contains cache of website pages parsing results which allows site page
+parser not to parse byte-identical pages (print versions, mirrored paths,
+query string aliases) again, both within a crawling and across crawlings.
+"""
+
+__all__ = ["PageParsingCache"]
+
+class PageParsingCache(object):
+    """Cache of website pages parsing results keyed by hashes of page
+    contents. Results are kept in the compact form returned by
+    PageParsingInfo.to_tuple method. The most recently used results are
+    kept in memory, and if cache directory is given, all the results are
+    stored on disk too, so they are used by the following crawlings. Cache
+    may be shared between several threads.
+
+    """
+
+    # Version of parsing results. It is a part of cache keys, so it has to
+    # be changed whenever site page parser starts to retrieve different
+    # parsing information from the same page, then results stored by the
+    # previous version are not used.
+    PARSING_VERSION = 1
+
+    FILE_EXTENSION = '.json'
+
+    def __init__(self, directory = None, memory_size = 1000):
+        """Initializes cache. Creates cache directory if needed.
+
+        directory --   name of a directory where parsing results are stored.
+                       None means that results are kept only in memory
+                       (by default is None)
+        memory_size -- maximum number of parsing results kept in memory.
+                       '0' means that results are not kept in memory
+                       (by default is 1000)
+
+        """
+
+        # Check a type of 'directory' parametr
+        if directory is not None:
+            if not isinstance(directory, basestring):
+                raise TypeError('string type expected')
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        self._directory = directory
+
+        # Check a type of 'memory_size' parametr
+        if not isinstance(memory_size, (int, long)):
+            raise TypeError('int or long type expected')
+        self._memory_size = memory_size
+
+        # self._memo maps cache keys to parsing results in order they were
+        # used (the least recently used result is the first)
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Cache statistics
+        self._memory_hits_number = 0
+        self._disk_hits_number = 0
+        self._misses_number = 0
+
+    @property
+    def memory_hits_number(self):
+        """Returns number of parsing results found in memory."""
+
+        return self._memory_hits_number
+
+    @property
+    def disk_hits_number(self):
+        """Returns number of parsing results found on disk."""
+
+        return self._disk_hits_number
+
+    @property
+    def misses_number(self):
+        """Returns number of pages which parsing results were not found."""
+
+        return self._misses_number
+
+    def get_key(self, page_text):
+        """Returns cache key of a page, which is a hash of page contents.
+
+        page_text -- string containing HTML document
+
+        """
+
+        if isinstance(page_text, unicode):
+            page_text = page_text.encode('utf-8')
+        return '%d-%s' % (self.PARSING_VERSION,
+                          hashlib.md5(page_text).hexdigest())
+
+    def _get_file_name(self, key):
+        """Returns name of a cache file corresponding to given key."""
+
+        page_hash = key.split('-', 1)[-1]
+        return os.path.join(self._directory, page_hash[ : 2],
+                            key + self.FILE_EXTENSION)
+
+    def _write_file(self, file_name, data):
+        """Writes data to a temporary file and renames it to given file
+        name, so other threads and processes never see the file written
+        partially.
+
+        """
+
+        file_directory = os.path.dirname(file_name)
+        if not os.path.isdir(file_directory):
+            try:
+                os.makedirs(file_directory)
+            except OSError:
+                # Directory was created by another thread
+                pass
+        temporary_file_name = '%s.%d.%d.tmp' % (
+            file_name, os.getpid(), threading.current_thread().ident)
+        temporary_file = open(temporary_file_name, 'wb')
+        try:
+            temporary_file.write(data)
+        finally:
+            temporary_file.close()
+        os.rename(temporary_file_name, file_name)
+
+    def _remember(self, key, page_parsing_tuple):
+        """Keeps parsing result in memory. Has to be called with the lock
+        acquired.
+
+        """
+
+        if not self._memory_size:
+            return
+        self._memo[key] = page_parsing_tuple
+        if len(self._memo) > self._memory_size:
+            self._memo.popitem(last = False)
+
+    def get(self, key):
+        """Looks for parsing result of a page.
+
+        key -- cache key returned by get_key method
+
+        Returns page parsing tuple (see PageParsingInfo.to_tuple method) or
+        None if there is no cached result.
+
+        """
+
+        with self._lock:
+            page_parsing_tuple = self._memo.pop(key, None)
+            if page_parsing_tuple is not None:
+                # Result becomes the most recently used one
+                self._memo[key] = page_parsing_tuple
+                self._memory_hits_number += 1
+                return page_parsing_tuple
+
+        if self._directory is not None:
+            try:
+                cache_file = open(self._get_file_name(key), 'rb')
+            except IOError:
+                pass
+            else:
+                try:
+                    page_parsing_tuple = json.load(cache_file)
+                except ValueError:
+                    # Damaged cache file
+                    page_parsing_tuple = None
+                finally:
+                    cache_file.close()
+
+        with self._lock:
+            if page_parsing_tuple is None:
+                self._misses_number += 1
+            else:
+                self._disk_hits_number += 1
+                self._remember(key, page_parsing_tuple)
+        return page_parsing_tuple
+
+    def put(self, key, page_parsing_tuple):
+        """Stores parsing result of a page.
+
+        key --                cache key returned by get_key method
+        page_parsing_tuple -- page parsing tuple returned by
+                              PageParsingInfo.to_tuple method
+
+        """
+
+        with self._lock:
+            self._remember(key, page_parsing_tuple)
+
+        if self._directory is not None:
+            try:
+                self._write_file(self._get_file_name(key),
+                                 json.dumps(page_parsing_tuple))
+            except (IOError, OSError):
+                # Parsing result is kept in memory only
+                pass
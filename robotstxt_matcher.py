@@ -0,0 +1,222 @@
+import urllib         # For quoting and unquoting URLs
+import urlparse       # For operations with URL stings
+
+__doc__ = """
+Contains matcher of robots.txt rules which compiles rules applied to site
+spider into a prefix tree, so every URL is checked in time proportional to
+its length instead of the number of rules.
+"""
+
+__all__ = ["RobotsTxtMatcher"]
+
+class RobotsTxtMatcher(object):
+    """Matcher of robots.txt rules for a single user agent. It parses
+    robots.txt file just like robotparser.RobotFileParser does and gives
+    the same answers, but keeps only the rules of the entry applied to its
+    user agent. Their paths are put in a prefix tree (trie), every node of
+    which may contain a rule ending at it. The first rule (in order of the
+    file) which path is a prefix of URL path decides whether URL may be
+    fetched, so looking up URL path in the tree is enough to find it.
+    Matcher also supports Crawl-delay directive, which is handled just like
+    rule lines (as robotparser of Python 3 does), and collects URLs of
+    sitemap files stated by Sitemap directives of any entry.
+
+    """
+
+    # Key of prefix tree node which contains a rule ending at the node.
+    # Other keys are characters of rule paths.
+    RULE_KEY = None
+
+    def __init__(self, useragent):
+        """Initializes matcher which allows everything.
+
+        useragent -- user agent name of site spider
+
+        """
+
+        # Check a type of 'useragent' parametr
+        if not isinstance(useragent, basestring):
+            raise TypeError('string type expected')
+        # Name token of user agent is compared with robots.txt entries
+        self._useragent = useragent.split('/')[0].lower()
+
+        # Root node of prefix tree of rule paths. Every rule is a pair of
+        # its number in the entry and its allowance
+        self._rules_tree = {}
+        self._rules_number = 0
+        self._crawl_delay = None
+        self._sitemaps = []
+
+    @property
+    def rules_number(self):
+        """Returns number of rules applied to user agent."""
+
+        return self._rules_number
+
+    @property
+    def crawl_delay(self):
+        """Returns number of seconds stated by Crawl-delay directive applied
+        to user agent or None if it is not stated.
+
+        """
+
+        return self._crawl_delay
+
+    @property
+    def sitemaps(self):
+        """Returns a list of URLs of sitemap files stated in robots.txt
+        file.
+
+        """
+
+        return self._sitemaps
+
+    def _applies_to_useragent(self, entry_useragents):
+        """Checks whether robots.txt entry applies to user agent just like
+        robotparser does.
+
+        """
+
+        for entry_useragent in entry_useragents:
+            if entry_useragent == '*':
+                return True
+            if entry_useragent.lower() in self._useragent:
+                return True
+        return False
+
+    def _add_rule(self, path, allowance):
+        """Adds rule to prefix tree. Rule is ignored if its path already
+        has a rule, because the earlier rule is always found first.
+
+        """
+
+        # Rule paths are normalized just like robotparser does
+        if path == '' and not allowance:
+            # An empty value means allow all
+            allowance = True
+        path = urllib.quote(urlparse.urlunparse(urlparse.urlparse(path)))
+        if path == '*':
+            # Rule matches all the paths
+            path = ''
+
+        node = self._rules_tree
+        for character in path:
+            node = node.setdefault(character, {})
+        if self.RULE_KEY not in node:
+            node[self.RULE_KEY] = (self._rules_number, allowance)
+        self._rules_number += 1
+
+    def parse(self, lines):
+        """Parses robots.txt file and compiles the rules applied to user
+        agent. The first entry naming user agent is used, if there is no
+        such entry, the first default ('*') entry is used.
+
+        lines -- list of robots.txt file lines
+
+        """
+
+        # Entries are lists of user agents, rules (path and allowance pairs)
+        # and crawl delays
+        default_entry = None
+        useragent_entry = None
+
+        # States: 0 - start state, 1 - saw user-agent line, 2 - saw a rule
+        state = 0
+        entry = ([], [], [])
+        self._sitemaps = []
+
+        def add_entry(entry):
+            if '*' in entry[0]:
+                return default_entry or entry, useragent_entry
+            if useragent_entry is None and \
+                    self._applies_to_useragent(entry[0]):
+                return default_entry, entry
+            return default_entry, useragent_entry
+
+        for line in lines:
+            if not line:
+                if state == 1:
+                    entry = ([], [], [])
+                    state = 0
+                elif state == 2:
+                    default_entry, useragent_entry = add_entry(entry)
+                    entry = ([], [], [])
+                    state = 0
+            # Remove optional comment and strip line
+            comment_position = line.find('#')
+            if comment_position >= 0:
+                line = line[ : comment_position]
+            line = line.strip()
+            if not line:
+                continue
+            line = line.split(':', 1)
+            if len(line) != 2:
+                continue
+            field = line[0].strip().lower()
+            if field == 'sitemap':
+                # Sitemap directive doesn't belong to entries
+                self._sitemaps.append(line[1].strip())
+                continue
+            value = urllib.unquote(line[1].strip())
+            if field == 'user-agent':
+                if state == 2:
+                    default_entry, useragent_entry = add_entry(entry)
+                    entry = ([], [], [])
+                entry[0].append(value)
+                state = 1
+            elif field in ('allow', 'disallow'):
+                if state != 0:
+                    entry[1].append((value, field == 'allow'))
+                    state = 2
+            elif field == 'crawl-delay':
+                if state != 0:
+                    try:
+                        entry[2].append(float(value))
+                    except ValueError:
+                        pass
+                    state = 2
+        if state == 2:
+            default_entry, useragent_entry = add_entry(entry)
+
+        # Compile rules of the entry applied to user agent
+        self._rules_tree = {}
+        self._rules_number = 0
+        self._crawl_delay = None
+        applied_entry = useragent_entry or default_entry
+        if applied_entry is None:
+            return
+        for path, allowance in applied_entry[1]:
+            self._add_rule(path, allowance)
+        if applied_entry[2]:
+            self._crawl_delay = applied_entry[2][0]
+
+    def can_fetch(self, url):
+        """Checks whether user agent may fetch given URL.
+
+        url -- corresponding URL
+
+        Returns True if it is allowed and False otherwise.
+
+        """
+
+        # URL path is normalized just like robotparser does
+        parsed_url = urlparse.urlparse(urllib.unquote(url))
+        path = urllib.quote(urlparse.urlunparse(('', '', parsed_url.path,
+                parsed_url.params, parsed_url.query, parsed_url.fragment)))
+        if not path:
+            path = '/'
+
+        # Find the earliest rule which path is a prefix of URL path
+        node = self._rules_tree
+        matched_rule = node.get(self.RULE_KEY)
+        for character in path:
+            node = node.get(character)
+            if node is None:
+                break
+            rule = node.get(self.RULE_KEY)
+            if rule is not None and \
+                    (matched_rule is None or rule[0] < matched_rule[0]):
+                matched_rule = rule
+        if matched_rule is None:
+            return True
+        return matched_rule[1]
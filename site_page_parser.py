@@ -1,3 +1,5 @@
+import multiprocessing  # For parsing pages in worker processes
+
 from lxml import etree
 
 __doc__ = """
@@ -222,6 +224,42 @@ class PageParsingInfo(object):
                 return references_group
             
         return None
+
+    def to_tuple(self):
+        """Converts page parsing information to a compact picklable form. 
+        At the current time only text references are supported.
+
+        Returns a (title, references groups) tuple, where references groups
+        is a tuple of (headline, references) tuples and references is a tuple 
+        of (reference, title) tuples.
+
+        """
+
+        return (self._title,
+                tuple((references_group.headline,
+                       tuple((reference_info.reference, reference_info.title)
+                             for reference_info in references_group.references))
+                      for references_group in self._references_groups))
+
+    @staticmethod
+    def from_tuple(page_parsing_tuple):
+        """Creates page parsing information from its compact form.
+
+        page_parsing_tuple -- tuple returned by to_tuple method
+
+        Returns PageParsingInfo class instance.
+
+        """
+
+        page_title, references_groups = page_parsing_tuple
+        page_parsing_info = PageParsingInfo(page_title)
+        for headline, references in references_groups:
+            references_group = ReferencesGroupParsingInfo(headline)
+            for reference, reference_title in references:
+                references_group.add_reference(
+                        TextReferenceParsingInfo(reference, reference_title))
+            page_parsing_info.add_references_group(references_group)
+        return page_parsing_info
  
     
 class SitePageParseError(Exception):
@@ -235,48 +273,380 @@ class SitePageParseError(Exception):
         return 'Error while parsing site page: ' + str(self._lxml_error)
 
     
-class SitePageParser(object):
-    """Website page parser class. Page parser is intended to retrieve title
-    and all references groups from a HTML document.
-    
+class _SitePageWalker(object):
+    """Walker through a website HTML document which retrieves page title and
+    references groups. Elements of the document are given by 'start' and 'end'
+    events in document order, like ones of lxml etree.iterwalk function or
+    etree.HTMLPullParser class. Contents of an element may be incomplete at
+    its 'start' event, because the rest of the document may be not parsed
+    yet, so texts of elements are retrieved at their 'end' events.
+
     """
 
-    def _find_preceding_headline_tag(self, element):
-        """Looks through preceding siblings of a given element, then through 
-        element parent and preceding siblings of a parent and so on (just like
-        upstairs walking) till the top of a pgae is reached in order to find 
-        headline tag which precedes given element.
+    # Tags of lists which contain references groups
+    LIST_TAGS = ('ul', 'ol')
+
+    # Tags of headlines of references groups
+    HEADLINE_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+    def __init__(self, title_only = False):
+        """Initializes walker at the beginning of a document.
+
+        title_only -- boolean parametr which states whether only page title
+                      is retrieved (by default is False)
+
+        """
+
+        self._title_only = title_only
+
+        # XPath expression retrieving all text nodes inside a tag. Compiled
+        # XPath expressions may not be shared between threads, so every 
+        # walker has its own one.
+        self._text_nodes_xpath = etree.XPath('.//text()')
+
+        # Page parsing information which is being retrieved. Page title is
+        # set when the walk is finished.
+        self._page_parsing_info = PageParsingInfo('')
+        # Page title is the first text of 'title' tag. None means that it
+        # was not found yet.
+        self._page_title = None
         
+        # Set of references groups headlines that were already retrieved
+        # from page
+        self._page_headlines = set()
+
+        # Open elements of the document from the top of a page to the current
+        # element with their last headline children (see
+        # _find_preceding_headline_tag method)
+        self._open_elements = []
+
+        # The outermost list ('ul' or 'ol' HTML tag) which is being walked
+        # through or None if walk is outside of lists
+        self._current_list = None
+        # Headline tag preceding the current list
+        self._current_list_headline_tag = None
+        # Number of open 'li' tags inside the current list. References are
+        # retrieved only from list items.
+        self._open_list_items_number = 0
+        # A list of [lxml.Element class instance, preceding headline tag,
+        # number of open 'li' tags, boolean value which states whether 
+        # position of its group is reserved] lists corresponding to open 
+        # lists nested in the current list. Their references belong to the
+        # current list, but a group with their headline takes the position
+        # of the first of them which contains references, so references of
+        # the following lists with the same headline are added there.
+        self._nested_lists = []
+        # References group of the current list. It is created when the first
+        # reference of the list is found, because lists without references
+        # don't make groups.
+        self._current_references_group = None
+        # A list of (headline tag, references group) pairs corresponding to
+        # groups which are not added to page parsing information yet, because
+        # their headline tags are not walked through yet
+        self._deferred_references_groups = []
+
+        # A list of (lxml.Element class instance, TextReferenceParsingInfo
+        # class instance) pairs corresponding to open 'a' tags which titles
+        # are retrieved at their 'end' events
+        self._open_references = []
+
+    @property
+    def page_parsing_info(self):
+        """Returns PageParsingInfo class instance containing references 
+        groups retrieved from walked part of the document. Page title is set
+        when the walk is finished.
+
+        """
+
+        return self._page_parsing_info
+
+    @property
+    def is_complete(self):
+        """Returns True if the rest of the document is not needed, because
+        only page title is retrieved and it is already found.
+
+        """
+
+        return self._title_only and self._page_title is not None
+
+    def _get_first_text(self, element):
+        """Returns the first text inside a given element without leading and
+        trailing whitespaces or '' if element contains no text.
+
         element -- lxml.Element class instance corresponding to a tag in 
                    HTML document.
+
+        """
+
+        text_nodes = self._text_nodes_xpath(element)
+        if text_nodes:
+            return text_nodes[0].strip()
+        return ''
+
+    def _find_preceding_headline_tag(self):
+        """Looks through preceding siblings of the current element, then
+        through element parent and preceding siblings of a parent and so on
+        (just like upstairs walking) till the top of a pgae is reached in 
+        order to find headline tag which precedes the current element. 
+        Preceding siblings are not looked through again, because the last 
+        headline child of every open element is remembered while walking the
+        document, so search takes time proportional to the depth of the 
+        element.
          
         Retruns lxml.Element class instance corresponding to preceding headline
         tag if appropriate tag was found and None otherwise.
         
         """
         
-        # Define which tags are appropriate
-        headline_tags = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
-        # Start search from the given element
-        preceding_element = element
         # Search until the top of the page is reached or appropriate 
         # tag was found
-        while preceding_element is not None:
-            if preceding_element.tag in headline_tags:
-                return preceding_element
-            for preceding_sibling in preceding_element.itersiblings(preceding=True):
-
-                if preceding_sibling.tag in headline_tags:
-                    return preceding_sibling
-                preceding_element = preceding_sibling
-            preceding_element = preceding_element.getparent()
+        for element, last_headline_child in reversed(self._open_elements):
+            # The last headline child is the nearest preceding sibling of
+            # the open child
+            if last_headline_child is not None:
+                return last_headline_child
+            if element.tag in self.HEADLINE_TAGS:
+                return element
 
         # If no approptiate tag was found return None
         return None
+
+    def _is_open(self, element):
+        """Checks whether given element is not walked through yet."""
+
+        for open_element, _ in self._open_elements:
+            if open_element is element:
+                return True
+        return False
+
+    def _add_references_group(self, headline_tag, references_group):
+        """Adds references group to the page parsing information. Group is
+        defined by headline preceding the list the group is retrieved from.
+
+        headline_tag --     lxml.Element class instance corresponding to 
+                            headline tag preceding the list or None if there
+                            is no such tag
+        references_group -- ReferencesGroupParsingInfo class instance
+
+        Returns ReferencesGroupParsingInfo class instance which references
+        of the group were added to.
+
+        """
+
+        if headline_tag is not None:
+            preceding_headline = self._get_first_text(headline_tag)
+        else:
+            preceding_headline = ''
+
+        # If headline was found and it is one of the titles of 
+        # references groups that were already retrieved from page
+        # we should not create new group of references, we should
+        # add new refernces to a group corresponding to this title.
+        # In opposite situation we should create a new group 
+        # of references.
+        if not preceding_headline or \
+                preceding_headline not in self._page_headlines:
+            references_group.headline = preceding_headline
+            self._page_parsing_info.add_references_group(references_group)
+            self._page_headlines.add(preceding_headline)
+            return references_group
+
+        # Find references group corresponding to headline
+        found_references_group = \
+                self._page_parsing_info.find_references_group_by_headline(
+                        preceding_headline)
+        for reference_parsing_info in references_group.references:
+            found_references_group.add_reference(reference_parsing_info)
+        return found_references_group
+
+    def _add_deferred_references_groups(self):
+        """Adds deferred references groups which headline tags were walked 
+        through to the page parsing information.
+
+        """
+
+        while self._deferred_references_groups and \
+                not self._is_open(self._deferred_references_groups[0][0]):
+            headline_tag, references_group = \
+                    self._deferred_references_groups.pop(0)
+            added_references_group = \
+                    self._add_references_group(headline_tag, references_group)
+            if self._current_references_group is references_group:
+                self._current_references_group = added_references_group
+
+    def _start_references_group(self, headline_tag):
+        """Starts a new references group of a list and adds it to the page
+        parsing information, unless it has to be deferred.
+
+        headline_tag -- lxml.Element class instance corresponding to 
+                        headline tag preceding the list or None if there
+                        is no such tag
+
+        Returns ReferencesGroupParsingInfo class instance which references
+        of the list have to be added to.
+
+        """
+
+        references_group = ReferencesGroupParsingInfo()
+        # List may be inside its headline tag, then headline is known only
+        # when the headline tag is walked through. Groups are added in order
+        # of their lists, so groups of the following lists are deferred too.
+        if self._deferred_references_groups or \
+                (headline_tag is not None and self._is_open(headline_tag)):
+            self._deferred_references_groups.append(
+                    (headline_tag, references_group))
+            return references_group
+        return self._add_references_group(headline_tag, references_group)
+
+    def _get_current_references_group(self):
+        """Returns references group which references of the current list have
+        to be added to.
+
+        Returns ReferencesGroupParsingInfo class instance.
+
+        """
+
+        if self._current_references_group is None:
+            self._current_references_group = self._start_references_group(
+                    self._current_list_headline_tag)
+        return self._current_references_group
+
+    def _reserve_nested_lists_references_groups(self):
+        """Reserves positions of groups of nested lists which contain the
+        current reference. Groups are empty, they are removed when the walk
+        is finished unless references of the following lists are added.
+
+        """
+
+        for nested_list in self._nested_lists:
+            if nested_list[2] and not nested_list[3]:
+                self._start_references_group(nested_list[1])
+                nested_list[3] = True
+
+    def _retrieve_page_title(self, element):
+        """Retrieves page title from given 'title' tag if it was not found
+        yet.
+
+        """
+
+        if self._page_title is None:
+            page_title_text = element.xpath('text()')
+            if page_title_text:
+                self._page_title = page_title_text[0].strip()
+
+    def walk(self, event, element):
+        """Walks through the next element of the document.
+
+        event --   'start' or 'end'
+        element -- lxml.Element class instance corresponding to a tag in 
+                   HTML document
+
+        """
+
+        tag = element.tag
+        if self._title_only:
+            if event == 'end' and tag == 'title':
+                self._retrieve_page_title(element)
+            return
+
+        if event == 'end':
+            self._open_elements.pop()
+            # Headline precedes the rest children of its parent
+            if tag in self.HEADLINE_TAGS:
+                if self._open_elements:
+                    self._open_elements[-1][1] = element
+                self._add_deferred_references_groups()
+            if element is self._current_list:
+                self._current_list = None
+            elif self._nested_lists and element is self._nested_lists[-1][0]:
+                self._nested_lists.pop()
+            elif tag == 'li' and self._current_list is not None:
+                self._open_list_items_number -= 1
+                for nested_list in self._nested_lists:
+                    nested_list[2] -= 1
+            elif tag == 'a' and self._open_references and \
+                    self._open_references[-1][0] is element:
+                # Because at the current time we only deal with text 
+                # references it may happen that reference has no title
+                self._open_references.pop()[1].title = \
+                        self._get_first_text(element)
+            elif tag == 'title':
+                self._retrieve_page_title(element)
+            return
+
+        self._open_elements.append([element, None])
+        if tag in self.LIST_TAGS:
+            if self._current_list is None:
+                self._current_list = element
+                self._current_list_headline_tag = \
+                        self._find_preceding_headline_tag()
+                self._open_list_items_number = 0
+                self._current_references_group = None
+            else:
+                self._nested_lists.append(
+                        [element, self._find_preceding_headline_tag(), 0, 
+                         False])
+        elif tag == 'li':
+            if self._current_list is not None:
+                self._open_list_items_number += 1
+                for nested_list in self._nested_lists:
+                    nested_list[2] += 1
+        elif tag == 'a':
+            if not self._open_list_items_number or \
+                    'href' not in element.attrib:
+                return
+            # Add new reference to the current group of references. Its 
+            # title is retrieved when the whole tag is walked through.
+            reference_parsing_info = \
+                    TextReferenceParsingInfo(element.attrib['href'], '')
+            self._get_current_references_group().add_reference(
+                    reference_parsing_info)
+            self._reserve_nested_lists_references_groups()
+            self._open_references.append((element, reference_parsing_info))
+
+    def finish(self):
+        """Finishes the walk.
+
+        Returns PageParsingInfo class instance which contains parsing 
+        information about walked website page.
+
+        """
+
+        self._add_deferred_references_groups()
+        # Remove groups reserved for nested lists which references were not
+        # added
+        page_parsing_info = PageParsingInfo(self._page_title or '')
+        for references_group in self._page_parsing_info.references_groups:
+            if references_group.references:
+                page_parsing_info.add_references_group(references_group)
+        self._page_parsing_info = page_parsing_info
+        return page_parsing_info
+
+
+class SitePageParser(object):
+    """Website page parser class. Page parser is intended to retrieve title
+    and all references groups from a HTML document.
     
+    """
+
+    def __init__(self, parsing_cache = None):
+        """Initializes site page parser.
+
+        parsing_cache -- PageParsingCache class instance where parsing results
+                         are looked for before parsing and stored after it.
+                         None means that every page is parsed (by default 
+                         is None)
+
+        """
+
+        self._parsing_cache = parsing_cache
+
     def parse_site_page(self, page_text):
         """Parses given website HTML page in order to retrieve page title and
         all page references groups that are contained in 'ul' or 'ol' HTML tags.
+        Document tree is walked only once, so parsing time is proportional to
+        the size of the page. Nested lists are parts of the outermost list, so
+        their references are retrieved only once.
 
         page_text -- string containing HTML document
         
@@ -284,6 +654,24 @@ class SitePageParser(object):
         about parsed website page. Raises SitePageParseError exception in case of
         parse error.
         
+        """
+
+        if self._parsing_cache is None:
+            return self._parse_site_page(page_text)
+
+        # Byte-identical page may be already parsed
+        page_key = self._parsing_cache.get_key(page_text)
+        page_parsing_tuple = self._parsing_cache.get(page_key)
+        if page_parsing_tuple is not None:
+            return PageParsingInfo.from_tuple(page_parsing_tuple)
+        page_parsing_info = self._parse_site_page(page_text)
+        self._parsing_cache.put(page_key, page_parsing_info.to_tuple())
+        return page_parsing_info
+
+    def _parse_site_page(self, page_text):
+        """Parses given website HTML page without looking for it in parsing
+        cache (see parse_site_page method).
+
         """
         
         # Try to feed HTML page to lxml HTML parser
@@ -291,80 +679,298 @@ class SitePageParser(object):
             lxml_tree = etree.HTML(page_text)
         except etree.LxmlError, lxml_error:
             raise SitePageParseError(lxml_error)
- 
-        # Retrieve page title
-        page_title_text = lxml_tree.xpath('//title/text()')
-        if page_title_text:
-            page_title = page_title_text[0].strip()
-        else:
-            page_title = ''
-            
-        page_parsing_info = PageParsingInfo(page_title)
-        
-        # Set of references groups headlines that were already retrieved
-        # from page
-        page_headlines = set()
 
-        # Retrieve all lists ('ul' and 'ol' HTML tags) from page
-        page_lists = lxml_tree.xpath('//ul | //ol')
- 
-        # Retrieve groups of references
-        for page_list in page_lists:
-            # Look for references in current list
-            reference_tags = page_list.xpath('.//li//a[@href]')
-            if reference_tags:
-                # Look for headline for new reference group
-                preceding_headline_tag = \
-                        self._find_preceding_headline_tag(page_list)
-                if preceding_headline_tag is not None:
-                    preceding_headline_text = \
-                            preceding_headline_tag.xpath('.//text()')
-                    if preceding_headline_text:
-                        preceding_headline = preceding_headline_text[0].strip()
-                    else:
-                        preceding_headline = ''
-                else:
-                    preceding_headline = ''
-
-                # If headline was found and it is one of the titles of 
-                # references groups that were already retrieved from page
-                # we should not create new group of references, we should
-                # add new refernces to a group corresponding to this title.
-                # In opposite situation we should create a new group 
-                # of references.
-                if not preceding_headline or \
-                        preceding_headline not in page_headlines:
-                    # Create a new references group and set as current
-                    references_group_headline = preceding_headline
-                    new_references_group = \
-                            ReferencesGroupParsingInfo(references_group_headline)
-                    page_parsing_info.add_references_group(new_references_group)
-                    current_references_group = new_references_group
-                    page_headlines.add(preceding_headline)
-                else: 
-                    # Find references group corresponding to headline and 
-                    # set it as current
-                    current_references_group = \
-                            page_parsing_info.find_references_group_by_headline(
-                                    preceding_headline)
- 
-                # Add new references to the current group of references
-                for reference_tag in reference_tags:
-                    # Extract reference parsing info
-                    reference = reference_tag.attrib['href']
-                    reference_tag_text = reference_tag.xpath('.//text()')
-                    # Because at the current time we only deal with 
-                    # text references it may happen that reference
-                    # has no title
-                    if reference_tag_text:
-                        reference_title = reference_tag_text[0].strip()
-                    else:
-                        reference_title = ''
-                    # Add new reference to current group of references
-                    reference_parsing_info = TextReferenceParsingInfo(reference, 
-                                              reference_title)
-                    current_references_group.add_reference(reference_parsing_info)
-            
-        return page_parsing_info
-    
-                    
\ No newline at end of file
+        # Page without any tags has no title and no references
+        if lxml_tree is None:
+            return PageParsingInfo('')
+
+        # Walk through the document tree
+        site_page_walker = _SitePageWalker()
+        for event, element in etree.iterwalk(lxml_tree,
+                                             events = ('start', 'end')):
+            site_page_walker.walk(event, element)
+        return site_page_walker.finish()
+
+
+class IncrementalSitePageParser(object):
+    """Website page parser which is fed with a HTML document by chunks, 
+    e.g. as they are received from network. Every chunk is parsed at once,
+    so the page is parsed while the rest of it is being downloaded, and the
+    whole document is never kept as a string. Parsing information is the
+    same as the one retrieved by SitePageParser.
+
+    Parser may retrieve only page title, then it reports when the title is
+    found, so the rest of the page may be not downloaded at all.
+
+    """
+
+    def __init__(self, title_only = False):
+        """Initializes parser of a new page.
+
+        title_only -- boolean parametr which states whether only page title
+                      is retrieved, references groups are not retrieved
+                      (by default is False)
+
+        """
+
+        self._lxml_parser = etree.HTMLPullParser(events = ('start', 'end'))
+        self._site_page_walker = _SitePageWalker(title_only)
+        # The end of the last chunk which was not fed to lxml parser yet
+        self._unfed_data = ''
+        # Parse error which stopped parsing or None
+        self._parse_error = None
+        # Whether any data was fed to the parser
+        self._fed = False
+        # Parsing information about the page which is set when parsing is
+        # finished
+        self._page_parsing_info = None
+
+    @property
+    def page_parsing_info(self):
+        """Returns PageParsingInfo class instance containing references 
+        groups retrieved from the part of the page which is parsed yet.
+
+        """
+
+        if self._site_page_walker is None:
+            return self._page_parsing_info
+        return self._site_page_walker.page_parsing_info
+
+    @property
+    def is_complete(self):
+        """Returns True if the rest of the page is not needed, because only
+        page title is retrieved and it is already found.
+
+        """
+
+        return self._site_page_walker is not None and \
+                self._site_page_walker.is_complete
+
+    def _walk_parsed_elements(self):
+        """Walks through elements which were parsed since the last call."""
+
+        for event, element in self._lxml_parser.read_events():
+            self._site_page_walker.walk(event, element)
+
+    def _feed_lxml_parser(self, data):
+        """Feeds given data to lxml parser and walks through parsed elements.
+        Parse error is remembered to be raised when parsing is finished.
+
+        """
+
+        try:
+            self._lxml_parser.feed(data)
+            self._walk_parsed_elements()
+        except etree.LxmlError, lxml_error:
+            self._parse_error = lxml_error
+
+    def feed(self, data):
+        """Parses the next chunk of HTML document. Parse errors are not 
+        raised at once, the rest of the document is ignored after parse error.
+
+        data -- string containing a part of HTML document
+
+        """
+
+        if self._parse_error is not None or not data or self.is_complete:
+            return
+        self._fed = True
+        # libxml2 HTML push parser doesn't find the end of 'script' and
+        # 'style' tags if a closing tag is split between chunks, so chunks
+        # are cut after the last '>' and the rest is fed with the next chunk
+        data = self._unfed_data + data
+        fed_data_end = data.rfind('>') + 1
+        self._unfed_data = data[fed_data_end : ]
+        if fed_data_end:
+            self._feed_lxml_parser(data[ : fed_data_end])
+
+    def _finish_parsing(self):
+        """Feeds the rest of the document to lxml parser, finishes the walk
+        through the document and releases lxml objects.
+
+        """
+
+        if self._unfed_data and self._parse_error is None:
+            self._feed_lxml_parser(self._unfed_data)
+            self._unfed_data = ''
+        if self._parse_error is None:
+            try:
+                self._lxml_parser.close()
+                self._walk_parsed_elements()
+            except etree.LxmlError, lxml_error:
+                # Page without any tags has no title and no references
+                if self._fed:
+                    self._parse_error = lxml_error
+        self._page_parsing_info = self._site_page_walker.finish()
+        self._lxml_parser = None
+        self._site_page_walker = None
+
+    def close(self):
+        """Finishes parsing of the page. lxml objects are released, so 
+        parsing information may be requested by another thread than the one
+        which parsed the page. Parser may be closed several times.
+
+        Returns PageParsingInfo class instance which contains parsing 
+        information about parsed website page. Raises SitePageParseError
+        exception in case of parse error.
+
+        """
+
+        if self._lxml_parser is not None:
+            self._finish_parsing()
+        if self._parse_error is not None:
+            raise SitePageParseError(self._parse_error)
+        return self._page_parsing_info
+
+
+class PendingPageParsingInfo(object):
+    """Parsing information about a site page which is not parsed yet.
+    Page is parsed either by a worker process of SitePageParserPool,
+    by a site page parser when parsing information is requested or by 
+    an incremental site page parser while it is being read. Parsing 
+    information may be also found in parsing cache.
+
+    """
+
+    def __init__(self, site_page_parser = None, page_text = None, 
+                 async_result = None, incremental_site_page_parser = None,
+                 page_parsing_tuple = None, parsing_cache = None, 
+                 page_key = None):
+        """Initializes pending page parsing information. Either site page
+        parser and page text, result of asynchronous parsing, incremental
+        site page parser fed with the whole page or cached page parsing tuple
+        have to be given.
+
+        site_page_parser -- SitePageParser class instance which is intended
+                            to parse the page (by default is None)
+        page_text --        string containing HTML document (by default 
+                            is None)
+        async_result --     multiprocessing.pool.AsyncResult class instance
+                            corresponding to parsing in worker process 
+                            (by default is None)
+        incremental_site_page_parser --
+                            IncrementalSitePageParser class instance which
+                            was fed with the page (by default is None)
+        page_parsing_tuple --
+                            page parsing tuple found in parsing cache (see
+                            PageParsingInfo.to_tuple method) (by default 
+                            is None)
+        parsing_cache --    PageParsingCache class instance where result of
+                            asynchronous parsing is stored (by default 
+                            is None)
+        page_key --         cache key of the page parsed asynchronously 
+                            (by default is None)
+
+        """
+
+        self._site_page_parser = site_page_parser
+        self._page_text = page_text
+        self._async_result = async_result
+        self._incremental_site_page_parser = incremental_site_page_parser
+        self._page_parsing_tuple = page_parsing_tuple
+        self._parsing_cache = parsing_cache
+        self._page_key = page_key
+
+    def get(self):
+        """Waits for the page to be parsed.
+
+        Returns PageParsingInfo class instance. Raises SitePageParseError 
+        exception in case of parse error.
+
+        """
+
+        if self._page_parsing_tuple is not None:
+            return PageParsingInfo.from_tuple(self._page_parsing_tuple)
+        if self._incremental_site_page_parser is not None:
+            return self._incremental_site_page_parser.close()
+        if self._async_result is None:
+            return self._site_page_parser.parse_site_page(self._page_text)
+
+        page_parsing_tuple, parse_error_message = self._async_result.get()
+        if parse_error_message is not None:
+            raise SitePageParseError(parse_error_message)
+        if self._parsing_cache is not None:
+            self._parsing_cache.put(self._page_key, page_parsing_tuple)
+        return PageParsingInfo.from_tuple(page_parsing_tuple)
+
+
+# Site page parser of a worker process of SitePageParserPool
+_worker_site_page_parser = None
+
+def _parse_site_page_in_worker(page_text):
+    """Parses given website HTML page in a worker process.
+
+    page_text -- string containing HTML document
+
+    Returns a (page parsing tuple, parse error message) pair. Page parsing
+    tuple is returned by PageParsingInfo.to_tuple method, parse error message
+    is None if page was parsed successfully. lxml exceptions are not passed 
+    to the main process as is, because they may be not picklable.
+
+    """
+
+    global _worker_site_page_parser
+    if _worker_site_page_parser is None:
+        _worker_site_page_parser = SitePageParser()
+    try:
+        page_parsing_info = _worker_site_page_parser.parse_site_page(page_text)
+    except SitePageParseError, parse_error:
+        return None, str(parse_error._lxml_error)
+    return page_parsing_info.to_tuple(), None
+
+
+class SitePageParserPool(object):
+    """Pool of worker processes which parse website pages. Parsing is 
+    CPU-bound, so parsing pages in worker processes allows to use all 
+    processor cores and to parse pages while other pages are being 
+    downloaded. Pages are passed to workers as raw strings, parsing 
+    information is passed back in a compact form. Parsing cache is used
+    in the main process, so pages found there are not sent to workers.
+
+    """
+
+    def __init__(self, processes_number = None, parsing_cache = None):
+        """Initializes parser pool and starts worker processes.
+
+        processes_number -- number of worker processes. None means the number
+                            of processor cores (by default is None)
+        parsing_cache --    PageParsingCache class instance where parsing 
+                            results are looked for before sending pages to
+                            workers and stored after parsing. None means that
+                            every page is parsed (by default is None)
+
+        """
+
+        self._pool = multiprocessing.Pool(processes_number)
+        self._parsing_cache = parsing_cache
+
+    def parse_site_page_async(self, page_text):
+        """Sends given website HTML page to a worker process in order 
+        to parse it.
+
+        page_text -- string containing HTML document
+
+        Returns PendingPageParsingInfo class instance.
+
+        """
+
+        page_key = None
+        if self._parsing_cache is not None:
+            # Byte-identical page may be already parsed
+            page_key = self._parsing_cache.get_key(page_text)
+            page_parsing_tuple = self._parsing_cache.get(page_key)
+            if page_parsing_tuple is not None:
+                return PendingPageParsingInfo(
+                        page_parsing_tuple = page_parsing_tuple)
+
+        async_result = self._pool.apply_async(_parse_site_page_in_worker,
+                                              (page_text, ))
+        return PendingPageParsingInfo(async_result = async_result,
+                                      parsing_cache = self._parsing_cache,
+                                      page_key = page_key)
+
+    def close(self):
+        """Stops worker processes after all pages are parsed."""
+
+        self._pool.close()
+        self._pool.join()
@@ -1,17 +1,37 @@
 import urllib2        # For downloading resourses from Internet
+import urllib         # For using urllib.addinfourl class
 import urlparse       # For operations with URL stings
 import socket         # For using socket.error exception
 import httplib        # For using httplib.InvalidURL, httplib.HTTPException
                       # and httplib.NotConnected exceptions
 import exceptions     # For using ValueError and IOError exceptions
-import robotparser    # For parsing robots.txt files
-import time           # For using time.sleep() function
+import time           # For using time.sleep() and time.time() functions
 import random         # For using random numbers generator
 import logging        # For logging
+import hashlib        # For fingerprinting references groups
+import threading      # For using threading.Lock
+
+from cStringIO import StringIO
 
 from sitemap_tree import SitemapTreeElement, HeadlineElement, \
                          TextReferenceElement
-from site_page_parser import SitePageParser, SitePageParseError
+from site_page_parser import SitePageParser, SitePageParseError, \
+                             SitePageParserPool, PendingPageParsingInfo, \
+                             IncrementalSitePageParser
+from crawl_frontier import ReferencesCrawlingFrontier
+from http_transport import HTTPConnectionPool, KeepAliveHTTPHandler, \
+                           KeepAliveHTTPSHandler, TimeoutHTTPHandler, \
+                           TimeoutHTTPSHandler, ContentDecodingProcessor
+from download_throttle import AdaptiveDownloadThrottle, parse_retry_after
+from crawl_checkpoint import CrawlCheckpointJournal, CrawlCheckpointError
+from http_cache import HTTPResponseCache
+from page_parsing_cache import PageParsingCache
+from robotstxt_matcher import RobotsTxtMatcher
+from host_metadata_cache import HostMetadataCache
+from url_canonicalizer import URLCanonicalizer
+from url_fingerprint_set import URLFingerprintSet, URLBloomFilter
+from spider_trap_detector import SpiderTrapDetector
+from sitemap_xml_reader import read_sitemap_xml, SitemapXMLError
 
 
 __doc__ = """
@@ -193,6 +213,37 @@ class ResourseRetrieveError(SiteSpiderError):
         return 'Unable to retrieve resourse from %s: '% self._url + \
                str(self._exception)
 
+
+class UnsuitableContentTypeError(SiteSpiderError):
+    """Class for errors raised if downloaded resourse is not a website page
+    according to its Content-Type header. Contains URL of the resourse and
+    its content type.
+    
+    """
+    
+    def __init__(self, url, content_type):
+        self._url = url
+        self._content_type = content_type
+        
+    def __str__(self):
+        return 'Unsuitable content type of %s: %s' % (self._url, 
+                                                      self._content_type)
+
+
+class ResourseTooLargeError(SiteSpiderError):
+    """Class for errors raised if downloaded resourse exceeds maximum 
+    resourse size. Contains URL of the resourse and maximum resourse size.
+    
+    """
+    
+    def __init__(self, url, max_resourse_size):
+        self._url = url
+        self._max_resourse_size = max_resourse_size
+        
+    def __str__(self):
+        return 'Resourse %s is larger than %d bytes' % \
+               (self._url, self._max_resourse_size)
+
     
 class SiteSpider(object):
     """Site spider class. Site spider is intended to crawl given website with
@@ -204,10 +255,69 @@ class SiteSpider(object):
     # clawling was finished successfully or not.
     CRAWLING_STATUS_SUCCESS = 1
     CRAWLING_STATUS_ERROR = 0
+
+    # Scheduling strategies of site spider. They state the order in which
+    # scheduled references are processed.
+    SCHEDULING_STRATEGY_DEPTH_FIRST = \
+            ReferencesCrawlingFrontier.SCHEDULING_STRATEGY_DEPTH_FIRST
+    SCHEDULING_STRATEGY_BREADTH_FIRST = \
+            ReferencesCrawlingFrontier.SCHEDULING_STRATEGY_BREADTH_FIRST
+    SCHEDULING_STRATEGY_PRIORITY = \
+            ReferencesCrawlingFrontier.SCHEDULING_STRATEGY_PRIORITY
+
+    # Content types of resourses which are considered as website pages
+    PAGE_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 
+                          'application/xml', 'text/xml')
+
+    # Number of bytes read from downloaded resourse at once
+    READ_CHUNK_SIZE = 64 * 1024
+
+    # Number of bytes read at once from downloaded page which only title
+    # is needed. Title is usually found in the first chunk, so the rest of 
+    # the page is not read.
+    TITLE_READ_CHUNK_SIZE = 8 * 1024
+
+    # Number of seconds responses downloaded while starting crawling are 
+    # kept in order to use them instead of downloading the same resourses 
+    # again
+    STARTUP_RESPONSE_TIME_TO_LIVE = 60
+
+    # Maximum number of sitemap XML files (including sitemap indexes) and
+    # maximum number of references taken from them
+    MAX_SITEMAP_FILES_NUMBER = 50
+    MAX_SITEMAP_REFERENCES_NUMBER = 1000000
+
+    # Status codes of responses which mean that server is overloaded and
+    # request has to be repeated later
+    OVERLOAD_STATUS_CODES = (429, httplib.SERVICE_UNAVAILABLE)
     
     def __init__(self, site_homepage_address, depth_limit = 0,
                  download_delay = 0, connection_attempts_number = 1,
-                 connection_attempt_timeout = 0, robotstxt_obey = True):
+                 connection_attempt_timeout = 0, robotstxt_obey = True,
+                 scheduling_strategy = SCHEDULING_STRATEGY_DEPTH_FIRST,
+                 reference_priority = None, keep_alive = True,
+                 connection_pool_size = 2, connection_idle_timeout = 30,
+                 parsing_processes_number = 0, checkpoint_file_name = None,
+                 checkpoint_interval = 60, resume_crawling = False,
+                 http_cache_directory = None, 
+                 accept_compressed_content = True,
+                 max_resourse_size = 10 * 1024 * 1024, connect_timeout = 30,
+                 read_timeout = 60, request_timeout = 120,
+                 crawling_time_limit = 0, adaptive_download_delay = False,
+                 min_download_delay = 0, max_download_delay = 60,
+                 host_cache_file_name = None, 
+                 host_cache_time_to_live = 24 * 60 * 60,
+                 ignored_query_parameters = None,
+                 canonicalization_memo_size = 10000,
+                 viewed_references_false_positive_rate = 0,
+                 expected_references_number = 1000000,
+                 frontier_memory_limit = 0,
+                 frontier_segments_directory = None,
+                 skip_repeated_references_groups = True,
+                 max_query_variants = 100, max_pattern_references = 1000,
+                 max_repeated_path_segments = 3, read_sitemaps = False,
+                 incremental_page_parsing = False,
+                 parsing_cache_directory = None, parsing_cache_size = 0):
         """Initializes site spider preferences.
         
         site_homepage_address --      URL of a website which is intended 
@@ -236,6 +346,200 @@ class SiteSpider(object):
         robotstxt_obey --             boolean parametr which states whether
                                       site spider will respect robots.txt 
                                       policies or not (by default is True)
+        scheduling_strategy --        strategy which states the order in which
+                                      scheduled references are processed:
+                                      depth-first, breadth-first or priority.
+                                      Breadth-first and priority strategies
+                                      guarantee that every page is added to 
+                                      sitemap tree with its least depth.
+                                      (by default is depth-first)
+        reference_priority --         function which takes 
+                                      TextReferenceCrawlingInfo class instance
+                                      and returns its priority (the less value
+                                      means the higher priority). References 
+                                      with equal depth are processed in order
+                                      of their priorities. It is required for
+                                      priority scheduling strategy only.
+                                      (by default is None)
+        keep_alive --                 boolean parametr which states whether
+                                      site spider will reuse persistent 
+                                      HTTP/1.1 connections to website hosts
+                                      or not (by default is True)
+        connection_pool_size --       maximum number of idle persistent 
+                                      connections kept for every website host
+                                      (by default is 2)
+        connection_idle_timeout --    number of seconds a persistent 
+                                      connection may stay idle before it is
+                                      closed (by default is 30)
+        parsing_processes_number --   number of worker processes which parse
+                                      downloaded pages. '0' means that pages
+                                      are parsed by site spider process 
+                                      itself, None means the number of 
+                                      processor cores (by default is 0)
+        checkpoint_file_name --       name of a file where crawling state is 
+                                      saved periodically in order to resume
+                                      crawling if it is interrupted. None 
+                                      means that crawling state is not saved
+                                      (by default is None)
+        checkpoint_interval --        minimum number of seconds between 
+                                      savings of crawling state 
+                                      (by default is 60)
+        resume_crawling --            boolean parametr which states whether
+                                      site spider will continue crawling from
+                                      the state saved in checkpoint file or 
+                                      start it from the beginning 
+                                      (by default is False)
+        http_cache_directory --       name of a directory where downloaded 
+                                      resourses are cached. Cached resourses
+                                      are requested with conditional requests
+                                      while crawling the same website again,
+                                      so unchanged resourses are not 
+                                      downloaded. None means that resourses 
+                                      are not cached (by default is None)
+        accept_compressed_content --  boolean parametr which states whether
+                                      site spider will ask servers to compress
+                                      resourses with gzip or deflate content
+                                      encoding. Compressed resourses are 
+                                      decompressed while being read.
+                                      (by default is True)
+        max_resourse_size --          maximum number of bytes of a website 
+                                      page. Larger pages are not read 
+                                      completely and are skipped. '0' means 
+                                      no size limitation 
+                                      (by default is 10 MB)
+        connect_timeout --            number of seconds to wait for 
+                                      connection to website host to be
+                                      established (by default is 30)
+        read_timeout --               number of seconds to wait for data 
+                                      from server while it is sending 
+                                      response (by default is 60)
+        request_timeout --            maximum number of seconds from sending 
+                                      request to receiving the whole 
+                                      resourse, so slow servers can't hold
+                                      site spider. '0' means no time 
+                                      limitation (by default is 120)
+        crawling_time_limit --        maximum number of seconds crawling 
+                                      process may last. When it is over, 
+                                      crawling is stopped and sitemap tree
+                                      built so far is kept. '0' means no time
+                                      limitation (by default is 0)
+        adaptive_download_delay --    boolean parametr which states whether
+                                      interval between requests is adapted 
+                                      to server state: it is decreased while
+                                      server answers quickly and increased
+                                      when server becomes slow or asks to 
+                                      slow down with 429 or 503 status code.
+                                      download_delay is used as initial 
+                                      interval (by default is False)
+        min_download_delay --         floor of adaptive interval between 
+                                      requests (by default is 0)
+        max_download_delay --         ceiling of adaptive interval between
+                                      requests. Requests which server asks 
+                                      to repeat later than this number of 
+                                      seconds are not repeated. Crawl-delay
+                                      of robots.txt file is restricted by it
+                                      too (by default is 60)
+        host_cache_file_name --       name of a file where robots.txt file,
+                                      resolved addresses of website host and
+                                      URL the homepage is redirected to are
+                                      cached, so they are not requested 
+                                      while crawling the same website again.
+                                      None means that they are not cached
+                                      (by default is None)
+        host_cache_time_to_live --    number of seconds values cached in
+                                      host cache are valid for 
+                                      (by default is 1 day)
+        ignored_query_parameters --   sequence of names of query parametrs
+                                      which are removed from references, so
+                                      references which differ only by them
+                                      lead to the same page. Names may be 
+                                      shell-style patterns (e.g. 'utm_*').
+                                      None means parametrs used for tracking
+                                      visitors (by default is None)
+        canonicalization_memo_size -- maximum number of references which
+                                      canonical forms are memoized 
+                                      (by default is 10000)
+        viewed_references_false_positive_rate --
+                                      processed references are kept as 
+                                      64-bit fingerprints. If this parametr
+                                      is stated, they are kept in a Bloom
+                                      filter instead, which takes less 
+                                      memory, but considers a reference 
+                                      which was not processed as processed
+                                      with this probability. References 
+                                      checked by spider trap detector are 
+                                      kept in the same way. '0' means that
+                                      Bloom filter is not used 
+                                      (by default is 0)
+        expected_references_number -- expected number of processed 
+                                      references. Bloom filter is sized for
+                                      it (by default is 1000000)
+        frontier_memory_limit --      maximum number of scheduled references
+                                      kept in memory. The rest are spilled 
+                                      to segment files on disk, and the index
+                                      of scheduled references is kept in a 
+                                      database on disk. It can't be used
+                                      with priority scheduling strategy.
+                                      '0' means no limitation 
+                                      (by default is 0)
+        frontier_segments_directory --
+                                      directory where segment files of 
+                                      crawling frontier are written. None 
+                                      means the default temporary directory
+                                      (by default is None)
+        skip_repeated_references_groups --
+                                      boolean parametr which states whether
+                                      references groups repeated on several
+                                      pages (e.g. navigation menus) are 
+                                      processed only once. A group is 
+                                      skipped if a group with the same 
+                                      headline and the same set of 
+                                      references was processed on a page 
+                                      with the same or less crawling depth
+                                      and all its references are processed
+                                      or scheduled (by default is True)
+        max_query_variants --         maximum number of references with the
+                                      same path and the same names of query
+                                      parametrs (e.g. '?page=N' listings or
+                                      faceted search). The rest are 
+                                      considered as a spider trap and are 
+                                      filtered. '0' means no limitation
+                                      (by default is 100)
+        max_pattern_references --     maximum number of references which
+                                      paths differ only by numbers (e.g. 
+                                      calendars). '0' means no limitation
+                                      (by default is 1000)
+        max_repeated_path_segments -- maximum number of occurrences of the 
+                                      same segment in reference path. '0' 
+                                      means no limitation (by default is 3)
+        read_sitemaps --              boolean parametr which states whether
+                                      sitemap XML files stated by Sitemap 
+                                      directives of robots.txt file are read.
+                                      Cached pages which were not modified 
+                                      since the time stated in sitemap files
+                                      are taken from HTTP cache without 
+                                      requests (by default is False)
+        incremental_page_parsing --   boolean parametr which states whether
+                                      downloaded pages are parsed by chunks
+                                      while they are being read, so parsing
+                                      time overlaps with transfer time. It is
+                                      used only if pages are parsed by site 
+                                      spider process itself and parsing 
+                                      cache is not used (by default is False)
+        parsing_cache_directory --    name of a directory where results of
+                                      pages parsing are stored by hashes of
+                                      page contents, so byte-identical pages
+                                      are not parsed again while crawling the
+                                      same website later. None means that 
+                                      results are not stored on disk 
+                                      (by default is None)
+        parsing_cache_size --         maximum number of pages parsing results
+                                      kept in memory, so byte-identical pages
+                                      are parsed only once while crawling. 
+                                      Pages are parsed after they are read
+                                      completely if parsing cache is used.
+                                      '0' means that results are not kept in
+                                      memory (by default is 0)
                                       
         """
         
@@ -250,6 +554,10 @@ class SiteSpider(object):
         # with the limits of this domain.
         self._allowed_domain = self._normalize_homepage_address(
                                    site_homepage_address)
+        # Set canonicalizer of references found on website pages
+        self._url_canonicalizer = URLCanonicalizer(self._allowed_domain,
+                                   ignored_query_parameters,
+                                   canonicalization_memo_size)
         
         # Check a type of 'depth_limit' parametr        
         if not isinstance(depth_limit, (int, long)):
@@ -276,9 +584,21 @@ class SiteSpider(object):
         self._connection_attempt_timeout = connection_attempt_timeout
         
         self._robotstxt_obey = robotstxt_obey
-        # Set a parser of robots.txt file which is provided by
-        # python built-in library robotparser
-        self._robotstxt_file_parser = robotparser.RobotFileParser()
+        # Set a parser of robots.txt file which compiles rules applied to
+        # site spider
+        self._robotstxt_file_parser = RobotsTxtMatcher(self._name)
+
+        # Set cache of website host metadata
+        if host_cache_file_name is not None:
+            self._host_metadata_cache = HostMetadataCache(
+                                         host_cache_file_name,
+                                         host_cache_time_to_live)
+            host_resolver = self._host_metadata_cache.resolve_host
+        else:
+            self._host_metadata_cache = None
+            host_resolver = None
+        # URL the homepage is redirected to, if it is known
+        self._homepage_redirect_address = None
 
         # Set request headers
         user_agent_header = self._name
@@ -288,21 +608,186 @@ class SiteSpider(object):
             'User-Agent': user_agent_header,
             'Accept': accept_header
         }
+
+        # Set adaptive download throttle if needed
+        if not isinstance(max_download_delay, (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        self._max_download_delay = max_download_delay
+        if adaptive_download_delay:
+            self._download_throttle = AdaptiveDownloadThrottle(
+                                       min_download_delay, max_download_delay,
+                                       download_delay)
+        else:
+            self._download_throttle = None
+
+        # Check types of timeout parametrs
+        for timeout in (connect_timeout, read_timeout, request_timeout,
+                        crawling_time_limit):
+            if not isinstance(timeout, (int, long, float)):
+                raise TypeError('int, long or float type expected')
+        self._connect_timeout = connect_timeout
+        self._crawling_time_limit = crawling_time_limit
+        self._crawling_start_time = None
+        self._crawling_time_limit_exceeded = False
+        self._first_page_parsing_time = None
+
+        # self._startup_responses maps URLs to responses downloaded while 
+        # starting crawling. Responses are (storing time, URL, headers, 
+        # body) tuples. Every response is kept by requested URL and by the 
+        # URL it was redirected to.
+        # Initialize it with an empty dictionary
+        self._startup_responses = {}
+
+        # Set an opener of URLs. If persistent connections are used, it sends
+        # requests through a pool of connections, which is shared by
+        # the whole crawling process
+        url_handlers = []
+        if keep_alive:
+            self._connection_pool = HTTPConnectionPool(connection_pool_size,
+                                                       connection_idle_timeout)
+            url_handlers.append(KeepAliveHTTPHandler(self._connection_pool,
+                                        read_timeout = read_timeout,
+                                        request_timeout = request_timeout,
+                                        host_resolver = host_resolver))
+            url_handlers.append(KeepAliveHTTPSHandler(self._connection_pool,
+                                        read_timeout = read_timeout,
+                                        request_timeout = request_timeout,
+                                        host_resolver = host_resolver))
+        else:
+            self._connection_pool = None
+            url_handlers.append(TimeoutHTTPHandler(
+                                        read_timeout = read_timeout,
+                                        request_timeout = request_timeout,
+                                        host_resolver = host_resolver))
+            url_handlers.append(TimeoutHTTPSHandler(
+                                        read_timeout = read_timeout,
+                                        request_timeout = request_timeout,
+                                        host_resolver = host_resolver))
+        # If compressed resourses are accepted, opener asks servers to 
+        # compress them and decompresses them while they are being read
+        if accept_compressed_content:
+            self._content_decoding_processor = ContentDecodingProcessor()
+            url_handlers.append(self._content_decoding_processor)
+        else:
+            self._content_decoding_processor = None
+        self._url_opener = urllib2.build_opener(*url_handlers)
+
+        # Check a type of 'max_resourse_size' parametr
+        if not isinstance(max_resourse_size, (int, long)):
+            raise TypeError('int or long type expected')
+        self._max_resourse_size = max_resourse_size
+
+        # Set cache of downloaded resourses
+        if http_cache_directory is not None:
+            self._http_response_cache = HTTPResponseCache(http_cache_directory)
+        else:
+            self._http_response_cache = None
         
+        # Set cache of pages parsing results
+        if parsing_cache_directory is not None or parsing_cache_size:
+            self._page_parsing_cache = PageParsingCache(
+                    parsing_cache_directory, parsing_cache_size)
+        else:
+            self._page_parsing_cache = None
+
         # Set parser of web pages
-        self._site_page_parser = SitePageParser()
+        self._site_page_parser = SitePageParser(self._page_parsing_cache)
+
+        # Check a type of 'parsing_processes_number' parametr
+        if parsing_processes_number is not None and \
+                not isinstance(parsing_processes_number, (int, long)):
+            raise TypeError('int or long type expected')
+        self._parsing_processes_number = parsing_processes_number
+        # self._site_page_parser_pool contains a pool of worker processes 
+        # parsing web pages. It is started when crawling starts.
+        # Initialize it with None
+        self._site_page_parser_pool = None
+        self._incremental_page_parsing = incremental_page_parsing
+
+        # Statistics of pages which were read only until their titles
+        self._title_only_pages_number = 0
+        self._title_only_read_bytes_number = 0
+        self._title_only_unread_bytes_number = 0
+        self._title_parsing_time = 0
+        # Pages may be downloaded and read by several threads (see 
+        # AsyncSiteSpider), so statistics they change are changed only with
+        # the lock acquired
+        self._statistics_lock = threading.Lock()
         
-        # self._references_crawling_info_schedule contains instances of 
-        # ReferenceCrawlingInfo class corresponding to references that 
-        # site spider have to process. Initialize it with an empty list
-        self._references_crawling_info_schedule = []
+        # self._references_crawling_info_schedule is a crawling frontier
+        # which contains instances of ReferenceCrawlingInfo class corresponding
+        # to references that site spider have to process.
+        # Initialize it with an empty frontier
+        # Spilled references refer to their parents by identifiers of
+        # sitemap tree elements
+        self._references_crawling_info_schedule = ReferencesCrawlingFrontier(
+                scheduling_strategy, reference_priority, 
+                frontier_memory_limit, frontier_segments_directory,
+                self._encode_reference_crawling_info,
+                self._decode_reference_crawling_info)
         # self._viewed_references is a set of references that were 
-        # already processed. Initialize it with an empty set
-        self._viewed_references = set()
+        # already processed. It keeps fingerprints of references instead of
+        # references themselves. Initialize it with an empty set. Spider 
+        # trap detector keeps checked references in sets of the same kind.
+        if not isinstance(viewed_references_false_positive_rate, 
+                          (int, long, float)):
+            raise TypeError('int, long or float type expected')
+        if viewed_references_false_positive_rate:
+            create_references_set = lambda: URLBloomFilter(
+                    expected_references_number,
+                    float(viewed_references_false_positive_rate))
+        else:
+            create_references_set = URLFingerprintSet
+        self._viewed_references = create_references_set()
+        # self._sitemap_modification_times maps references found in sitemap
+        # XML files to their last modification times.
+        # Initialize it with an empty dictionary
+        self._read_sitemaps = read_sitemaps
+        self._sitemap_modification_times = {}
+        self._unmodified_resourses_number = 0
+
+        # Set detector of spider traps
+        self._spider_trap_detector = SpiderTrapDetector(max_query_variants,
+                                      max_pattern_references,
+                                      max_repeated_path_segments,
+                                      create_references_set)
+
+        # self._references_group_fingerprints maps fingerprints of processed
+        # references groups to the least crawling depth of pages they were
+        # found on. It is None if repeated groups are not skipped.
+        if skip_repeated_references_groups:
+            self._references_group_fingerprints = {}
+        else:
+            self._references_group_fingerprints = None
+        self._skipped_references_groups_number = 0
+        self._skipped_group_references_number = 0
+        # self._redirect_aliases_number is a number of references which
+        # were redirected to already processed pages.
+        # Initialize it with 0
+        self._redirect_aliases_number = 0
         
         # self._sitemap_tree contains sitemap tree (root element of this tree)
         # built by site spider. Initialize it with None
         self._sitemap_tree = None
+        # self._sitemap_tree_elements contains all sitemap tree elements in
+        # order they were added, and self._sitemap_tree_element_ids maps 
+        # every element to its index in this list. Indexes are used as 
+        # identifiers of elements while saving crawling state.
+        # Initialize them with an empty list and an empty dictionary
+        self._sitemap_tree_elements = []
+        self._sitemap_tree_element_ids = {}
+
+        # Check a type of 'checkpoint_file_name' parametr
+        if checkpoint_file_name is not None and \
+                not isinstance(checkpoint_file_name, basestring):
+            raise TypeError('string type expected')
+        self._checkpoint_file_name = checkpoint_file_name
+        self._checkpoint_interval = checkpoint_interval
+        self._resume_crawling = resume_crawling
+        # self._checkpoint_journal contains a journal of crawling state 
+        # changes. It is opened when crawling starts.
+        # Initialize it with None
+        self._checkpoint_journal = None
                 
         # self._crawling_status contains current crawling status of a 
         # site spider. Crwaling is not started, so initialize it with None
@@ -344,6 +829,10 @@ class SiteSpider(object):
             else:
                 netloc = path
                 path = ''
+        # Host name and scheme are written the same way as in canonical 
+        # references
+        scheme = scheme.lower()
+        netloc = URLCanonicalizer.canonicalize_netloc(scheme, netloc)
         # Cut the query part if needed
         if query:
             query = ''
@@ -373,18 +862,52 @@ class SiteSpider(object):
         
         """
         
-        # Form the request
-        request = urllib2.Request(reference, headers = self._request_headers)
+        # The homepage is requested by URL it is redirected to, if the URL
+        # is known
+        request_reference = reference
+        if reference == self._allowed_domain and \
+                self._homepage_redirect_address:
+            request_reference = self._homepage_redirect_address
+
+        # Form the request. If resourse is cached, ask server to send it 
+        # only if it was modified
+        request_headers = self._request_headers
+        cache_entry = None
+        if self._http_response_cache:
+            cache_entry = self._http_response_cache.get_entry(reference)
+            # There is no need to send request, if sitemap file states that
+            # resourse was not modified since it was cached
+            modification_time = self._sitemap_modification_times.get(
+                                 reference)
+            if cache_entry and modification_time is not None and \
+                    modification_time <= cache_entry.stored_time:
+                resourse = self._http_response_cache.open_cached_resourse(
+                            cache_entry)
+                if resourse:
+                    with self._statistics_lock:
+                        self._unmodified_resourses_number += 1
+                    return resourse
+            if cache_entry:
+                request_headers = dict(request_headers)
+                request_headers.update(cache_entry.validation_headers)
+        request = urllib2.Request(request_reference, 
+                                  headers = request_headers)
 
         # Resourse is not downloaded yet and it's the first attempt to do it
         resourse_is_recieved = False
         connection_attempt_number = 1
+        request_attempt_number = 1
         resourse = None
 
         # Try to download resourse
         while not resourse_is_recieved:
+            # Wait until download throttle allows to send request
+            if self._download_throttle:
+                self._download_throttle.wait()
+            request_time = time.time()
             try:
-                resourse = urllib2.urlopen(request)
+                resourse = self._url_opener.open(request, 
+                                                 timeout = self._connect_timeout)
             except (httplib.InvalidURL, exceptions.ValueError):
                 # Given URL is invalid
                 raise InvalidURLError(reference)
@@ -401,7 +924,45 @@ class SiteSpider(object):
             except (urllib2.URLError, httplib.HTTPException, 
                     exceptions.IOError), error:
                 # Check the nature of a raised exception
-                if hasattr(error, 'reason') and \
+                if cache_entry and isinstance(error, urllib2.HTTPError) and \
+                        error.code == httplib.NOT_MODIFIED:
+                    # Resourse was not modified, so take it from cache
+                    error.close()
+                    if self._download_throttle:
+                        self._download_throttle.response_received(
+                                time.time() - request_time)
+                    resourse = self._http_response_cache.open_cached_resourse(
+                                cache_entry)
+                    if resourse:
+                        return resourse
+                    # Cached resourse is damaged, download it again
+                    cache_entry = None
+                    request = urllib2.Request(request_reference, 
+                                              headers = self._request_headers)
+                elif isinstance(error, urllib2.HTTPError) and \
+                        error.code in self.OVERLOAD_STATUS_CODES:
+                    # Server is overloaded and asks to repeat request later
+                    retry_after = parse_retry_after(
+                                   error.info().getheader('Retry-After'))
+                    error.close()
+                    if self._download_throttle:
+                        self._download_throttle.server_overloaded(retry_after)
+                    if retry_after is None:
+                        retry_after = self._connection_attempt_timeout
+                    # Check number of a request attempt
+                    if request_attempt_number < \
+                            self._connection_attempts_number and \
+                            retry_after <= self._max_download_delay:
+                        logging.warning('Server is overloaded (HTTP %d), '
+                                        'repeating request to %s in %d s' %
+                                (error.code, reference, retry_after))
+                        request_attempt_number += 1
+                        # Download throttle pauses requests by itself
+                        if not self._download_throttle:
+                            time.sleep(retry_after)
+                    else:
+                        raise ResourseRetrieveError(reference, error)
+                elif hasattr(error, 'reason') and \
                         isinstance(error.reason, socket.error):
                     # Connection also was not established (but another 
                     # exception is raised by urllib2)
@@ -415,77 +976,256 @@ class SiteSpider(object):
                         raise ConnectionError(reference)
                 else:
                     # Another error happend due to wich site spider is
-                    # unable to download requested resourse
+                    # unable to download requested resourse.
+                    # HTTP error contains response, close it in order to
+                    # release connection
+                    if isinstance(error, urllib2.HTTPError):
+                        error.close()
                     raise ResourseRetrieveError(reference, error)
             else:
                 # Resourse was downloaded succesfully
                 resourse_is_recieved = True
+                if self._download_throttle:
+                    self._download_throttle.response_received(
+                            time.time() - request_time)
+
+        # Store downloaded resourse in cache
+        if self._http_response_cache:
+            resourse = self._http_response_cache.cache_resourse(reference,
+                                                                resourse)
         return resourse
 
-    def _parse_robotstxt_file(self, robotstxt_file):
-        """Feeds robotstxt file to site spider robots.txt file parser.
+    def _parse_robotstxt_file(self, robotstxt_text):
+        """Feeds robotstxt file to site spider robots.txt file parser and
+        applies its crawl delay.
         
-        robotstxt_file -- file-like object containing robots.txt file contents
+        robotstxt_text -- string containing robots.txt file contents
         
         """
         
         # Get lines of robotstxt file and feed it to parser
-        robotstxt_lines = [line.strip() for line in robotstxt_file]
+        robotstxt_lines = [line.strip() for line in 
+                           robotstxt_text.splitlines()]
         self._robotstxt_file_parser.parse(robotstxt_lines)
 
+        crawl_delay = self._robotstxt_file_parser.crawl_delay
+        if crawl_delay:
+            if crawl_delay > self._max_download_delay:
+                logging.warning('Crawl-delay of robots.txt file (%s s) is '
+                                'restricted to %s s' % 
+                        (crawl_delay, self._max_download_delay))
+                crawl_delay = self._max_download_delay
+            logging.info('Crawl-delay of robots.txt file: %s s' % 
+                         crawl_delay)
+            self._apply_crawl_delay(crawl_delay)
+
+    def _keep_startup_response(self, reference, resourse, resourse_text):
+        """Keeps resourse downloaded while starting crawling in order to
+        use it instead of downloading the same resourse again.
+
+        reference --     requested URL
+        resourse --      file-like object returned by _download_site_resourse
+                         method
+        resourse_text -- string containing resourse contents
+
+        """
+
+        startup_response = (time.time(), resourse.geturl(), resourse.info(),
+                            resourse_text)
+        self._startup_responses[reference] = startup_response
+        self._startup_responses[resourse.geturl()] = startup_response
+
+    def _take_startup_response(self, reference):
+        """Takes resourse downloaded while starting crawling by its URL. 
+        Every resourse may be taken only once. Expired resourses are 
+        removed.
+
+        reference -- requested URL
+
+        Returns file-like object just like _download_site_resourse method
+        or None if there is no such resourse.
+
+        """
+
+        startup_response = self._startup_responses.get(reference)
+        if startup_response is None:
+            return None
+        # Remove all the URLs of the resourse
+        for startup_reference in [startup_reference for startup_reference, 
+                                  response in self._startup_responses.items()
+                                  if response is startup_response]:
+            del self._startup_responses[startup_reference]
+
+        storing_time, resourse_url, resourse_headers, resourse_text = \
+                startup_response
+        if time.time() - storing_time > self.STARTUP_RESPONSE_TIME_TO_LIVE:
+            return None
+        logging.info('Reused startup response: %s' % reference)
+        resourse = urllib.addinfourl(StringIO(resourse_text), 
+                                     resourse_headers, resourse_url)
+        resourse.code = httplib.OK
+        resourse.msg = 'OK'
+        return resourse
+
+    def _read_sitemap_files(self):
+        """Reads sitemap XML files stated in robots.txt file and sitemap 
+        files they refer to. Remembers last modification times of website
+        references found in them. Files which can't be read are skipped.
+
+        """
+
+        sitemap_references = list(self._robotstxt_file_parser.sitemaps)
+        read_sitemap_references = set()
+        sitemap_files_number = 0
+        while sitemap_references and \
+                sitemap_files_number < self.MAX_SITEMAP_FILES_NUMBER:
+            sitemap_reference = sitemap_references.pop(0)
+            if sitemap_reference in read_sitemap_references:
+                continue
+            read_sitemap_references.add(sitemap_reference)
+            sitemap_files_number += 1
+
+            try:
+                sitemap_file = self._download_site_resourse(sitemap_reference)
+            except SiteSpiderError, error:
+                logging.warning(str(error))
+                continue
+            references_number = 0
+            try:
+                for is_index_entry, reference, modification_time in \
+                        read_sitemap_xml(sitemap_file):
+                    # Sitemap files and pages of other websites are not
+                    # downloaded
+                    normalized_reference = self._normalize_reference(
+                                                   reference)
+                    if self._allowed_domain not in normalized_reference:
+                        continue
+                    if is_index_entry:
+                        # Sitemap file is downloaded by its own address,
+                        # because canonical form of a page address (e.g.
+                        # with trailing slash) may lead to another resourse
+                        sitemap_references.append(reference)
+                        continue
+                    reference = normalized_reference
+                    references_number += 1
+                    # Modification times of sitemap files are not needed
+                    if modification_time is not None and \
+                            len(self._sitemap_modification_times) < \
+                            self.MAX_SITEMAP_REFERENCES_NUMBER:
+                        self._sitemap_modification_times[reference] = \
+                                modification_time
+            except (SitemapXMLError, httplib.HTTPException, socket.error,
+                    exceptions.IOError), error:
+                logging.warning('Unable to read sitemap file %s: %s' %
+                        (sitemap_reference, error))
+            finally:
+                sitemap_file.close()
+            logging.info('Sitemap file read: %s, %d references' %
+                    (sitemap_reference, references_number))
+
+    def _apply_crawl_delay(self, crawl_delay):
+        """Makes site spider wait at least given number of seconds between
+        requests.
+
+        crawl_delay -- minimum interval between requests
+
+        """
+
+        if self._download_throttle:
+            self._download_throttle.min_delay = crawl_delay
+        elif crawl_delay > self._download_delay_lower_bound:
+            # Random download delay has to be not less than crawl delay
+            self._download_delay = crawl_delay
+            self._download_delay_lower_bound = crawl_delay
+            self._download_delay_upper_bound = max(
+                    self._download_delay_upper_bound, crawl_delay)
+
+    def _retrieve_robotstxt_file(self):
+        """Retrieves robots.txt file of the website from host cache or 
+        downloads it.
+
+        Returns string containing robots.txt file contents.
+        Raises the same exceptions as _download_site_resourse method.
+
+        """
+
+        # Define robots.txt file location
+        host_address = urlparse.urljoin(self._allowed_domain, '/')
+        if self._host_metadata_cache:
+            robotstxt_text = self._host_metadata_cache.get_robotstxt(
+                              host_address)
+            if robotstxt_text is not None:
+                logging.info('File robots.txt is taken from host cache')
+                return robotstxt_text
+
+        robotstxt_file_url = urlparse.urljoin(host_address, '/robots.txt')
+        robotstxt_file = self._download_site_resourse(robotstxt_file_url)
+        try:
+            robotstxt_text = robotstxt_file.read()
+        except (httplib.HTTPException, socket.error, 
+                exceptions.IOError), error:
+            raise ResourseRetrieveError(robotstxt_file_url, error)
+        finally:
+            robotstxt_file.close()
+
+        # Delay spider if corresponding parametr it is stated  
+        if self._download_delay:
+            self._delay()
+
+        if self._host_metadata_cache:
+            self._host_metadata_cache.set_robotstxt(host_address,
+                                                    robotstxt_text)
+        return robotstxt_text
+
     def _normalize_reference(self, reference):
-        """Normalizes reference - makes it absolute and 
-        adds tracing slash if needed
+        """Normalizes reference - reduces it to canonical form with the help
+        of URL canonicalizer (makes it absolute, adds tracing slash if 
+        needed, etc.)
         
         reference -- corresponding URL
         
         Returns normalized URL
         """
         
-        # Split URL to parts
-        reference_parts = urlparse.urlsplit(reference, allow_fragments = False)
-        scheme = reference_parts.scheme
-        path = reference_parts.path
-        normalized_reference = reference
-
-        # Add tracing '/' if there no query part of URL and no file extention
-        # in the path part of URL
-        if not reference_parts.query and '.' not in path:
-            if not path.endswith('/'):
-                path += '/'
-                reference_parts = (scheme, reference_parts.netloc, path, 
-                                   reference_parts.query, reference_parts.fragment)
-                normalized_reference = urlparse.urlunsplit(reference_parts)
-
-        # Make URL absolute if it is relative
-        if not scheme:
-            normalized_reference = urlparse.urljoin(self._allowed_domain, 
-                                    normalized_reference)
-        return normalized_reference
+        return self._url_canonicalizer.canonicalize(reference)
     
-    def _normalize_reference_parsing_info(self, reference_parsing_info):
-        """Normalizes given parsing information about reference. 
-        Actually, normalizes reference in this parsing information.
+    def _normalize_references_parsing_info(self, references_parsing_info, 
+                                           normalized_references):
+        """Normalizes given parsing information about references. 
+        Actually, replaces references in this parsing information with 
+        normalized ones.
         
-        reference_parsing_info -- ReferenceParsingInfo class or its subclass 
-                                  instance containing reference 
-                                  parsing information
+        references_parsing_info -- list of ReferenceParsingInfo class or its 
+                                   subclass instances containing references
+                                   parsing information
+        normalized_references --   dictionary which maps references to 
+                                   normalized ones
                                   
-        Returns ReferenceParsingInfo class or its subclass instance with 
-        normalized reference.
+        Returns given list.
         
         """
         
-        reference = reference_parsing_info.reference
-        normalized_reference = self._normalize_reference(reference)
-        reference_parsing_info.reference = normalized_reference
-        return reference_parsing_info
+        for reference_parsing_info in references_parsing_info:
+            reference_parsing_info.reference = \
+                    normalized_references[reference_parsing_info.reference]
+        return references_parsing_info
     
+    def _is_reference_scheduled(self, reference):
+        """Checks whether given reference is put in schedule in order to 
+        process later.
+
+        reference -- corresponding URL
+
+        """
+
+        return reference in self._references_crawling_info_schedule
+
     def _filter_reference(self, reference):
         """Filtrs given reference. Discards reference if it leads out of 
         crawling website or the resourse it leads to is not a website page 
         or it was already processed by site spider or it is already put in
-        schedule in order to process later.
+        schedule in order to process later or it seems to be a part of 
+        spider trap.
         
         reference -- corresponding URL
         
@@ -512,9 +1252,13 @@ class SiteSpider(object):
         if reference in self._viewed_references:
             return None
         
-        for reference_crawling_info in self._references_crawling_info_schedule:
-            if reference_crawling_info.reference == reference:
-                return None
+        if self._is_reference_scheduled(reference):
+            return None
+
+        # New reference may be a part of spider trap
+        if not self._check_spider_trap(reference):
+            logging.info('Filtered reference (spider trap): %s' % reference)
+            return None
         return reference
     
     def _filter_reference_parsing_info(self, reference_parsing_info):
@@ -568,54 +1312,423 @@ class SiteSpider(object):
             element_parent.append_child(new_element)
         else:
             self._sitemap_tree = new_element
+
+        # Register element and save it in crawling state journal
+        self._sitemap_tree_element_ids[new_element] = \
+                len(self._sitemap_tree_elements)
+        self._sitemap_tree_elements.append(new_element)
+        if self._checkpoint_journal:
+            if element_class is HeadlineElement:
+                element_values = (kwargs['headline'], )
+            else:
+                element_values = (kwargs['reference'], kwargs['title'])
+            self._checkpoint_journal.record(
+                    CrawlCheckpointJournal.RECORD_TYPE_ELEMENT,
+                    element_class.__name__, element_depth,
+                    self._get_sitemap_tree_element_id(element_parent),
+                    *element_values)
         return new_element
 
+    def _get_sitemap_tree_element_id(self, element):
+        """Returns identifier of given sitemap tree element or None if 
+        element is None.
+
+        """
+
+        if element is None:
+            return None
+        return self._sitemap_tree_element_ids[element]
+
+    def _encode_reference_crawling_info(self, reference_crawling_info):
+        """Returns a list of reference crawling information values, which
+        may be serialized to JSON. Parent element is replaced with its 
+        identifier.
+
+        reference_crawling_info -- TextReferenceCrawlingInfo class instance
+
+        """
+
+        return [reference_crawling_info.reference,
+                reference_crawling_info.depth,
+                self._get_sitemap_tree_element_id(
+                        reference_crawling_info.parent),
+                reference_crawling_info.title]
+
+    def _decode_reference_crawling_info(self, values):
+        """Creates reference crawling information by a list of its values
+        returned by _encode_reference_crawling_info method.
+
+        Returns TextReferenceCrawlingInfo class instance.
+
+        """
+
+        reference, depth, parent_id, title = values
+        if parent_id is None:
+            parent = None
+        else:
+            parent = self._sitemap_tree_elements[parent_id]
+        return TextReferenceCrawlingInfo(reference, depth, parent, title)
+
+    def _schedule_reference(self, reference_crawling_info):
+        """Puts reference crawling information in schedule.
+
+        reference_crawling_info -- TextReferenceCrawlingInfo class instance
+
+        """
+
+        self._references_crawling_info_schedule.push(reference_crawling_info)
+        if self._checkpoint_journal:
+            self._checkpoint_journal.record(
+                    CrawlCheckpointJournal.RECORD_TYPE_PUSH,
+                    *self._encode_reference_crawling_info(
+                            reference_crawling_info))
+
+    def _take_scheduled_reference(self):
+        """Takes the next reference crawling information out of schedule.
+
+        Returns TextReferenceCrawlingInfo class instance.
+
+        """
+
+        reference_crawling_info = self._references_crawling_info_schedule.pop()
+        if self._checkpoint_journal:
+            self._checkpoint_journal.record(
+                    CrawlCheckpointJournal.RECORD_TYPE_POP)
+        return reference_crawling_info
+
+    def _mark_reference_viewed(self, reference):
+        """Adds reference to the set of processed references.
+
+        reference -- corresponding URL
+
+        """
+
+        self._viewed_references.add(reference)
+        if self._checkpoint_journal:
+            self._checkpoint_journal.record(
+                    CrawlCheckpointJournal.RECORD_TYPE_VIEWED, reference)
+
+    def _check_spider_trap(self, reference):
+        """Checks whether reference may be a part of spider trap. Counts of 
+        spider trap detector are changed by the check, so it is saved in
+        crawling state journal.
+
+        reference -- corresponding URL
+
+        Returns True if reference may be processed and False otherwise.
+
+        """
+
+        if self._checkpoint_journal:
+            self._checkpoint_journal.record(
+                    CrawlCheckpointJournal.RECORD_TYPE_CHECKED, reference)
+        return self._spider_trap_detector.check_reference(reference)
+
+    def _restore_crawling_state(self, records):
+        """Restores crawling state by replaying records of crawling state
+        journal.
+
+        records -- list of records returned by CrawlCheckpointJournal.load 
+                   method except the first one
+
+        """
+
+        for record in records:
+            record_type = record[0]
+            if record_type == CrawlCheckpointJournal.RECORD_TYPE_PUSH:
+                self._schedule_reference(
+                        self._decode_reference_crawling_info(record[1 : ]))
+            elif record_type == CrawlCheckpointJournal.RECORD_TYPE_POP:
+                self._take_scheduled_reference()
+            elif record_type == CrawlCheckpointJournal.RECORD_TYPE_VIEWED:
+                self._mark_reference_viewed(record[1])
+            elif record_type == CrawlCheckpointJournal.RECORD_TYPE_CHECKED:
+                self._check_spider_trap(record[1])
+            elif record_type == CrawlCheckpointJournal.RECORD_TYPE_ELEMENT:
+                element_class_name, depth, parent_id = record[1 : 4]
+                if parent_id is None:
+                    parent = None
+                else:
+                    parent = self._sitemap_tree_elements[parent_id]
+                if element_class_name == HeadlineElement.__name__:
+                    self._add_sitemap_tree_element(HeadlineElement, depth,
+                                                   parent,
+                                                   headline = record[4])
+                else:
+                    self._add_sitemap_tree_element(TextReferenceElement,
+                                                   depth, parent,
+                                                   reference = record[4],
+                                                   title = record[5])
+        logging.info('Crawling state restored from %s: %d sitemap elements, '
+                     '%d references processed, %d references scheduled' %
+                (self._checkpoint_file_name, len(self._sitemap_tree_elements),
+                 len(self._viewed_references), 
+                 len(self._references_crawling_info_schedule)))
+
+    def _start_checkpointing(self):
+        """Opens crawling state journal if it is needed and restores 
+        crawling state from it, if crawling is resumed.
+
+        Returns True if crawling state was restored and False otherwise.
+
+        """
+
+        if not self._checkpoint_file_name:
+            return False
+
+        checkpoint_journal = CrawlCheckpointJournal(self._checkpoint_file_name,
+                                                    self._checkpoint_interval)
+        crawling_record = [self._allowed_domain, self._depth_limit,
+                           self._references_crawling_info_schedule.\
+                                   scheduling_strategy]
+        if self._resume_crawling:
+            try:
+                records = checkpoint_journal.load()
+            except CrawlCheckpointError, error:
+                logging.warning(str(error))
+                logging.warning('Unable to resume crawling, starting it '
+                                'from the beginning')
+            else:
+                if records and records[0][1 : ] == crawling_record:
+                    # Replay records before journal is set, so they are
+                    # not saved again
+                    self._restore_crawling_state(records[1 : ])
+                    self._checkpoint_journal = checkpoint_journal
+                    return True
+                logging.warning('Crawling state in %s belongs to another '
+                                'crawling, starting crawling from the '
+                                'beginning' % self._checkpoint_file_name)
+                checkpoint_journal.close()
+
+        checkpoint_journal.start(crawling_record)
+        self._checkpoint_journal = checkpoint_journal
+        return False
+
+    def _checkpoint_crawling_state(self):
+        """Informs crawling state journal that crawling state is consistent.
+        Journal saves it, if checkpoint interval is over.
+
+        """
+
+        if self._checkpoint_journal:
+            self._checkpoint_journal.checkpoint_if_needed()
+
     def _delay(self):
         """Delays site spider. Delay interval is a random number between
-        bounds that were set while initialization.
+        bounds that were set while initialization. If adaptive download 
+        delay is used, site spider is delayed before every request instead.
         
         """
         
+        if self._download_throttle:
+            return
         download_delay = random.uniform(self._download_delay_upper_bound,
                           self._download_delay_lower_bound)
         time.sleep(download_delay)
         
     
-    def crawl(self):
-        """Main site spider method. Manages the process of crawling and
-        building sitemap tree.
-        
+    def _dump_crawling(self, error):
+        """Dumps crawling process because of given error.
+
+        error -- SiteSpiderError class or its subclass instance, due to which
+                 crawling is dumped
+
         """
-        
+
+        logging.critical(str(error))
+        logging.critical('Crawling dumped (bot %s)' % self._name)
+
+        # Inform user abuot a failure
+        print error
+
+        # Dump crawling
+        self._crawling_status = self.CRAWLING_STATUS_ERROR
+        self._release_crawling_resourses()
+
+    def _log_crawling_statistics(self):
+        """Writes statistics of crawling process to the log."""
+
+        if self._first_page_parsing_time is not None:
+            logging.info('Startup time: %.2f s to the first parsed page' %
+                    (self._first_page_parsing_time - 
+                     self._crawling_start_time))
+
+        if self._references_crawling_info_schedule.spilled_entries_number:
+            logging.info('Crawling frontier: %d references spilled to disk' %
+                    self._references_crawling_info_schedule.\
+                            spilled_entries_number)
+
+        logging.info('Processed references: %d, %d bytes of memory' %
+                (len(self._viewed_references),
+                 self._viewed_references.memory_size))
+
+        logging.info('URL canonicalization: %d references memoized, '
+                     '%d canonicalized' %
+                (self._url_canonicalizer.hits_number,
+                 self._url_canonicalizer.misses_number))
+
+        if self._spider_trap_detector.pruned_references_number:
+            logging.info('Spider traps: %d references filtered' %
+                    self._spider_trap_detector.pruned_references_number)
+            for pattern, references_number in \
+                    self._spider_trap_detector.pruned_patterns:
+                logging.info('  %s (%d references)' % 
+                        (pattern, references_number))
+
+        if self._references_group_fingerprints is not None:
+            logging.info('Repeated references groups: %d skipped '
+                         '(%d references), %d distinct groups' %
+                    (self._skipped_references_groups_number,
+                     self._skipped_group_references_number,
+                     len(self._references_group_fingerprints)))
+
+        if self._redirect_aliases_number:
+            logging.info('Redirect aliases: %d references redirected to '
+                         'processed pages' % self._redirect_aliases_number)
+
+        if self._host_metadata_cache:
+            logging.info('Host cache: %d hits, %d misses' %
+                    (self._host_metadata_cache.hits_number,
+                     self._host_metadata_cache.misses_number))
+
+        if self._sitemap_modification_times:
+            logging.info('Sitemap files: %d references with modification '
+                         'time, %d unmodified resourses taken from cache' %
+                    (len(self._sitemap_modification_times),
+                     self._unmodified_resourses_number))
+
+        if self._title_only_pages_number:
+            logging.info('Title-only pages: %d pages without link '
+                         'extraction, %d bytes read, %d bytes not read, '
+                         '%.2f s of title parsing' %
+                    (self._title_only_pages_number,
+                     self._title_only_read_bytes_number,
+                     self._title_only_unread_bytes_number,
+                     self._title_parsing_time))
+
+        if self._page_parsing_cache:
+            logging.info('Page parsing cache: %d memory hits, %d disk hits, '
+                         '%d misses' %
+                    (self._page_parsing_cache.memory_hits_number,
+                     self._page_parsing_cache.disk_hits_number,
+                     self._page_parsing_cache.misses_number))
+
+        if self._http_response_cache:
+            logging.info('HTTP cache: %d hits, %d misses, %d bytes saved' %
+                    (self._http_response_cache.hits_number,
+                     self._http_response_cache.misses_number,
+                     self._http_response_cache.saved_bytes_number))
+
+        if self._download_throttle:
+            logging.info('Download throttle: %d requests, %.2f requests/s, '
+                         'final delay %.2f s, %d overload responses' %
+                    (self._download_throttle.requests_number,
+                     self._download_throttle.effective_request_rate,
+                     self._download_throttle.delay,
+                     self._download_throttle.overload_responses_number))
+
+        if self._content_decoding_processor:
+            logging.info('Compressed resourses: %d, %d bytes received, '
+                         '%d bytes after decompression' %
+                    (self._content_decoding_processor.decoded_responses_number,
+                     self._content_decoding_processor.compressed_bytes_number,
+                     self._content_decoding_processor.decompressed_bytes_number))
+
+        if self._connection_pool:
+            logging.info('Connections: %d established, %d reused, '
+                         '%d expired, %d discarded' % 
+                    (self._connection_pool.created_connections_number,
+                     self._connection_pool.reused_connections_number,
+                     self._connection_pool.expired_connections_number,
+                     self._connection_pool.discarded_connections_number))
+
+    def _release_crawling_resourses(self):
+        """Writes crawling statistics to the log and releases resourses
+        which were used while crawling.
+
+        """
+
+        self._log_crawling_statistics()
+        if self._host_metadata_cache:
+            try:
+                self._host_metadata_cache.save()
+            except (IOError, OSError), error:
+                logging.warning('Unable to save host cache: %s' % error)
+        if self._checkpoint_journal:
+            self._checkpoint_journal.close()
+            self._checkpoint_journal = None
+        self._references_crawling_info_schedule.close()
+        if self._connection_pool:
+            self._connection_pool.close()
+        if self._site_page_parser_pool:
+            self._site_page_parser_pool.close()
+            self._site_page_parser_pool = None
+
+    def _start_crawling(self):
+        """Starts crawling process. Tests connection to the website, retrieves
+        robots.txt file if needed and puts start reference in schedule.
+
+        Returns True if crawling may be continued and False if it was dumped.
+
+        """
+
         # Start crawling process
         logging.info('Crawling started (bot %s)' % self._name)        
         self._crawling_status = self.CRAWLING_STATUS_SUCCESS
+        self._crawling_start_time = time.time()
+        self._crawling_time_limit_exceeded = False
+        self._first_page_parsing_time = None
+        self._startup_responses = {}
+        self._redirect_aliases_number = 0
+        self._skipped_references_groups_number = 0
+        self._skipped_group_references_number = 0
+        self._sitemap_modification_times = {}
+        self._unmodified_resourses_number = 0
+        self._title_only_pages_number = 0
+        self._title_only_read_bytes_number = 0
+        self._title_only_unread_bytes_number = 0
+        self._title_parsing_time = 0
+
+        # Start worker processes parsing pages if needed
+        if self._parsing_processes_number != 0:
+            self._site_page_parser_pool = SitePageParserPool(
+                                           self._parsing_processes_number,
+                                           self._page_parsing_cache)
         
+        # URL the homepage is redirected to may be known from host cache,
+        # in this case the homepage is requested by this URL directly
+        if self._host_metadata_cache:
+            self._homepage_redirect_address = \
+                    self._host_metadata_cache.get_homepage_redirect(
+                     self._allowed_domain)
+
         # Test connection to given website
         # If it is failed, there is no point to continue crawling
         try:
-            self._download_site_resourse(self._allowed_domain)
-        except ConnectionError, error:
-            logging.critical(str(error))
-            logging.critical('Crawling dumped (bot %s)' % self._name)
-            
-            # Inform user abuot a failure
-            print error
+            homepage = self._download_site_resourse(self._allowed_domain)
+        except SiteSpiderError, error:
+            self._dump_crawling(error)
+            return False
 
-            # Dump crawling
-            self._crawling_status = self.CRAWLING_STATUS_ERROR
-            return
-        
+        # Keep downloaded homepage in order not to download it again when
+        # it is processed
+        try:
+            homepage_text = self._read_site_resourse(self._allowed_domain,
+                                                     homepage)
         except SiteSpiderError, error:
-            logging.critical(str(error))
-            logging.critical('Crawling dumped (bot %s)' % self._name)
+            # The homepage will be downloaded again and the error will be 
+            # handled while processing it
+            logging.warning(str(error))
+        else:
+            self._keep_startup_response(self._allowed_domain, homepage,
+                                        homepage_text)
 
-            # Inform user abuot a failure
-            print error
-            
-            # Dump crawling
-            self._crawling_status = self.CRAWLING_STATUS_ERROR
-            return
+        # Remember URL the homepage is redirected to
+        if self._host_metadata_cache and \
+                not self._homepage_redirect_address and \
+                homepage.geturl() != self._allowed_domain:
+            self._host_metadata_cache.set_homepage_redirect(
+                    self._allowed_domain, homepage.geturl())
 
         # Delay spider if corresponding parametr it is stated
         if self._download_delay:
@@ -624,85 +1737,684 @@ class SiteSpider(object):
         # Try to retrieve and parse robots.txt file if corresponding 
         # parametr it is stated
         if self._robotstxt_obey:
-            # Defile robots.txt file location
-            robotstxt_file_url = urlparse.urljoin(self._allowed_domain, 
-                                  '/robots.txt')
             try:
-                robotstxt_file = self._download_site_resourse(
-                                  robotstxt_file_url)
+                robotstxt_text = self._retrieve_robotstxt_file()
             except SiteSpiderError, error:
                 # robots.txt file was not downloaded
                 logging.warning('Unable to retrieve robots.txt file')
                 self._robotstxt_obey = False
             else:
                 # Parse robots.txt file
-                self._parse_robotstxt_file(robotstxt_file)
+                self._parse_robotstxt_file(robotstxt_text)
                 logging.info('File robots.txt retrieved and parsed')
 
-                # Delay spider if corresponding parametr it is stated  
-                if self._download_delay:
-                    self._delay()
+                # Read sitemap files stated in robots.txt file
+                if self._read_sitemaps:
+                    self._read_sitemap_files()
+
+        # Restore crawling state if crawling is resumed
+        if self._start_checkpointing():
+            return True
 
         # Set start reference crawling information
         start_reference = self._allowed_domain
         start_reference_depth = 0
         start_reference_crawling_info = TextReferenceCrawlingInfo(start_reference, 
                                          start_reference_depth)
-        self._references_crawling_info_schedule.append(start_reference_crawling_info)
+        self._schedule_reference(start_reference_crawling_info)
+        return True
+
+    def _finish_crawling(self):
+        """Finishes crawling process."""
+
+        # Crawling state is consistent at the end of crawling
+        if self._checkpoint_journal:
+            self._checkpoint_journal.mark_consistent()
+        self._release_crawling_resourses()
+        logging.info('Crawling finished (bot %s)' % self._name) 
+
+    def _check_crawling_time_limit(self):
+        """Checks whether crawling time limit is over.
+
+        Returns True if crawling may be continued and False otherwise.
+
+        """
+
+        if not self._crawling_time_limit_exceeded and \
+                self._crawling_time_limit and \
+                time.time() - self._crawling_start_time > \
+                self._crawling_time_limit:
+            logging.warning('Crawling time limit (%s s) is over, stopping '
+                            'crawling with %d links scheduled' % 
+                    (self._crawling_time_limit, 
+                     len(self._references_crawling_info_schedule)))
+            self._crawling_time_limit_exceeded = True
+        return not self._crawling_time_limit_exceeded
+
+    def _check_reference_depth(self, reference_crawling_info):
+        """Checks whether crawling depth of given reference doesn't exceed
+        depth limit.
+
+        reference_crawling_info -- TextReferenceCrawlingInfo class instance
+
+        Returns True if reference may be processed and False otherwise.
+        Raises StopIteration exception if references are processed in 
+        order of their depth, so all the rest references are too deep too.
+
+        """
+
+        reference = reference_crawling_info.reference
+        reference_depth = reference_crawling_info.depth
+        if self._depth_limit and reference_depth > self._depth_limit:
+            # If references are processed in order of their depth, 
+            # all the rest references are also too deep
+            if self._references_crawling_info_schedule.is_depth_ordered:
+                logging.info('Depth limit frontier exhausted, ignoring '
+                             'the rest %d links (depth > %d)' % 
+                        (len(self._references_crawling_info_schedule) + 1,
+                         self._depth_limit))
+                raise StopIteration
+            logging.info('Ignoring link (depth > %d): %s' % 
+                    (self._depth_limit, reference))
+            return False
+        return True
+
+    def _reference_requires_download(self, reference_crawling_info):
+        """Checks whether the page given reference leads to has to be
+        downloaded.
+
+        We only deal with text references. But if reference is not a text
+        reference it has no title. In this case we'll suppose that title
+        of reference is a title of page it leads to.
+        So, if reference has title and depth limit is stated and reference
+        depth is equal to depth limit, there is no need to dowload the 
+        page that reference leads to. Otherwise, we have to download it.
+
+        reference_crawling_info -- TextReferenceCrawlingInfo class instance
+
+        Returns True if the page has to be downloaded and False otherwise.
+
+        """
+
+        return not reference_crawling_info.title or \
+                not self._depth_limit or \
+                reference_crawling_info.depth != self._depth_limit
+
+    def _reference_requires_title_only(self, reference_crawling_info):
+        """Checks whether only title of the page given reference leads to is
+        needed. References retrieved from pages at depth limit are not
+        processed, so if such page is downloaded, it is downloaded only 
+        because the reference has no title.
+
+        reference_crawling_info -- TextReferenceCrawlingInfo class instance
+
+        Returns True if only title of the page is needed and False otherwise.
+
+        """
+
+        return bool(self._depth_limit) and \
+                reference_crawling_info.depth == self._depth_limit
+
+    def _check_robotstxt_permission(self, reference):
+        """Checks whether downloading of given reference is allowed by
+        robots.txt file.
+
+        reference -- corresponding URL
+
+        Returns True if it is allowed and False otherwise.
+
+        """
+
+        if self._robotstxt_obey and \
+                not self._robotstxt_file_parser.can_fetch(reference):
+            logging.info(
+                    'Filtered reference (forbidden by robots.txt): %s' % 
+                    reference)
+            return False
+        return True
+
+    def _get_final_reference(self, reference, resourse):
+        """Returns normalized URL of downloaded site resourse after all
+        the redirects.
+
+        reference -- requested URL
+        resourse --  file-like object returned by _download_site_resourse 
+                     method
+
+        """
+
+        final_reference = resourse.geturl()
+        if not final_reference or final_reference == reference:
+            return reference
+        return self._normalize_reference(final_reference)
+
+    def _check_redirect_alias(self, reference, final_reference):
+        """Checks whether given reference was redirected to a page which
+        was already processed. Such reference is marked as processed too,
+        so it is discarded for the rest of crawling.
+
+        reference --       requested URL
+        final_reference -- URL returned by _get_final_reference method
+
+        Returns True if reference is a redirect alias of processed page and
+        False otherwise.
+
+        """
+
+        if final_reference == reference or \
+                final_reference not in self._viewed_references:
+            return False
+        logging.info('Filtered redirect alias: %s (redirected to %s)' %
+                (reference, final_reference))
+        self._mark_reference_viewed(reference)
+        self._redirect_aliases_number += 1
+        return True
+
+    def _check_site_resourse_content_type(self, reference, resourse):
+        """Checks whether downloaded site resourse is a website page 
+        according to its Content-Type header. Resourses without the header
+        are considered as website pages.
+
+        reference -- URL of the resourse
+        resourse --  file-like object returned by _download_site_resourse 
+                     method
+
+        Raises UnsuitableContentTypeError if resourse is not a website page.
+
+        """
+
+        content_type = resourse.info().getheader('Content-Type')
+        if not content_type:
+            return
+        mime_type = content_type.split(';', 1)[0].strip().lower()
+        if mime_type not in self.PAGE_CONTENT_TYPES:
+            raise UnsuitableContentTypeError(reference, mime_type)
+
+    def _iterate_site_resourse_chunks(self, reference, resourse,
+                                      chunk_size = READ_CHUNK_SIZE):
+        """Reads contents of downloaded site page by chunks. Reading is 
+        stopped as soon as resourse exceeds maximum resourse size. Resourse
+        body is not read at all if resourse is not a website page or its
+        Content-Length header exceeds maximum resourse size. Resourse is 
+        closed after reading or when generator is closed.
+
+        reference --  URL of the resourse
+        resourse --   file-like object returned by _download_site_resourse 
+                      method
+        chunk_size -- maximum number of bytes in a chunk
+                      (by default is READ_CHUNK_SIZE)
+
+        Returns generator of strings containing chunks of resourse contents.
+        Raises UnsuitableContentTypeError if resourse is not a website page,
+        ResourseTooLargeError if resourse exceeds maximum resourse size and
+        ResourseRetrieveError in case of errors while reading (including 
+        read and request timeouts).
+
+        """
+
+        try:
+            self._check_site_resourse_content_type(reference, resourse)
+
+            # Check resourse size stated by server if any
+            if self._max_resourse_size:
+                content_length = resourse.info().getheader('Content-Length')
+                if content_length and content_length.strip().isdigit() and \
+                        int(content_length) > self._max_resourse_size:
+                    raise ResourseTooLargeError(reference,
+                                                self._max_resourse_size)
+
+            # Read resourse by chunks
+            resourse_size = 0
+            while True:
+                try:
+                    chunk = resourse.read(chunk_size)
+                except (httplib.HTTPException, socket.error, 
+                        exceptions.IOError), error:
+                    raise ResourseRetrieveError(reference, error)
+                if not chunk:
+                    break
+                resourse_size += len(chunk)
+                if self._max_resourse_size and \
+                        resourse_size > self._max_resourse_size:
+                    raise ResourseTooLargeError(reference,
+                                                self._max_resourse_size)
+                yield chunk
+        finally:
+            resourse.close()
+
+    def _read_site_resourse(self, reference, resourse):
+        """Reads contents of downloaded site page. Resourse is read by 
+        chunks, so reading is stopped as soon as resourse exceeds maximum 
+        resourse size. Resourse is closed after reading.
+
+        reference -- URL of the resourse
+        resourse --  file-like object returned by _download_site_resourse 
+                     method
+
+        Returns string containing resourse contents.
+        Raises the same exceptions as _iterate_site_resourse_chunks method.
+
+        """
+
+        return ''.join(self._iterate_site_resourse_chunks(reference, 
+                                                          resourse))
+
+    def _read_site_page_title(self, reference, page):
+        """Reads downloaded site page only until its title is found. The
+        rest of the page is not read, connection is closed if the rest is
+        too large to be read out. References groups are not retrieved.
+
+        reference -- URL of the page
+        page --      file-like object returned by _download_site_resourse 
+                     method
+
+        Returns PendingPageParsingInfo class instance.
+        Raises the same exceptions as _iterate_site_resourse_chunks method.
+
+        """
+
+        incremental_site_page_parser = \
+                IncrementalSitePageParser(title_only = True)
+        read_bytes_number = 0
+        parsing_time = 0
+        chunks = self._iterate_site_resourse_chunks(reference, page,
+                                                    self.TITLE_READ_CHUNK_SIZE)
+        try:
+            for chunk in chunks:
+                read_bytes_number += len(chunk)
+                parsing_start_time = time.time()
+                incremental_site_page_parser.feed(chunk)
+                parsing_time += time.time() - parsing_start_time
+                if incremental_site_page_parser.is_complete:
+                    logging.info('Read only title of page: %s' % reference)
+                    break
+        finally:
+            # Page is closed when reading is stopped
+            chunks.close()
+        try:
+            incremental_site_page_parser.close()
+        except SitePageParseError:
+            pass
+
+        # Count bytes which were not read. Length of encoded page is not
+        # comparable with the number of decoded bytes.
+        content_length = page.info().getheader('Content-Length')
+        if content_length and content_length.strip().isdigit() and \
+                not page.info().getheader('Content-Encoding'):
+            unread_bytes_number = max(0, int(content_length) - 
+                                         read_bytes_number)
+        else:
+            unread_bytes_number = 0
+        with self._statistics_lock:
+            self._title_only_pages_number += 1
+            self._title_only_read_bytes_number += read_bytes_number
+            self._title_only_unread_bytes_number += unread_bytes_number
+            self._title_parsing_time += parsing_time
+        return PendingPageParsingInfo(
+                incremental_site_page_parser = incremental_site_page_parser)
+
+    def _read_site_page(self, reference, page, title_only = False):
+        """Reads downloaded site page and starts its parsing. If incremental
+        page parsing is used, page is parsed by chunks while it is being 
+        read, so the whole page is never kept as a string.
+
+        reference --  URL of the page
+        page --       file-like object returned by _download_site_resourse 
+                      method
+        title_only -- boolean parametr which states whether only page title
+                      is needed (by default is False)
+
+        Returns PendingPageParsingInfo class instance.
+        Raises the same exceptions as _iterate_site_resourse_chunks method.
+
+        """
+
+        if title_only:
+            return self._read_site_page_title(reference, page)
+
+        # Worker processes parse whole pages. Whole page is also needed to
+        # look for its parsing result in parsing cache.
+        if not self._incremental_page_parsing or \
+                self._site_page_parser_pool or self._page_parsing_cache:
+            page_text = self._read_site_resourse(reference, page)
+            return self._start_page_parsing(page_text)
+
+        incremental_site_page_parser = IncrementalSitePageParser()
+        for chunk in self._iterate_site_resourse_chunks(reference, page):
+            incremental_site_page_parser.feed(chunk)
+        # Parsing is finished by the thread which read the page. Parse error
+        # is raised again when parsing information is requested.
+        try:
+            incremental_site_page_parser.close()
+        except SitePageParseError:
+            pass
+        return PendingPageParsingInfo(
+                incremental_site_page_parser = incremental_site_page_parser)
+
+    def _start_page_parsing(self, page_text):
+        """Starts parsing of downloaded site page. If worker processes
+        parsing pages are used, page is sent to one of them. Otherwise, 
+        page will be parsed when parsing information is requested.
+
+        page_text -- string containing HTML document
+
+        Returns PendingPageParsingInfo class instance.
+
+        """
+
+        if self._site_page_parser_pool:
+            return self._site_page_parser_pool.parse_site_page_async(page_text)
+        return PendingPageParsingInfo(self._site_page_parser, page_text)
+
+    def _finish_page_parsing(self, reference, pending_page_parsing_info):
+        """Waits for downloaded site page to be parsed.
+
+        reference --                 URL of the page
+        pending_page_parsing_info -- PendingPageParsingInfo class instance
+                                     returned by _read_site_page method
+
+        Returns PageParsingInfo class instance or None in case of parse error.
+
+        """
+
+        try:
+            page_parsing_info = pending_page_parsing_info.get()
+        except SitePageParseError, parse_error:
+            # Parse error. Spider have to continue crawling.
+            logging.error(str(parse_error))
+            return None
+        
+        # Page persed succesfully
+        logging.info('Parsed: %s' % reference)
+        if self._first_page_parsing_time is None:
+            self._first_page_parsing_time = time.time()
+            logging.info('Time to the first parsed page: %.2f s' % 
+                    (self._first_page_parsing_time - 
+                     self._crawling_start_time))
+        return page_parsing_info
+
+    def _process_reference(self, reference_crawling_info, page_parsing_info,
+                           final_reference = None):
+        """Adds processed reference to the sitemap tree and schedules 
+        references retrieved from the page it leads to.
+
+        reference_crawling_info -- TextReferenceCrawlingInfo class instance
+        page_parsing_info --       PageParsingInfo class instance containing
+                                   parsing information about the page 
+                                   reference leads to or None if the page 
+                                   was not downloaded
+        final_reference --         URL of the page after redirects. It is
+                                   marked as processed too, so references
+                                   to the page itself are discarded 
+                                   (by default is None)
+
+        """
+
+        reference = reference_crawling_info.reference
+        reference_depth = reference_crawling_info.depth
+        reference_title = reference_crawling_info.title
+        reference_parent = reference_crawling_info.parent
+
+        # Try to get page title if current reference has no title
+        if not reference_title and page_parsing_info:
+            reference_title = page_parsing_info.title
+            
+        # But it may happen that downoaded page has no title. 
+        # Because at the current time we support only text references we
+        # can't add this reference to the sitemap
+        if not reference_title:
+            logging.warning(
+                    'Reference has no title, can`t add to sitemap: %s' % 
+                    reference)
+            return
+        
+        # Otherwise, add text reference element to the sitemap
+        new_text_reference_element = self._add_sitemap_tree_element(
+                                      TextReferenceElement, 
+                                      reference_depth, reference_parent, 
+                                      reference = reference,
+                                      title = reference_title)
+        self._mark_reference_viewed(reference)
+        if final_reference and final_reference != reference and \
+                final_reference not in self._viewed_references:
+            self._mark_reference_viewed(final_reference)
+        logging.info('Added sitemap text reference element: %s, %s' % 
+                (reference_title, reference))
+        
+        # If depth limit is stated and we have reached it, there is no need
+        # to process reference groups and their titles that were retrieved
+        # from parsed page
+        if page_parsing_info and \
+                (not self._depth_limit or reference_depth != self._depth_limit):
+            self._schedule_page_references(page_parsing_info, 
+                                           new_text_reference_element,
+                                           reference_depth)
+
+    def _get_references_group_fingerprint(self, references_group):
+        """Returns fingerprint of references group, which is formed by its
+        headline and the set of its references (as they are written on the
+        page).
+
+        references_group -- ReferencesGroupParsingInfo class instance
+
+        """
+
+        group_hash = hashlib.md5()
+        headline = references_group.headline
+        if isinstance(headline, unicode):
+            headline = headline.encode('utf-8')
+        group_hash.update(headline)
+        references = set(reference_parsing_info.reference
+                         for reference_parsing_info in 
+                         references_group.references)
+        for reference in sorted(references):
+            if isinstance(reference, unicode):
+                reference = reference.encode('utf-8')
+            group_hash.update('\0')
+            group_hash.update(reference)
+        return group_hash.digest()[ : 8]
+
+    def _check_references_group_repetition(self, references_group,
+                                           reference_depth, 
+                                           normalized_references):
+        """Checks whether references group was already processed on 
+        another page and all its references are still processed or 
+        scheduled, so there is no need to filter them again. Reference 
+        which was taken out of schedule, but was not processed (e.g. it is
+        forbidden by robots.txt file) is scheduled again by a group which 
+        is not skipped. Group found on a page with less depth is processed
+        again, because its references may get less depth.
+
+        references_group --      ReferencesGroupParsingInfo class instance
+        reference_depth --       crawling depth of the page
+        normalized_references -- dictionary which maps references to 
+                                 normalized ones
+
+        Returns True if group has to be skipped and False otherwise.
+
+        """
+
+        if self._references_group_fingerprints is None:
+            return False
+        fingerprint = self._get_references_group_fingerprint(references_group)
+        group_depth = self._references_group_fingerprints.get(fingerprint)
+        if group_depth is not None and group_depth <= reference_depth:
+            for reference_parsing_info in references_group.references:
+                reference = normalized_references[
+                        reference_parsing_info.reference]
+                if reference not in self._viewed_references and \
+                        not self._is_reference_scheduled(reference):
+                    return False
+            self._skipped_references_groups_number += 1
+            self._skipped_group_references_number += \
+                    len(references_group.references)
+            return True
+        self._references_group_fingerprints[fingerprint] = reference_depth
+        return False
+
+    def _schedule_page_references(self, page_parsing_info, 
+                                  text_reference_element, reference_depth):
+        """Processes groups of references retrieved from parsed page: adds
+        their headlines to the sitemap tree and puts references in schedule.
+
+        page_parsing_info --      PageParsingInfo class instance
+        text_reference_element -- sitemap element corresponding to the page
+        reference_depth --        crawling depth of the page
+
+        """
+
+        # Set haedlines paramentrs
+        healine_elements_parent = text_reference_element
+        headline_elements_depth = reference_depth + 1
+
+        # Normalize all the references of the page at once, then skip 
+        # references groups repeated on other pages (e.g. navigation menus)
+        normalized_references = \
+                self._url_canonicalizer.canonicalize_references(
+                        reference_parsing_info.reference
+                        for references_group in 
+                        page_parsing_info.references_groups
+                        for reference_parsing_info in 
+                        references_group.references)
+        page_references_groups = [
+                references_group 
+                for references_group in page_parsing_info.references_groups
+                if not self._check_references_group_repetition(
+                        references_group, reference_depth, 
+                        normalized_references)]
+
+        # Process groups of references retrieved from parsed page
+        for references_group in page_references_groups:
+            # Get references parsing info of reference group
+            references_parsing_info = references_group.references
+            # Normalize this parsing info
+            normalized_references_parsing_info = \
+                    self._normalize_references_parsing_info(
+                            references_parsing_info, normalized_references)
+            # Filter this parsing info
+            filtered_references_parsing_info = filter(
+                    self._filter_reference_parsing_info,
+                    normalized_references_parsing_info)
+            # If there still references in references group after
+            # filtering, we have to process them
+            if filtered_references_parsing_info:
+                # Check if current group of references has a headline
+                refences_group_headline = references_group.headline
+                if refences_group_headline:
+                    # Add healine element to the sitemap
+                    new_headline_element = \
+                            self._add_sitemap_tree_element( 
+                                    HeadlineElement, 
+                                    headline_elements_depth,
+                                    healine_elements_parent,
+                                    headline = refences_group_headline)
+                    logging.info('Added sitemap headline element: %s' % 
+                            refences_group_headline)
+                    # Set this element as a parent of references in 
+                    # current group
+                    text_reference_elements_parent = \
+                            new_headline_element
+                    
+                else:
+                    # Otherwise, set added text reference element as 
+                    # a parent of references in current group
+                    text_reference_elements_parent = \
+                            healine_elements_parent
+
+                # Depth of new text refernce elements is depth of
+                # last added text reference element + 1
+                text_reference_elements_depth = reference_depth + 1
+
+                # Reverse list with references parsing information
+                # In order to process referencs in the same order 
+                # as they follow each other on the site page
+                # (it is only needed if the last scheduled reference
+                # is processed first)
+                if not self._references_crawling_info_schedule.\
+                        is_depth_ordered:
+                    filtered_references_parsing_info.reverse()
+                
+                # Process references group
+                for reference_parsing_info in \
+                        filtered_references_parsing_info:
+                    # Create text reference crawling information
+                    reference = reference_parsing_info.reference
+                    reference_title = reference_parsing_info.title
+                    reference_crawling_info = \
+                            TextReferenceCrawlingInfo(reference,
+                                    text_reference_elements_depth,
+                                    text_reference_elements_parent,
+                                    reference_title)
+                    # And put it to schedule in order to process
+                    # later
+                    self._schedule_reference(reference_crawling_info)
+    
+    def crawl(self):
+        """Main site spider method. Manages the process of crawling and
+        building sitemap tree.
+        
+        """
+        
+        if not self._start_crawling():
+            return
         
         # Main crawling loop
-        while self._references_crawling_info_schedule:
+        while self._references_crawling_info_schedule and \
+                self._check_crawling_time_limit():
+            # Crawling state is consistent between references processing
+            self._checkpoint_crawling_state()
+
             # Get next reference crawling information
-            reference_crawling_info = self._references_crawling_info_schedule.pop()
+            reference_crawling_info = self._take_scheduled_reference()
             reference = reference_crawling_info.reference
-            reference_depth = reference_crawling_info.depth
-            reference_title = reference_crawling_info.title
-            reference_parent = reference_crawling_info.parent
 
             # Check depth of reference
-            if self._depth_limit and reference_depth > self._depth_limit:
-                logging.info('Ignoring link (depth > %d): %s' % 
-                        (self._depth_limit, reference))
-                continue
+            try:
+                if not self._check_reference_depth(reference_crawling_info):
+                    continue
+            except StopIteration:
+                break
             
             # Check whether reference was already processed
             if reference in self._viewed_references:
                 continue
             
-            # We oly deal with text references. But if reference is not a text
-            # reference it has no title. In this case we'll suppose that title
-            # of reference is a title of page it leads to.
-            # So, if reference has title and depth limit is stated and reference
-            # depth is equal to depth limit, there is no need to dowload the 
-            # page that reference leads to. 
-            # Otherwise, we have to download it
-            if not reference_title or \
-                    (self._depth_limit and reference_depth != self._depth_limit):
-
+            page_parsing_info = None
+            final_reference = None
+            if self._reference_requires_download(reference_crawling_info):
                 # Before downloading we have to check if it is allowed by
                 # robots.txt file
-                if self._robotstxt_obey and \
-                        not self._robotstxt_file_parser.can_fetch(self._name, 
-                                                                  reference):
-                    logging.info(
-                            'Filtered reference (forbidden by robots.txt): %s' % 
-                            reference)
+                if not self._check_robotstxt_permission(reference):
                     continue
 
-                # Try to download the page
+                # Try to download the page, if it was not downloaded while
+                # starting crawling
+                page = self._take_startup_response(reference)
+                page_is_downloaded = page is None
                 try:
-                    page = self._download_site_resourse(reference)
+                    if page_is_downloaded:
+                        page = self._download_site_resourse(reference)
+
+                    # There is no need to read the page if it was redirected
+                    # to already processed page
+                    final_reference = self._get_final_reference(reference, 
+                                                                page)
+                    if self._check_redirect_alias(reference, final_reference):
+                        page.close()
+                        continue
+
+                    # Read the page and start its parsing. If it is parsed
+                    # by worker process, it is parsed while spider is
+                    # delayed. If it is parsed incrementally, it is parsed
+                    # while it is being downloaded.
+                    pending_page_parsing_info = self._read_site_page(
+                            reference, page, 
+                            self._reference_requires_title_only(
+                                    reference_crawling_info))
                 except ConnectionError, error:
                     # Problems with connection, spider unable to 
                     # continue crawling
-                    logging.critical(str(error))
-                    logging.critical('Crawling dumped (bot %s)' % self._name)
-
-                    # Inform user abuot a failure
-                    print error
-
-                    # Dump crawling
-                    self._crawling_status = self.CRAWLING_STATUS_ERROR
+                    self._dump_crawling(error)
                     return
                 except SiteSpiderError, error:
                     # Other problems with downloading. It may be a single error
@@ -715,118 +2427,20 @@ class SiteSpider(object):
                 logging.info('Crawled: %s' % reference) 
 
                 # Delay spider if corresponding parametr it is stated
-                if self._download_delay:
+                if self._download_delay and page_is_downloaded:
                     self._delay()
                 
                 # Try to parse downloaded page
-                try:
-                    page_parsing_info = self._site_page_parser.parse_site_page(
-                                         page.read())
-                except SitePageParseError, parse_error:
-                    # Parse error. Spider have to continue crawling.
-                    logging.error(str(parse_error))
+                page_parsing_info = self._finish_page_parsing(reference,
+                                     pending_page_parsing_info)
+                if page_parsing_info is None:
                     continue
-                
-                # Page persed succesfully
-                logging.info('Parsed: %s' % reference)
-                
-                # Try to get page title if current reference has no title
-                if not reference_title:
-                    reference_title = page_parsing_info.title
-            
-            # But it may happen that downoaded page has no title. 
-            # Because at the current time we support only text references we
-            # can't add this reference to the sitemap
-            if not reference_title:
-                logging.warning(
-                        'Reference has no title, can`t add to sitemap: %s' % 
-                        reference)
-                continue
-            
-            # Otherwise, add text reference element to the sitemap
-            new_text_reference_element = self._add_sitemap_tree_element(
-                                          TextReferenceElement, 
-                                          reference_depth, reference_parent, 
-                                          reference = reference,
-                                          title = reference_title)
-            self._viewed_references.add(reference)
-            logging.info('Added sitemap text reference element: %s, %s' % 
-                    (reference_title, reference))
-            
-            # If depth limit is stated and we have reached it, there is no need
-            # to process reference groups and their titles that were retrieved
-            # from parsed page
-            if not self._depth_limit or reference_depth != self._depth_limit:
-                # Set haedlines paramentrs
-                healine_elements_parent = new_text_reference_element
-                headline_elements_depth = reference_depth + 1
-
-                # Process groups of references retrieved from parsed page
-                page_references_groups = page_parsing_info.references_groups
-                for references_group in page_references_groups:
-                    # Get references parsing info of reference group
-                    references_parsing_info = references_group.references
-                    # Normalize this parsing info
-                    normalized_references_parsing_info = map(
-                            self._normalize_reference_parsing_info,
-                            references_parsing_info)
-                    # Filter this parsing info
-                    filtered_references_parsing_info = filter(
-                            self._filter_reference_parsing_info,
-                            normalized_references_parsing_info)
-                    # If there still references in references group after
-                    # filtering, we have to process them
-                    if filtered_references_parsing_info:
-                        # Check if current group of references has a headline
-                        refences_group_headline = references_group.headline
-                        if refences_group_headline:
-                            # Add healine element to the sitemap
-                            new_headline_element = \
-                                    self._add_sitemap_tree_element( 
-                                            HeadlineElement, 
-                                            headline_elements_depth,
-                                            healine_elements_parent,
-                                            headline = refences_group_headline)
-                            logging.info('Added sitemap headline element: %s' % 
-                                    refences_group_headline)
-                            # Set this element as a parent of references in 
-                            # current group
-                            text_reference_elements_parent = \
-                                    new_headline_element
-                            
-                        else:
-                            # Otherwise, set added text reference element as 
-                            # a parent of references in current group
-                            text_reference_elements_parent = \
-                                    healine_elements_parent
-
-                        # Depth of new text refernce elements is depth of
-                        # last added text reference element + 1
-                        text_reference_elements_depth = reference_depth + 1
-
-                        # Reverse list with references parsing information
-                        # In order to process referencs in the same order 
-                        # as they follow each other on the site page
-                        filtered_references_parsing_info.reverse()
-                        
-                        # Process references group
-                        for reference_parsing_info in \
-                                filtered_references_parsing_info:
-                            # Create text reference crawling information
-                            reference = reference_parsing_info.reference
-                            reference_title = reference_parsing_info.title
-                            reference_crawling_info = \
-                                    TextReferenceCrawlingInfo(reference,
-                                            text_reference_elements_depth,
-                                            text_reference_elements_parent,
-                                            reference_title)
-                            # And put apend it to schedule in order to process
-                            # later
-                            self._references_crawling_info_schedule.append(
-                                    reference_crawling_info)
+
+            self._process_reference(reference_crawling_info, page_parsing_info,
+                                    final_reference)
             
         # Finish crawing process                  
-        logging.info('Crawling finished (bot %s)' % self._name) 
+        self._finish_crawling()
                             
                             
     @property
@@ -840,5 +2454,14 @@ class SiteSpider(object):
         """Returns current crawling state of site spider."""
         
         return self._crawling_status
+
+    @property
+    def crawling_time_limit_exceeded(self):
+        """Returns True if crawling was stopped because crawling time limit
+        was over, so sitemap tree is incomplete.
+
+        """
+
+        return self._crawling_time_limit_exceeded
                 
     
\ No newline at end of file
@@ -0,0 +1,154 @@
+import re             # For parsing W3C datetime values
+import calendar       # For using calendar.timegm() function
+import zlib           # For decompressing gzipped sitemap files
+
+from lxml import etree   # For parsing XML documents
+
+__doc__ = """
+Contains streaming reader of sitemap XML files (sitemaps protocol), which
+are listed by Sitemap directives of robots.txt file.
+"""
+
+__all__ = ["SitemapXMLError", "read_sitemap_xml", "parse_w3c_datetime"]
+
+class SitemapXMLError(Exception):
+    """Class for errors of reading sitemap XML files."""
+
+    def __init__(self, description):
+        self._description = description
+
+    def __str__(self):
+        return 'Sitemap XML file error: %s' % self._description
+
+
+# Regular expression matching W3C datetime values (YYYY, YYYY-MM,
+# YYYY-MM-DD, YYYY-MM-DDThh:mmTZD, YYYY-MM-DDThh:mm:ssTZD or
+# YYYY-MM-DDThh:mm:ss.sTZD)
+_W3C_DATETIME_REGEXP = re.compile(
+        r'^(\d{4})(?:-(\d{2})(?:-(\d{2})(?:T(\d{2}):(\d{2})'
+        r'(?::(\d{2})(?:\.\d+)?)?(Z|[+-]\d{2}:\d{2})?)?)?)?$')
+
+def parse_w3c_datetime(value):
+    """Parses W3C datetime value of lastmod tag.
+
+    value -- string containing datetime value
+
+    Returns corresponding number of seconds since the epoch or None if the
+    value is invalid.
+
+    """
+
+    match = _W3C_DATETIME_REGEXP.match(value.strip())
+    if not match:
+        return None
+    year, month, day, hour, minute, second, time_zone = match.groups()
+    try:
+        timestamp = calendar.timegm((int(year), int(month or 1),
+                                     int(day or 1), int(hour or 0),
+                                     int(minute or 0), int(second or 0)))
+    except ValueError:
+        return None
+    if time_zone and time_zone != 'Z':
+        offset = int(time_zone[1 : 3]) * 3600 + int(time_zone[4 : ]) * 60
+        if time_zone[0] == '+':
+            timestamp -= offset
+        else:
+            timestamp += offset
+    return timestamp
+
+
+class _SitemapFile(object):
+    """File-like wrapper of downloaded sitemap file which decompresses it
+    while it is being read, if it is gzipped, and restricts its size.
+
+    """
+
+    # Magic number of gzip files
+    GZIP_MAGIC_NUMBER = '\x1f\x8b'
+
+    def __init__(self, sitemap_file, max_size):
+        self._file = sitemap_file
+        self._max_size = max_size
+        self._size = 0
+        # Sitemap file is gzipped if it starts with gzip magic number
+        self._first_data = sitemap_file.read(len(self.GZIP_MAGIC_NUMBER))
+        if self._first_data == self.GZIP_MAGIC_NUMBER:
+            # Decompressor expects gzip header and trailer
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self._decompressor = None
+
+    def read(self, size = -1):
+        while True:
+            data = self._first_data + self._file.read(size)
+            self._first_data = ''
+            if not self._decompressor:
+                break
+            try:
+                if not data:
+                    data = self._decompressor.flush()
+                    break
+                data = self._decompressor.decompress(data)
+            except zlib.error:
+                raise SitemapXMLError('invalid gzipped file')
+            # Empty data means the end of file, so read compressed data
+            # until something is decompressed
+            if data:
+                break
+        self._size += len(data)
+        if self._max_size and self._size > self._max_size:
+            raise SitemapXMLError('file is larger than %d bytes' %
+                                  self._max_size)
+        return data
+
+
+def read_sitemap_xml(sitemap_file, max_size = 50 * 1024 * 1024):
+    """Reads sitemap XML file (a list of URLs or an index of other sitemap
+    files). File is read and parsed by chunks, and parsed elements are
+    removed at once, so memory taken by the reader doesn't depend on file
+    size. Gzipped files are decompressed.
+
+    sitemap_file -- file-like object containing sitemap XML file
+    max_size --     maximum number of bytes of XML document (after
+                    decompression). '0' means no limitation (by default
+                    is 50 MB, the limit of sitemaps protocol)
+
+    Returns generator of (is index entry, URL, last modification time)
+    tuples. Entries of sitemap index point to other sitemap files. Last
+    modification time is a number of seconds since the epoch or None if
+    it is not stated.
+    Raises SitemapXMLError if file can't be read.
+
+    """
+
+    events = etree.iterparse(_SitemapFile(sitemap_file, max_size),
+                             events = ('end', ), no_network = True,
+                             resolve_entities = False)
+    try:
+        for _, element in events:
+            # Namespace of tags is ignored, because it is often wrong
+            tag = element.tag
+            if not isinstance(tag, basestring):
+                # Comment or processing instruction
+                continue
+            tag = tag.rsplit('}', 1)[-1]
+            if tag not in ('url', 'sitemap'):
+                continue
+            location = None
+            last_modification_time = None
+            for child in element:
+                if not isinstance(child.tag, basestring) or not child.text:
+                    continue
+                child_tag = child.tag.rsplit('}', 1)[-1]
+                if child_tag == 'loc':
+                    location = child.text.strip()
+                elif child_tag == 'lastmod':
+                    last_modification_time = parse_w3c_datetime(child.text)
+            # Remove parsed elements
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            if location:
+                yield tag == 'sitemap', location, last_modification_time
+    except etree.XMLSyntaxError, error:
+        raise SitemapXMLError(str(error))
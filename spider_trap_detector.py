@@ -0,0 +1,189 @@
+import re             # For generalizing URL paths
+import urlparse       # For operations with URL stings
+
+from url_fingerprint_set import URLFingerprintSet
+
+__doc__ = """
+Contains detector of spider traps - parts of a website which generate an
+unlimited number of URLs (calendars, faceted search, infinite pagination,
+relative references which make paths grow endlessly).
+"""
+
+__all__ = ["SpiderTrapDetector"]
+
+class SpiderTrapDetector(object):
+    """Online detector of spider traps. It counts references by patterns
+    and drops references which patterns occur too often:
+    query variants --     references with the same path and the same names
+                          of query parametrs, but different values of them
+                          (e.g. '?page=N' or faceted search)
+    path patterns --      references which paths differ only by numbers
+                          (e.g. '/calendar/2024/05/')
+    repeated segments --  references which paths contain the same segment
+                          too many times (e.g. '/a/b/a/b/a/b/'), which
+                          usually means endlessly growing relative references
+    Reference is counted only if it is not dropped, and only once, however
+    many times it is checked. Checked references are kept in compact sets
+    of URLs of url_fingerprint_set module, which are created by a given
+    function, so detector takes as much memory as the set of processed 
+    references of site spider plus memory proportional to the number of
+    patterns. If Bloom filters are used, a new reference may be considered
+    as already accepted (with their false positive rate), so it is not 
+    counted.
+
+    """
+
+    # Regular expression matching numbers in URL path
+    NUMBER_REGEXP = re.compile(r'\d+')
+
+    def __init__(self, max_query_variants = 100, max_pattern_references = 1000,
+                 max_repeated_path_segments = 3, 
+                 create_references_set = URLFingerprintSet):
+        """Initializes detector.
+
+        max_query_variants --         maximum number of references with
+                                      the same path and the same query
+                                      parametr names. '0' means no
+                                      limitation (by default is 100)
+        max_pattern_references --     maximum number of references which
+                                      paths differ only by numbers. '0'
+                                      means no limitation (by default is 1000)
+        max_repeated_path_segments -- maximum number of occurrences of the
+                                      same segment in URL path. '0' means
+                                      no limitation (by default is 3)
+        create_references_set --      function which creates an empty set
+                                      of checked references (by default is
+                                      URLFingerprintSet)
+
+        """
+
+        # Check types of parametrs
+        for limit in (max_query_variants, max_pattern_references,
+                      max_repeated_path_segments):
+            if not isinstance(limit, (int, long)):
+                raise TypeError('int or long type expected')
+        self._max_query_variants = max_query_variants
+        self._max_pattern_references = max_pattern_references
+        self._max_repeated_path_segments = max_repeated_path_segments
+
+        # Dictionaries which map patterns to numbers of references
+        self._query_variants_numbers = {}
+        self._pattern_references_numbers = {}
+        # self._pruned_patterns maps descriptions of detected traps to
+        # numbers of dropped references
+        self._pruned_patterns = {}
+        # Check a type of 'create_references_set' parametr
+        if not callable(create_references_set):
+            raise TypeError('callable type expected')
+        # Sets of references which were already checked. Accepted references
+        # are not counted again. Dropped references don't change numbers of
+        # references by patterns, they are kept only in order to count every
+        # dropped reference once.
+        self._accepted_references = create_references_set()
+        self._pruned_references = create_references_set()
+
+    @property
+    def pruned_patterns(self):
+        """Returns a list of (trap description, number of dropped references)
+        pairs in descending order of numbers of dropped references.
+
+        """
+
+        return sorted(self._pruned_patterns.iteritems(),
+                      key = lambda pattern: (-pattern[1], pattern[0]))
+
+    @property
+    def pruned_references_number(self):
+        """Returns number of dropped references."""
+
+        return sum(self._pruned_patterns.itervalues())
+
+    def _prune(self, reference, description):
+        """Counts reference dropped because of given trap, unless it was 
+        already dropped.
+
+        Returns False, so it may be returned by check_reference method.
+
+        """
+
+        if reference not in self._pruned_references:
+            self._pruned_references.add(reference)
+            self._pruned_patterns[description] = \
+                    self._pruned_patterns.get(description, 0) + 1
+        return False
+
+    @staticmethod
+    def _is_exceeded(patterns_numbers, pattern, limit):
+        """Checks whether the number of references with given pattern 
+        reached given limit, so one more reference exceeds it.
+
+        """
+
+        return limit != 0 and patterns_numbers.get(pattern, 0) >= limit
+
+    @staticmethod
+    def _count(patterns_numbers, pattern):
+        """Counts reference with given pattern."""
+
+        patterns_numbers[pattern] = patterns_numbers.get(pattern, 0) + 1
+
+    def check_reference(self, reference):
+        """Checks whether reference may be a part of spider trap. Reference
+        which was already checked gets the same result without being counted
+        again.
+
+        reference -- normalized URL
+
+        Returns True if reference may be processed and False if it has
+        to be dropped.
+
+        """
+
+        if reference in self._accepted_references:
+            return True
+
+        reference_parts = urlparse.urlsplit(reference)
+        path = reference_parts.path
+
+        # Check repeated path segments
+        if self._max_repeated_path_segments:
+            segments_numbers = {}
+            for segment in path.split('/'):
+                if not segment:
+                    continue
+                segment_number = segments_numbers.get(segment, 0) + 1
+                if segment_number > self._max_repeated_path_segments:
+                    return self._prune(reference, 
+                                       'repeated path segment: %s' % segment)
+                segments_numbers[segment] = segment_number
+
+        # Check query variants
+        query_pattern = None
+        if reference_parts.query:
+            parameter_names = sorted(set(
+                    parameter.split('=', 1)[0]
+                    for parameter in reference_parts.query.split('&')
+                    if parameter))
+            query_pattern = '%s?%s' % (path, '&'.join(
+                    '%s=*' % parameter_name
+                    for parameter_name in parameter_names))
+            if self._is_exceeded(self._query_variants_numbers, 
+                                 query_pattern, self._max_query_variants):
+                return self._prune(reference, 
+                                   'query variants: %s' % query_pattern)
+
+        # Check path patterns
+        path_pattern = self.NUMBER_REGEXP.sub('<N>', path)
+        if path_pattern == path:
+            path_pattern = None
+        elif self._is_exceeded(self._pattern_references_numbers, 
+                               path_pattern, self._max_pattern_references):
+            return self._prune(reference, 'path pattern: %s' % path_pattern)
+
+        # Reference is counted only when it is accepted
+        if query_pattern is not None and self._max_query_variants:
+            self._count(self._query_variants_numbers, query_pattern)
+        if path_pattern is not None and self._max_pattern_references:
+            self._count(self._pattern_references_numbers, path_pattern)
+        self._accepted_references.add(reference)
+        return True
@@ -0,0 +1,240 @@
+import urllib         # For unquoting query parametr names
+import urlparse       # For operations with URL stings
+import fnmatch        # For matching query parametr names with patterns
+import threading      # For using threading.Lock
+
+from collections import OrderedDict
+
+__doc__ = """
+Contains canonicalizer of website references which reduces equivalent URLs
+to a single canonical form, so site spider downloads every page only once.
+"""
+
+__all__ = ["URLCanonicalizer"]
+
+class URLCanonicalizer(object):
+    """Canonicalizer of website references. Relative references are made
+    absolute, scheme and host name are lowercased, default port is removed,
+    './' and '../' path segments are resolved, query parametrs are sorted by
+    name (parametrs ignored by site spider are removed) and fragment is cut.
+    Tracing slash is added to the path if there is no query part and no file
+    extention in the path.
+
+    Canonical forms of references are memoized, because the same navigation
+    references are found on almost every page of a website. The number of
+    memoized references is restricted, least recently used references are
+    forgotten first. Canonicalizer may be shared between several threads.
+
+    """
+
+    # Ports which are used by default for URL schemes
+    DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+    # Patterns of names of query parametrs which are used for tracking
+    # visitors and don't change page contents
+    TRACKING_QUERY_PARAMETERS = ('utm_*', 'gclid', 'fbclid', 'yclid',
+                                 '_openstat', 'mc_cid', 'mc_eid')
+
+    def __init__(self, base_reference, ignored_query_parameters = None,
+                 memo_size = 10000):
+        """Initializes canonicalizer.
+
+        base_reference --           URL relative references are resolved
+                                    against
+        ignored_query_parameters -- sequence of names of query parametrs
+                                    which are removed from references. Names
+                                    may be shell-style patterns (e.g. 'utm_*').
+                                    None means tracking parametrs
+                                    (by default is None)
+        memo_size --                maximum number of memoized references.
+                                    '0' means that references are not
+                                    memoized (by default is 10000)
+
+        """
+
+        # Check a type of 'base_reference' parametr
+        if not isinstance(base_reference, basestring):
+            raise TypeError('string type expected')
+        self._base_reference = base_reference
+
+        # Check a type of 'ignored_query_parameters' parametr
+        if ignored_query_parameters is None:
+            ignored_query_parameters = self.TRACKING_QUERY_PARAMETERS
+        elif isinstance(ignored_query_parameters, basestring):
+            raise TypeError('sequence of strings expected')
+        # Parametr names without wildcards are checked with a set
+        self._ignored_query_parameters = set()
+        self._ignored_query_parameter_patterns = []
+        for parameter_name in ignored_query_parameters:
+            if not isinstance(parameter_name, basestring):
+                raise TypeError('string type expected')
+            parameter_name = parameter_name.lower()
+            if any(character in parameter_name for character in '*?['):
+                self._ignored_query_parameter_patterns.append(parameter_name)
+            else:
+                self._ignored_query_parameters.add(parameter_name)
+
+        # Check a type of 'memo_size' parametr
+        if not isinstance(memo_size, (int, long)):
+            raise TypeError('int or long type expected')
+        self._memo_size = memo_size
+
+        # self._memo maps references to their canonical forms in order they
+        # were used (the least recently used reference is the first)
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Memo statistics
+        self._hits_number = 0
+        self._misses_number = 0
+
+    @property
+    def hits_number(self):
+        """Returns number of references which canonical forms were found
+        in memo.
+
+        """
+
+        return self._hits_number
+
+    @property
+    def misses_number(self):
+        """Returns number of references which were canonicalized."""
+
+        return self._misses_number
+
+    @staticmethod
+    def canonicalize_netloc(scheme, netloc):
+        """Returns network location part of URL with lowercased host name
+        and without default port of given scheme.
+
+        scheme -- URL scheme
+        netloc -- network location part of URL
+
+        """
+
+        userinfo, at_sign, hostport = netloc.rpartition('@')
+        host, colon, port = hostport.rpartition(':')
+        # Colon may belong to IPv6 address
+        if not colon or ']' in port or not port.isdigit():
+            host, port = hostport, ''
+        host = host.lower()
+        if port and port != URLCanonicalizer.DEFAULT_PORTS.get(scheme):
+            host = '%s:%s' % (host, port)
+        return userinfo + at_sign + host
+
+    @staticmethod
+    def _remove_dot_segments(path):
+        """Resolves '.' and '..' segments of URL path as RFC 3986 states."""
+
+        if '.' not in path:
+            return path
+        segments = path.split('/')
+        if segments[-1] in ('.', '..'):
+            # Path ends with a directory
+            segments.append('')
+        resolved_segments = []
+        for segment in segments:
+            if segment == '.':
+                continue
+            if segment == '..':
+                # The first empty segment of absolute path can't be removed
+                if len(resolved_segments) > 1:
+                    resolved_segments.pop()
+                continue
+            resolved_segments.append(segment)
+        return '/'.join(resolved_segments)
+
+    def _is_ignored_query_parameter(self, parameter_name):
+        """Checks whether query parametr is removed from references."""
+
+        parameter_name = urllib.unquote_plus(parameter_name).lower()
+        if parameter_name in self._ignored_query_parameters:
+            return True
+        for pattern in self._ignored_query_parameter_patterns:
+            if fnmatch.fnmatchcase(parameter_name, pattern):
+                return True
+        return False
+
+    def _canonicalize_query(self, query):
+        """Removes ignored parametrs from query part of URL and sorts the
+        rest by name. Parametrs are not decoded, so their values are kept
+        as they are.
+
+        """
+
+        parameters = []
+        for parameter in query.split('&'):
+            if not parameter:
+                continue
+            parameter_name = parameter.split('=', 1)[0]
+            if not self._is_ignored_query_parameter(parameter_name):
+                parameters.append((parameter_name, parameter))
+        # Sorting is stable, so values of the same parametr keep their order
+        parameters.sort(key = lambda parameter: parameter[0])
+        return '&'.join(parameter for _, parameter in parameters)
+
+    def _canonicalize(self, reference):
+        """Returns canonical form of given reference."""
+
+        # Make URL absolute if it is relative
+        reference = reference.strip()
+        if not urlparse.urlsplit(reference).scheme:
+            reference = urlparse.urljoin(self._base_reference, reference)
+
+        scheme, netloc, path, query, _ = urlparse.urlsplit(reference)
+        scheme = scheme.lower()
+        if scheme not in self.DEFAULT_PORTS:
+            # References which don't lead to web pages are kept as they are
+            return reference
+        netloc = self.canonicalize_netloc(scheme, netloc)
+        path = self._remove_dot_segments(path) or '/'
+        query = self._canonicalize_query(query)
+
+        # Add tracing '/' if there no query part of URL and no file extention
+        # in the path part of URL
+        if not query and '.' not in path and not path.endswith('/'):
+            path += '/'
+        return urlparse.urlunsplit((scheme, netloc, path, query, ''))
+
+    def canonicalize(self, reference):
+        """Returns canonical form of given reference.
+
+        reference -- corresponding URL
+
+        """
+
+        with self._lock:
+            canonical_reference = self._memo.pop(reference, None)
+            if canonical_reference is not None:
+                # Reference becomes the most recently used one
+                self._memo[reference] = canonical_reference
+                self._hits_number += 1
+                return canonical_reference
+            self._misses_number += 1
+
+        canonical_reference = self._canonicalize(reference)
+        if self._memo_size:
+            with self._lock:
+                self._memo[reference] = canonical_reference
+                if len(self._memo) > self._memo_size:
+                    self._memo.popitem(last = False)
+        return canonical_reference
+
+    def canonicalize_references(self, references):
+        """Canonicalizes a batch of references (e.g. all the references of
+        a page). Every distinct reference is canonicalized only once.
+
+        references -- iterable of URLs
+
+        Returns a dictionary which maps given references to their canonical
+        forms.
+
+        """
+
+        canonical_references = {}
+        for reference in references:
+            if reference not in canonical_references:
+                canonical_references[reference] = \
+                        self.canonicalize(reference)
+        return canonical_references
@@ -0,0 +1,296 @@
+import hashlib        # For computing URL fingerprints
+import struct         # For unpacking URL fingerprints
+import math           # For computing Bloom filter sizes
+import threading      # For using threading.Lock
+
+from array import array
+
+__doc__ = """
+Contains compact sets of URLs which keep 64-bit URL fingerprints (or bits
+of a Bloom filter) instead of URL strings, so site spider may remember
+millions of processed references in a small amount of memory. Sets may
+be shared between several threads.
+"""
+
+__all__ = ["URLFingerprintSet", "URLBloomFilter"]
+
+def _get_url_digest(reference):
+    """Returns 16 bytes MD5 digest of given URL."""
+
+    if isinstance(reference, unicode):
+        reference = reference.encode('utf-8')
+    return hashlib.md5(reference).digest()
+
+
+# Type code of array items which are 32-bit unsigned integers
+_UINT32_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
+class URLFingerprintSet(object):
+    """Set of URLs which keeps 64-bit fingerprints of URLs (the first 8
+    bytes of their MD5 digests) in an open addressing hash table. Table is
+    a flat array of 32-bit unsigned integers, every slot of which takes two
+    items, so every URL takes 8 bytes divided by load factor. Zero
+    fingerprint marks empty slot. Collisions of fingerprints are possible,
+    but their probability is negligible for any reasonable number of URLs.
+    Set is thread-safe: hash table is searched and changed only with the
+    lock acquired, so a lookup never sees a table which is being grown.
+
+    """
+
+    # The table is grown twice when it is filled up to this part
+    MAX_LOAD_FACTOR = 0.66
+
+    def __init__(self, capacity = 1024):
+        """Initializes an empty set.
+
+        capacity -- initial number of slots of hash table, it is rounded up
+                    to a power of 2 (by default is 1024)
+
+        """
+
+        # Check a type of 'capacity' parametr
+        if not isinstance(capacity, (int, long)):
+            raise TypeError('int or long type expected')
+        slots_number = 1
+        while slots_number < capacity:
+            slots_number *= 2
+        self._create_table(slots_number)
+        self._lock = threading.Lock()
+
+    def _create_table(self, slots_number):
+        """Creates an empty hash table with given number of slots."""
+
+        self._slots_number = slots_number
+        self._table = array(_UINT32_TYPECODE, [0]) * (2 * slots_number)
+        self._size = 0
+
+    @staticmethod
+    def _get_fingerprint(reference):
+        """Returns fingerprint of given URL as a pair of 32-bit integers."""
+
+        high, low = struct.unpack('<II', _get_url_digest(reference)[ : 8])
+        if not high and not low:
+            # Zero fingerprint marks empty slot
+            low = 1
+        return high, low
+
+    def _find_slot(self, high, low):
+        """Finds slot which contains given fingerprint or an empty slot
+        where it may be put (linear probing is used).
+
+        Returns a pair of slot index and a boolean value which states
+        whether fingerprint was found.
+
+        """
+
+        table = self._table
+        mask = self._slots_number - 1
+        slot = (high ^ low) & mask
+        while True:
+            slot_high = table[2 * slot]
+            slot_low = table[2 * slot + 1]
+            if slot_high == high and slot_low == low:
+                return slot, True
+            if not slot_high and not slot_low:
+                return slot, False
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        """Grows hash table twice and puts all the fingerprints to it."""
+
+        old_table = self._table
+        self._create_table(2 * self._slots_number)
+        for index in xrange(0, len(old_table), 2):
+            high = old_table[index]
+            low = old_table[index + 1]
+            if high or low:
+                self._put(high, low)
+
+    def _put(self, high, low):
+        """Puts fingerprint into hash table if it is not there yet.
+
+        Returns True if fingerprint was added and False otherwise.
+
+        """
+
+        slot, found = self._find_slot(high, low)
+        if found:
+            return False
+        self._table[2 * slot] = high
+        self._table[2 * slot + 1] = low
+        self._size += 1
+        return True
+
+    def add(self, reference):
+        """Adds URL to the set.
+
+        reference -- corresponding URL
+
+        """
+
+        high, low = self._get_fingerprint(reference)
+        with self._lock:
+            if self._put(high, low) and \
+                    self._size > self.MAX_LOAD_FACTOR * self._slots_number:
+                self._grow()
+
+    def __contains__(self, reference):
+        high, low = self._get_fingerprint(reference)
+        with self._lock:
+            return self._find_slot(high, low)[1]
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def memory_size(self):
+        """Returns number of bytes taken by hash table."""
+
+        return self._table.itemsize * len(self._table)
+
+
+class URLBloomFilter(object):
+    """Set of URLs based on a Bloom filter. Bloom filter never misses added
+    URLs, but it may consider an URL which was not added as added (with
+    a given false positive rate). Every URL takes about
+    -ln(false positive rate) / ln(2) ** 2 bits regardless of its length.
+
+    Bloom filter can't be grown, so when the number of added URLs exceeds
+    the expected one, a new filter twice as large is stacked onto the set.
+    False positive rate of every new filter is twice lower, so false
+    positive rate of the whole set never exceeds a given one. Set is
+    thread-safe: filters are searched and changed only with the lock 
+    acquired.
+
+    """
+
+    # False positive rate of the first filter is the half of the given one,
+    # because rates of all the filters form a geometric series
+    FALSE_POSITIVE_RATE_RATIO = 0.5
+
+    def __init__(self, expected_size = 1000000,
+                 false_positive_rate = 0.001):
+        """Initializes an empty set.
+
+        expected_size --       expected number of URLs, it is the capacity
+                               of the first filter (by default is 1000000)
+        false_positive_rate -- maximum probability that URL which was not
+                               added is considered as added
+                               (by default is 0.001)
+
+        """
+
+        # Check a type of 'expected_size' parametr
+        if not isinstance(expected_size, (int, long)):
+            raise TypeError('int or long type expected')
+        if expected_size < 1:
+            raise ValueError('expected_size has to be positive')
+
+        # Check a type of 'false_positive_rate' parametr
+        if not isinstance(false_positive_rate, float):
+            raise TypeError('float type expected')
+        if not 0 < false_positive_rate < 1:
+            raise ValueError('false_positive_rate has to be between 0 and 1')
+
+        # Every filter is a list of its bit array, number of bits, number of
+        # hash functions, capacity, false positive rate and number of added
+        # URLs
+        self._filters = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self._add_filter(expected_size,
+                         false_positive_rate * self.FALSE_POSITIVE_RATE_RATIO)
+
+    def _add_filter(self, capacity, false_positive_rate):
+        """Stacks a new filter with given capacity and false positive rate
+        onto the set.
+
+        """
+
+        bits_number = int(math.ceil(-capacity * math.log(false_positive_rate) /
+                                    math.log(2) ** 2))
+        hash_functions_number = max(1, int(round(bits_number * math.log(2) /
+                                                 capacity)))
+        self._filters.append([bytearray((bits_number + 7) // 8), bits_number,
+                              hash_functions_number, capacity,
+                              false_positive_rate, 0])
+
+    @staticmethod
+    def _get_hashes(reference):
+        """Returns a pair of 64-bit hashes of URL. Hash functions of filters
+        are combinations of them (double hashing).
+
+        """
+
+        return struct.unpack('<QQ', _get_url_digest(reference))
+
+    @staticmethod
+    def _get_bit_positions(hashes, bit_filter):
+        """Returns positions of bits which correspond to URL hashes in
+        given filter.
+
+        """
+
+        first_hash, second_hash = hashes
+        bits_number = bit_filter[1]
+        return [(first_hash + index * second_hash) % bits_number
+                for index in xrange(bit_filter[2])]
+
+    def _filter_contains(self, hashes, bit_filter):
+        """Checks whether all the bits corresponding to URL hashes are set
+        in given filter.
+
+        """
+
+        bits = bit_filter[0]
+        for position in self._get_bit_positions(hashes, bit_filter):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, reference):
+        """Adds URL to the set.
+
+        reference -- corresponding URL
+
+        """
+
+        hashes = self._get_hashes(reference)
+        with self._lock:
+            for bit_filter in self._filters:
+                if self._filter_contains(hashes, bit_filter):
+                    return
+
+            bit_filter = self._filters[-1]
+            if bit_filter[5] >= bit_filter[3]:
+                # The last filter is full
+                self._add_filter(2 * bit_filter[3],
+                                 bit_filter[4] * self.FALSE_POSITIVE_RATE_RATIO)
+                bit_filter = self._filters[-1]
+            bits = bit_filter[0]
+            for position in self._get_bit_positions(hashes, bit_filter):
+                bits[position >> 3] |= 1 << (position & 7)
+            bit_filter[5] += 1
+            self._size += 1
+
+    def __contains__(self, reference):
+        hashes = self._get_hashes(reference)
+        with self._lock:
+            for bit_filter in self._filters:
+                if self._filter_contains(hashes, bit_filter):
+                    return True
+            return False
+
+    def __len__(self):
+        """Returns number of added URLs. URLs considered as added because of
+        false positives are not counted.
+
+        """
+
+        return self._size
+
+    @property
+    def memory_size(self):
+        """Returns number of bytes taken by bit arrays of filters."""
+
+        return sum(len(bit_filter[0]) for bit_filter in self._filters)
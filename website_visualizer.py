@@ -1,7 +1,9 @@
 import sys
+import os
 import logging
 
 from site_spider import SiteSpider
+from async_site_spider import AsyncSiteSpider
 from sitemap_html_writer import SitemapHtmlWriter, SitemapHtmlWriterError
 
 __doc__ = """
@@ -12,13 +14,37 @@ The main goal of this project is to produce sitemap of a website by given URL
 # Arguments that will cause printing a help line 
 HELP_ARGUMENTS = ('help', 'h', '-h')
 
+# Argument that will cause resuming of interrupted crawling
+RESUME_ARGUMENT = '--resume'
+
+# Prefixes of arguments stating bounds of interval between requests
+MIN_DELAY_ARGUMENT_PREFIX = '--min-delay='
+MAX_DELAY_ARGUMENT_PREFIX = '--max-delay='
+
 # Help line 
 HELP_STRING = \
 """This is WebsiteVisualizer - application for creating sitemap of website
 
-Usage: website_visualizer.py <site address> <output file name> [<depth limit>]
+Usage: website_visualizer.py [--resume] [--min-delay=<seconds>] 
+                             [--max-delay=<seconds>] <site address> <output file name> 
+                             [<depth limit>]
 The result is a html file with a sitemap of a given website
 
+Options:
+--resume --           continue crawling, which was interrupted, from the 
+                      moment it was stopped. Crawling state is saved 
+                      periodically to <output file name>.checkpoint file, 
+                      which is removed after the sitemap is written.
+--min-delay=<seconds> --
+                      the least interval between requests to the website. 
+                      Interval is adapted to the website server state: it 
+                      is decreased while server answers quickly and is 
+                      increased when server becomes slow or overloaded.
+                      (by default is 1)
+--max-delay=<seconds> --
+                      the greatest interval between requests to the website
+                      (by default is 60)
+
 Parametrs:
 <site adress> --      url of a website, map of which you want to get
 <output file name> -- name of an output html-file
@@ -39,6 +65,9 @@ HELP_OFFER_STRING = "Type 'help' or 'h' or '-h' for help"
 
 DEPTH_LIMIT_ERROR_STRING = "<depth limit> parametr have to be a digit"
 
+DELAY_ERROR_STRING = \
+        "--min-delay and --max-delay have to be numbers, min <= max"
+
 CRAWLING_PROCESS_LAUNCHED_STRING = \
 """Website crawling began. It will take some time.
 How much - it depends on the website size and the depth limit you have stated. 
@@ -56,10 +85,43 @@ WRITING_SITEMAP_TO_HTML_ERROR_STRING = "Error while writing sitemap to html."
 
 SITEMAP_CREATION_ERROR_STRING = "Sitemap was not created."
 
+CRAWLING_TIME_LIMIT_EXCEEDED_STRING = \
+        "Crawling time limit is over, sitemap is incomplete. " \
+        "Run the same command with --resume argument to continue crawling."
+
 # Dawnloading preferences. They was deduced experimentally
+# Interval between requests is adapted to server state, download delay is
+# only its initial value
 DOWNLOAD_DELAY = 15    
+MIN_DOWNLOAD_DELAY = 1
+MAX_DOWNLOAD_DELAY = 60
 CONNECTION_ATTEMPTS_NUMBER = 5
 CONNECTION_ATTEMPT_TIMEOUT = 10
+CONNECT_TIMEOUT = 30
+READ_TIMEOUT = 60
+REQUEST_TIMEOUT = 120
+# Maximum number of seconds crawling may last. '0' means no limitation.
+# If crawling is stopped because of time limit, it may be continued with
+# --resume argument
+CRAWLING_TIME_LIMIT = 0
+
+# Crawling state saving preferences
+CHECKPOINT_FILE_EXTENSION = '.checkpoint'
+CHECKPOINT_INTERVAL = 60
+
+# Directory where downloaded pages are cached, so pages which were not 
+# modified since the previous crawling are not downloaded again
+HTTP_CACHE_DIRECTORY = 'website_visualizer_cache'
+# File where robots.txt files, host addresses and homepage redirections are
+# cached for a day
+HOST_CACHE_FILE_NAME = os.path.join(HTTP_CACHE_DIRECTORY, 'hosts.json')
+
+# Crawling preferences. Breadth-first crawling puts every page in the sitemap
+# at its least depth
+SCHEDULING_STRATEGY = SiteSpider.SCHEDULING_STRATEGY_BREADTH_FIRST
+# Maximum number of requests performed at once. Requests rate is still 
+# restricted by download delay
+MAX_CONCURRENT_REQUESTS = 4
 
 # Entry point of application
 def main():
@@ -68,19 +130,52 @@ def main():
         if sys.argv[1] in HELP_ARGUMENTS:
             print HELP_STRING
             return
+
+    # Check if resume argument is stated
+    arguments = sys.argv[1 : ]
+    resume_crawling = RESUME_ARGUMENT in arguments
+    if resume_crawling:
+        arguments.remove(RESUME_ARGUMENT)
+
+    # Check if bounds of interval between requests are stated
+    min_download_delay = MIN_DOWNLOAD_DELAY
+    max_download_delay = MAX_DOWNLOAD_DELAY
+    for argument in arguments[:]:
+        if argument.startswith(MIN_DELAY_ARGUMENT_PREFIX):
+            delay_string = argument[len(MIN_DELAY_ARGUMENT_PREFIX) : ]
+        elif argument.startswith(MAX_DELAY_ARGUMENT_PREFIX):
+            delay_string = argument[len(MAX_DELAY_ARGUMENT_PREFIX) : ]
+        else:
+            continue
+        arguments.remove(argument)
+        try:
+            delay = float(delay_string)
+        except ValueError:
+            print DELAY_ERROR_STRING
+            print HELP_OFFER_STRING
+            return
+        if argument.startswith(MIN_DELAY_ARGUMENT_PREFIX):
+            min_download_delay = delay
+        else:
+            max_download_delay = delay
+    if min_download_delay < 0 or min_download_delay > max_download_delay:
+        print DELAY_ERROR_STRING
+        print HELP_OFFER_STRING
+        return
             
     # Check number of arguments
-    if len(sys.argv) < 3 or len(sys.argv) > 4:
+    if len(arguments) < 2 or len(arguments) > 3:
         print "Invalid parametrs number"
         print "Type 'help' or 'h' or '-h' for help"
         return
     
-    site_address = sys.argv[1]
-    output_file_name = sys.argv[2]
+    site_address = arguments[0]
+    output_file_name = arguments[1]
+    checkpoint_file_name = output_file_name + CHECKPOINT_FILE_EXTENSION
 
     # Check if depth limit argument is stated
-    if len(sys.argv) == 4:
-        depth_limit_string = sys.argv[3]    
+    if len(arguments) == 3:
+        depth_limit_string = arguments[2]    
 
         # Check depth limit argument for validity
         if not depth_limit_string.isdigit():
@@ -98,10 +193,28 @@ def main():
                         level = logging.INFO)  
     
     # Create a site spider
-    site_spider = SiteSpider(site_address, depth_limit, 
-                             DOWNLOAD_DELAY, 
-                             CONNECTION_ATTEMPTS_NUMBER, 
-                             CONNECTION_ATTEMPT_TIMEOUT)
+    site_spider = AsyncSiteSpider(site_address, depth_limit, 
+                                  DOWNLOAD_DELAY, 
+                                  CONNECTION_ATTEMPTS_NUMBER, 
+                                  CONNECTION_ATTEMPT_TIMEOUT,
+                                  scheduling_strategy = SCHEDULING_STRATEGY,
+                                  max_concurrent_requests = 
+                                        MAX_CONCURRENT_REQUESTS,
+                                  checkpoint_file_name = checkpoint_file_name,
+                                  checkpoint_interval = CHECKPOINT_INTERVAL,
+                                  resume_crawling = resume_crawling,
+                                  http_cache_directory = 
+                                        HTTP_CACHE_DIRECTORY,
+                                  connect_timeout = CONNECT_TIMEOUT,
+                                  read_timeout = READ_TIMEOUT,
+                                  request_timeout = REQUEST_TIMEOUT,
+                                  crawling_time_limit = CRAWLING_TIME_LIMIT,
+                                  adaptive_download_delay = True,
+                                  min_download_delay = min_download_delay,
+                                  max_download_delay = max_download_delay,
+                                  host_cache_file_name = HOST_CACHE_FILE_NAME,
+                                  read_sitemaps = True,
+                                  incremental_page_parsing = True)
     
     # Inform user about crawling process launch
     print CRAWLING_PROCESS_LAUNCHED_STRING
@@ -132,6 +245,14 @@ def main():
         else:
             logging.info('Sitemap is writen to %s.' % output_file_name)    
             print 'Sitemap was written to', output_file_name
+
+            if site_spider.crawling_time_limit_exceeded:
+                # Sitemap is incomplete, keep crawling state in order to
+                # continue crawling later
+                print CRAWLING_TIME_LIMIT_EXCEEDED_STRING
+            elif os.path.exists(checkpoint_file_name):
+                # Crawling is over, so there is no need in its saved state
+                os.remove(checkpoint_file_name)
         
     print 'See', logging_file_name, 'for more details and error reports.'
 